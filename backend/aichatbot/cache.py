@@ -0,0 +1,257 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional time-to-live.
+
+    Entries past ``ttl`` seconds are treated as misses and dropped on access.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """
+    Byte-string key/value store in a SQLite file.
+
+    The file is shared by every worker process on the host and survives
+    restarts. WAL mode lets readers proceed while another process writes.
+    Each thread gets its own connection. Expired rows are deleted on the
+    first write and then every ``purge_every`` written rows, so the file
+    does not grow with keys that are never read again.
+    """
+
+    def __init__(self, path, table="cache", ttl=None, purge_every=1000):
+        self.path = str(path)
+        self.table = table
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = purge_every
+        self._writes_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        """Return ``{key: value}`` for the keys that are present and not expired."""
+        found = {}
+        keys = list(keys)
+        now = time.time()
+        conn = self._connection()
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value, expires_at FROM {self.table} WHERE key IN ({placeholders})",
+                chunk,
+            )
+            for key, value, expires_at in rows:
+                if expires_at is None or expires_at > now:
+                    found[key] = value
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        rows = [(key, value, expires_at) for key, value in items.items()]
+        if not rows:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+        if self.ttl:
+            with self._writes_lock:
+                self._writes += len(rows)
+                purge = self._writes >= self.purge_every
+                if purge:
+                    self._writes = 0
+            if purge:
+                self.purge_expired()
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def purge_expired(self):
+        conn = self._connection()
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self):
+        self._connection().execute(f"DELETE FROM {self.table}")
+
+
+def _json_dumps(value):
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+class TieredCache:
+    """
+    In-process LRU in front of an optional shared SQLite tier.
+
+    Values are serialized with ``dumps``/``loads`` (JSON by default) only for
+    the SQLite tier; the memory tier holds the objects themselves. Persistent
+    hits are promoted into memory. Errors from the SQLite tier are logged and
+    treated as misses so a locked or unwritable file never breaks a request.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, path=None, table="cache",
+                 dumps=_json_dumps, loads=_json_loads):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.persistent = SQLiteCache(path, table=table, ttl=ttl) if path else None
+        self.dumps = dumps
+        self.loads = loads
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.memory.get(key, _MISSING)
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+
+        if remaining and self.persistent is not None:
+            try:
+                stored = self.persistent.get_many(remaining)
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache read failed: {e}")
+                stored = {}
+            for key, data in stored.items():
+                value = self.loads(data)
+                self.memory.set(key, value)
+                found[key] = value
+            self.persistent_hits += len(stored)
+            remaining = [key for key in remaining if key not in stored]
+
+        self.misses += len(remaining)
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items):
+        for key, value in items.items():
+            self.memory.set(key, value)
+        if self.persistent is not None:
+            try:
+                self.persistent.set_many({k: self.dumps(v) for k, v in items.items()})
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache write failed: {e}")
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self):
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.persistent_hits + self.misses
+        return {
+            "size": memory["size"],
+            "maxsize": memory["maxsize"],
+            "evictions": memory["evictions"],
+            "memory_hits": memory["hits"],
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            "persistent": self.persistent.path if self.persistent else None,
+        }
+
+
+_registry = {}
+
+
+def register_cache(name, cache):
+    """Make ``cache`` visible to ``cache_stats`` under ``name``."""
+    _registry[name] = cache
+    return cache
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in _registry.items()}
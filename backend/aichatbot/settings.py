@@ -144,6 +144,53 @@ DATABASES = {
 
 DATABASE_ROUTERS = ['aichatbot.db_router.OrganizationRouter']
 
+# Product search
+# Catalogs smaller than this are always searched exactly, whatever engine is configured.
+SEARCH_ANN_MIN_PRODUCTS = env.int("SEARCH_ANN_MIN_PRODUCTS", default=10000)
+
+# Publish each organization's search index once into shared memory and let
+# every gunicorn worker map that copy instead of holding its own. The segment
+# needs about count * (dim * 4 + 16) bytes plus the names; Docker gives
+# containers a 64 MB /dev/shm, so raise shm_size (see docker-compose.yml) or
+# publishing fails and every worker keeps a private copy. Catalog changes are
+# republished at most once per SEARCH_SHARED_MEMORY_MIN_INTERVAL seconds; in
+# between, workers refresh a private copy.
+SEARCH_SHARED_MEMORY = env.bool("SEARCH_SHARED_MEMORY", default=False)
+SEARCH_SHARED_MEMORY_MIN_INTERVAL = env.float("SEARCH_SHARED_MEMORY_MIN_INTERVAL", default=30.0)
+
+# Byte budget for the search indexes one process keeps resident across all
+# organizations (least recently used ones are evicted; 0 for no limit), and
+# organizations that are never evicted.
+SEARCH_INDEX_CACHE_BYTES = env.int("SEARCH_INDEX_CACHE_BYTES", default=2 * 1024**3)
+SEARCH_INDEX_PINNED = env.list("SEARCH_INDEX_PINNED", default=[])
+
+# Threads shared by sharded scans (BotSettings.search_shards); 0 means one per CPU.
+SEARCH_SHARD_THREADS = env.int("SEARCH_SHARD_THREADS", default=0)
+
+# dtype product embeddings are stored as ("float32" or "float16").
+EMBEDDING_STORAGE_DTYPE = env("EMBEDDING_STORAGE_DTYPE", default="float32")
+
+# Embedding cache: in-process LRU plus a SQLite file shared by all workers.
+# Set EMBEDDING_CACHE_PATH to an empty string to keep the cache in memory only.
+EMBEDDING_CACHE_SIZE = env.int("EMBEDDING_CACHE_SIZE", default=10000)
+EMBEDDING_CACHE_TTL = env.int("EMBEDDING_CACHE_TTL", default=30 * 24 * 3600)
+EMBEDDING_CACHE_PATH = env("EMBEDDING_CACHE_PATH", default=str(BASE_DIR / "db/embedding_cache.sqlite3"))
+
+# Product search result cache, keyed on the catalog version so product writes
+# invalidate it. SEARCH_CACHE_SIZE=0 disables it; an empty SEARCH_CACHE_PATH
+# keeps it in memory only.
+SEARCH_CACHE_SIZE = env.int("SEARCH_CACHE_SIZE", default=2000)
+SEARCH_CACHE_TTL = env.int("SEARCH_CACHE_TTL", default=24 * 3600)
+SEARCH_CACHE_PATH = env("SEARCH_CACHE_PATH", default=str(BASE_DIR / "db/search_cache.sqlite3"))
+
+# Chat model response cache for the agent nodes in LLM_CACHE_NODES (every model
+# runs at temperature 0, so equal inputs get equal responses). LLM_CACHE_SIZE=0
+# disables it; an empty LLM_CACHE_PATH keeps it in memory only.
+LLM_CACHE_SIZE = env.int("LLM_CACHE_SIZE", default=2000)
+LLM_CACHE_TTL = env.int("LLM_CACHE_TTL", default=24 * 3600)
+LLM_CACHE_PATH = env("LLM_CACHE_PATH", default=str(BASE_DIR / "db/llm_cache.sqlite3"))
+LLM_CACHE_NODES = env.list("LLM_CACHE_NODES", default=["analyze_intent", "extract_attributes"])
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
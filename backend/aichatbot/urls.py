@@ -23,6 +23,7 @@ from django.views.generic import TemplateView
 
 from aichatbot.views import (
     CustomAdminLoginView,
+    cacheStats,
     getCurrentUser,
     health_check,
     logoutUser,
@@ -36,6 +37,7 @@ urlpatterns = [
     path("api/chat/", include("chat.urls")),
     path("api/user/", getCurrentUser, name="current_user"),
     path("api/logout/", logoutUser, name="logout"),
+    path("api/cache-stats/", cacheStats, name="cache_stats"),
     re_path(r"^.*$", TemplateView.as_view(template_name="index.html")),
 ]
 
@@ -4,6 +4,8 @@ from django.contrib.auth import logout
 from django.contrib.auth.views import LoginView
 from django.http import JsonResponse
 
+from .cache import cache_stats
+
 
 class CustomAdminLoginView(LoginView):
     template_name = "admin/login.html"
@@ -46,4 +48,11 @@ def logoutUser(request):
 
 def health_check(request):
     """Health check endpoint for Docker/Kubernetes."""
-    return JsonResponse({"status": "healthy"}, status=200)
\ No newline at end of file
+    return JsonResponse({"status": "healthy"}, status=200)
+
+
+def cacheStats(request):
+    """Hit/miss counters of this worker's caches, for monitoring (staff only)."""
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return JsonResponse({"error": "Not authorized"}, status=403)
+    return JsonResponse(cache_stats(), status=200)
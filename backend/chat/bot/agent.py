@@ -110,7 +110,7 @@ def analyze_intent(state: AgentState):
         product_search_example1=prompt.get('product_search_example1', 'Show me some running shoes'),
         product_search_example2=prompt.get('product_search_example2', 'I want to buy a red dress')
     )
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, cache_node="analyze_intent")
     data = IntentResponse.model_validate_json(extract_and_sanitize_json(response.content))
     if data.intent == "product_search":
         logger.info("Intent Analysis Response: product_search")
@@ -133,7 +133,7 @@ def general_response(state: AgentState):
         user_message=query
     )
     
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, cache_node="general_response")
     logger.debug(f"General Response LLM output: {response.content}")
     return {
         "final_response": AgentResponse(
@@ -163,7 +163,7 @@ def extract_attributes(state: AgentState):
         extracted_attributes=json.dumps(state['extracted_attributes']),
         extraction_prompt=settings.attribute_extraction_prompt
     )
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, cache_node="extract_attributes")
     logger.debug(f"extract_attributes Response LLM output: {response.content}")
     try:
         content = AttributeExtractionResponse.model_validate_json(extract_and_sanitize_json(response.content))
@@ -207,7 +207,7 @@ def ask_missing(state: AgentState):
     )
     llm = LLM.get_generation_model()
     
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, cache_node="ask_missing")
 
     try:
         logger.debug(f"Missing Attributes LLM output: {response.content}")
@@ -257,12 +257,14 @@ def search_node(state: AgentState):
     logger.info("Performing product search")
     query = state['input']
     ext_attr = state["extracted_attributes"]
-    query += " ".join([f"{k}: {v}" for k, v in ext_attr.items()])
+    query += "".join([f" {k}: {v}" for k, v in ext_attr.items()])
     org_slug = state['org_slug']
-    # Maybe add attributes to query for better semantic match
-    # Or filter post-search. For now, simple semantic search.
+    # Attributes are added to the query for the semantic match and also used
+    # to pre-filter the catalog before scoring.
     
-    results = search_products(query, org_slug, top_k=15)
+    results = search_products(
+        query, org_slug, top_k=15, bot_settings=state['bot_settings'], attributes=ext_attr
+    )
     return {"search_results": results}
 
 def recommend(state: AgentState):
@@ -279,7 +281,7 @@ def recommend(state: AgentState):
         available_products=json.dumps([{"name": r["name"], "price": r["price"]} for r in results])
     )
     
-    response = llm.invoke(messages)
+    response = llm.invoke(messages, cache_node="recommend")
     sanitized_results = [{"name": item['name'], "price": item["price"], "image": item["image"]} for item in results]
     logger.debug(f"Product Recommendation LLM output: {response.content}")
     return {
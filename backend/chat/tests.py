@@ -1,3 +1,322 @@
-from django.test import TestCase
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from aichatbot.cache import SQLiteCache, TieredCache
+from llm.embedding_cache import CachedEmbeddings, _vector_dumps, _vector_loads
+from llm.llm import LLM, get_client, reset_clients
+from llm.rate_limit import TokenBucket, call_with_retries
+from llm.response_cache import ResponseCache, _message_dumps, _message_loads, response_cache_key
+from organization.models import BotSettings
+
+from .bot.agent import search_node
+
+
+class SearchNodeTests(SimpleTestCase):
+    def test_extracted_attributes_pre_filter_the_search(self):
+        bot_settings = BotSettings(name="Shop")
+        attributes = {"color": "Red", "budget": "under 2000"}
+        state = {
+            "input": "cotton shirt",
+            "extracted_attributes": attributes,
+            "org_slug": "shop",
+            "bot_settings": bot_settings,
+        }
+
+        with mock.patch("chat.bot.agent.search_products", return_value=[{"name": "Red Shirt"}]) as search:
+            update = search_node(state)
+
+        search.assert_called_once_with(
+            "cotton shirt color: Red budget: under 2000", "shop",
+            top_k=15, bot_settings=bot_settings, attributes=attributes,
+        )
+        self.assertEqual(update, {"search_results": [{"name": "Red Shirt"}]})
+
+
+class FakeChatModel:
+    """Chat client that numbers its answers, so repeated calls are visible."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, input, **kwargs):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+
+@override_settings(LLM_CACHE_NODES=["analyze_intent"])
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.chat_model = FakeChatModel()
+        # Registered under the key LLM.llm looks up, so no provider client is built.
+        self.llm = LLM.__new__(LLM)
+        self.llm.provider, self.llm.chat_model_name, self.llm.base_url = "ollama", "test-model", None
+        get_client(("chat", "ollama", "test-model", None), lambda: self.chat_model)
+        self.addCleanup(reset_clients)
+
+        self.cache = ResponseCache(maxsize=100)
+        patcher = mock.patch("llm.llm.get_response_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.messages = [SystemMessage(content="Classify the query."), HumanMessage(content="red shirts")]
+
+    def test_cached_node_calls_the_model_once(self):
+        first = self.llm.invoke(self.messages, cache_node="analyze_intent")
+        second = self.llm.invoke(list(self.messages), cache_node="analyze_intent")
+
+        self.assertEqual(self.chat_model.calls, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.cache.stats()["nodes"], {"analyze_intent": {"hits": 1, "misses": 1}})
+
+    def test_other_inputs_and_nodes_reach_the_model(self):
+        self.llm.invoke(self.messages, cache_node="analyze_intent")
+        self.llm.invoke(self.messages[:1] + [HumanMessage(content="blue shirts")], cache_node="analyze_intent")
+        self.llm.invoke(self.messages, cache_node="recommend")
+        self.llm.invoke(self.messages)
+
+        self.assertEqual(self.chat_model.calls, 4)
+
+    def test_key_depends_on_model_and_messages(self):
+        key = response_cache_key("ollama", "test-model", self.messages)
+
+        self.assertEqual(key, response_cache_key("ollama", "test-model", list(self.messages)))
+        self.assertNotEqual(key, response_cache_key("ollama", "other-model", self.messages))
+        self.assertNotEqual(key, response_cache_key("ollama", "test-model", self.messages[1:]))
+
+    def test_responses_survive_the_persistent_tier(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cache = ResponseCache(
+            maxsize=1, path=Path(tmp_dir.name) / "llm.sqlite3", table="llm_responses",
+            dumps=_message_dumps, loads=_message_loads,
+        )
+
+        cache.set("a", AIMessage(content="first"))
+        cache.set("b", AIMessage(content="second"))
+
+        # "a" was evicted from memory and comes back from SQLite.
+        self.assertEqual(cache.get("a"), AIMessage(content="first"))
+        self.assertEqual(cache.stats()["persistent_hits"], 1)
+
+
+def make_llm(provider="ollama", chat_model="test-model", base_url=None, embedding_model="test-embed"):
+    """``LLM`` for ``provider`` without checking that its client package is installed."""
+    llm = LLM.__new__(LLM)
+    llm.provider, llm.chat_model_name, llm.base_url = provider, chat_model, base_url
+    llm.embedding_model_name = embedding_model
+    return llm
+
+
+class ClientRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(reset_clients)
+        reset_clients()
+        patchers = [
+            mock.patch.object(LLM, "_create_chat_client", side_effect=lambda: object()),
+            mock.patch.object(LLM, "_create_embeddings_client", side_effect=lambda: object()),
+        ]
+        self.create_chat, self.create_embeddings = (patcher.start() for patcher in patchers)
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def test_same_configuration_shares_one_client(self):
+        first, second = make_llm(), make_llm()
+
+        self.assertIs(first.llm, second.llm)
+        self.assertIs(first.embeddings, second.embeddings)
+        self.assertIs(first.llm, first.llm)
+        self.assertEqual((self.create_chat.call_count, self.create_embeddings.call_count), (1, 1))
+
+    def test_provider_model_and_base_url_get_their_own_clients(self):
+        llms = [
+            make_llm(),
+            make_llm(provider="openai"),
+            make_llm(chat_model="other-model"),
+            make_llm(base_url="http://ollama:11434"),
+        ]
+
+        self.assertEqual(len({id(llm.llm) for llm in llms}), 4)
+        self.assertIsNot(make_llm().embeddings, make_llm(embedding_model="other-embed").embeddings)
+        self.assertIsNot(make_llm().llm, make_llm().embeddings)
+
+    def test_reset_drops_the_clients(self):
+        client = make_llm().llm
+
+        reset_clients()
+
+        self.assertIsNot(make_llm().llm, client)
+
+    def test_concurrent_first_calls_share_one_client(self):
+        def slow_factory():
+            time.sleep(0.01)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(lambda _: get_client(("chat", "slow"), slow_factory), range(8)))
+
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+
+class FakeEmbeddings:
+    """Embedding model that records the texts of every call it receives."""
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def vector(text):
+        return [float(len(text)), float(sum(map(ord, text)))]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return self.vector(text)
+
+    def embed_documents(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name) / "embeddings.sqlite3"
+        self.model = FakeEmbeddings()
+
+    def make_cache(self, maxsize=100, path=None):
+        return TieredCache(
+            maxsize=maxsize, path=path, table="embeddings", dumps=_vector_dumps, loads=_vector_loads,
+        )
+
+    def test_repeated_texts_are_served_from_memory(self):
+        cache = self.make_cache()
+        embeddings = CachedEmbeddings(self.model, "test:model", cache=cache)
+
+        first = embeddings.embed_query("Red  Shirt")
+        again = embeddings.embed_query("red shirt")
+        documents = embeddings.embed_documents(["Red Shirt", "red shirt", "Red Shirt"])
+        embeddings.embed_documents(["red shirt"])
+
+        self.assertEqual(again, first)
+        # Queries are normalized; documents reach the model verbatim, each once.
+        self.assertEqual(self.model.calls, [["Red  Shirt"], ["Red Shirt", "red shirt"]])
+        self.assertEqual(documents[0], documents[2])
+        self.assertNotEqual(documents[0], documents[1])
+        stats = cache.stats()
+        self.assertEqual((stats["memory_hits"], stats["misses"]), (2, 3))
+
+    def test_other_workers_hit_the_sqlite_tier(self):
+        CachedEmbeddings(self.model, "test:model", cache=self.make_cache(path=self.path)).embed_query("shirt")
+        cache = self.make_cache(path=self.path)
+
+        vector = CachedEmbeddings(self.model, "test:model", cache=cache).embed_query("shirt")
+
+        self.assertEqual(vector, FakeEmbeddings.vector("shirt"))
+        self.assertEqual(len(self.model.calls), 1)
+        self.assertEqual(cache.stats()["persistent_hits"], 1)
+
+    def test_models_do_not_share_entries(self):
+        cache = self.make_cache()
+
+        CachedEmbeddings(self.model, "provider:a", cache=cache).embed_documents(["shirt"])
+        CachedEmbeddings(self.model, "provider:b", cache=cache).embed_documents(["shirt"])
+
+        self.assertEqual(self.model.calls, [["shirt"], ["shirt"]])
+
+    def test_expired_rows_are_missed_and_purged(self):
+        cache = SQLiteCache(self.path, table="embeddings", ttl=10, purge_every=2)
+
+        with mock.patch("aichatbot.cache.time.time", return_value=1000.0):
+            cache.set("a", b"1")
+            cache.set("b", b"2")
+        with mock.patch("aichatbot.cache.time.time", return_value=1020.0):
+            self.assertIsNone(cache.get("a"))
+            cache.set("c", b"3")
+
+        rows = cache._connection().execute("SELECT key FROM embeddings").fetchall()
+        self.assertEqual(rows, [("c",)])
+
+
+class FakeClock:
+    """Clock whose ``sleep`` only advances the time, recording each wait."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_bucket_allows_a_burst_then_the_rate(self):
+        bucket = TokenBucket(10, clock=self.clock, sleep=self.clock.sleep)
+
+        bucket.acquire(10)
+        bucket.acquire(5)
+        self.clock.now += 1.0
+        bucket.acquire(10)
+
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.5)
+
+    def test_requests_larger_than_the_bucket_are_capped(self):
+        bucket = TokenBucket(10, capacity=4, clock=self.clock, sleep=self.clock.sleep)
+
+        bucket.acquire(4)
+        bucket.acquire(100)
+
+        self.assertAlmostEqual(sum(self.clock.sleeps), 0.4)
+
+    def test_zero_rate_never_waits(self):
+        bucket = TokenBucket(0, clock=self.clock, sleep=self.clock.sleep)
+
+        for _ in range(100):
+            bucket.acquire(10)
+
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        errors = [ConnectionError("reset"), TimeoutError("timed out")]
+
+        def flaky():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        with self.assertLogs("llm.rate_limit", "WARNING"):
+            result = call_with_retries(flaky, retries=3, backoff=2.0, sleep=self.clock.sleep)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(self.clock.sleeps), 2)
+        # backoff·2^attempt, scaled by jitter in [0.5, 1].
+        self.assertTrue(1.0 <= self.clock.sleeps[0] <= 2.0)
+        self.assertTrue(2.0 <= self.clock.sleeps[1] <= 4.0)
+
+    def test_gives_up_after_the_retries(self):
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise ConnectionError("reset")
+
+        with self.assertLogs("llm.rate_limit", "WARNING"), self.assertRaises(ConnectionError):
+            call_with_retries(failing, retries=4, backoff=10.0, max_backoff=30.0, sleep=self.clock.sleep)
+
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(len(self.clock.sleeps), 4)
+        self.assertTrue(all(delay <= 30.0 for delay in self.clock.sleeps))
+        self.assertTrue(15.0 <= self.clock.sleeps[-1])
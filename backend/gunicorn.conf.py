@@ -0,0 +1,27 @@
+# Gunicorn picks this file up automatically from the working directory.
+
+
+def on_starting(server):
+    """
+    Publish every organization's search index to shared memory before the
+    workers fork, so they map one warm copy instead of each building their own.
+    Only active with SEARCH_SHARED_MEMORY=true.
+    """
+    import os
+
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aichatbot.settings")
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+
+    if settings.SEARCH_SHARED_MEMORY:
+        try:
+            call_command("publish_search_index")
+        except Exception as e:
+            server.log.error(f"Failed to publish search indexes: {e}")
+    # Workers must not inherit the master's database connections.
+    connections.close_all()
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from aichatbot.cache import TieredCache, register_cache
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _vector_dumps(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _vector_loads(data):
+    return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+def get_embedding_cache():
+    """
+    Return the process-wide embedding cache, configured from Django settings.
+
+    ``EMBEDDING_CACHE_SIZE`` bounds the in-process LRU, ``EMBEDDING_CACHE_TTL``
+    sets the expiry in seconds and ``EMBEDDING_CACHE_PATH`` points at the SQLite
+    file shared across workers (empty to disable the persistent tier).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from django.conf import settings
+
+            _cache = register_cache("embeddings", TieredCache(
+                maxsize=getattr(settings, "EMBEDDING_CACHE_SIZE", 10000),
+                ttl=getattr(settings, "EMBEDDING_CACHE_TTL", None),
+                path=getattr(settings, "EMBEDDING_CACHE_PATH", None),
+                table="embeddings",
+                dumps=_vector_dumps,
+                loads=_vector_loads,
+            ))
+        return _cache
+
+
+def normalize_text(text):
+    """Collapse whitespace and case so trivially different queries share an entry."""
+    return " ".join(text.split()).lower()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from a cache.
+
+    Keys combine the model id, the call kind (some providers embed queries and
+    documents differently) and the text: normalized for queries, verbatim for
+    documents, whose case and spacing reach the model. Only texts missing from
+    the cache are sent to the wrapped model, in a single batch.
+    """
+
+    def __init__(self, embeddings, model_id, cache=None, query_kwargs=None):
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.cache = cache if cache is not None else get_embedding_cache()
+        # Extra ``embed_documents`` arguments that make it embed queries the way
+        # ``embed_query`` does (e.g. the task type for Google models).
+        self.query_kwargs = query_kwargs or {}
+
+    def _key(self, kind, text):
+        if kind == "query":
+            text = normalize_text(text)
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"{self.model_id}:{kind}:{digest}"
+
+    def _embed_batch(self, kind, texts, **kwargs):
+        keys = [self._key(kind, text) for text in texts]
+        found = self.cache.get_many(set(keys))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()), **kwargs)
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.set_many(computed)
+            found.update(computed)
+        return [list(found[key]) for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed_batch("document", texts)
+
+    def embed_queries(self, texts):
+        """Embed several search queries with one batched provider call."""
+        return self._embed_batch("query", texts, **self.query_kwargs)
+
+    def embed_query(self, text):
+        key = self._key("query", text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(key, vector)
+        return list(vector)
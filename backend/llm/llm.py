@@ -1,9 +1,15 @@
+import logging
 import os
+import threading
+import time
 from typing import Any, Dict, List, Literal
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
 
+from llm.embedding_cache import CachedEmbeddings
+from llm.response_cache import cache_enabled, get_response_cache, response_cache_key
+
 # Try imports for different providers
 try:
     from langchain_google_genai import (
@@ -32,53 +38,124 @@ except ImportError:
     ChatOpenAI = None
     OpenAIEmbeddings = None
 
+logger = logging.getLogger(__name__)
+
+# Embedding model used with each provider.
+EMBEDDING_MODELS = {
+    "google": "models/embedding-001",
+    "ollama": "nomic-embed-text",
+    "openai": "text-embedding-3-small",
+}
+
+_clients = {}
+_clients_lock = threading.RLock()
+
+
+def get_client(key, factory):
+    """
+    Return the process-wide client registered under ``key``, creating it with ``factory()``.
+
+    Clients hold HTTP connection pools (and TLS sessions), so reusing one
+    instead of constructing a new client per call saves both the
+    construction and the connection setup. Creation is serialized so
+    concurrent first calls share one client.
+    """
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                start = time.perf_counter()
+                client = _clients[key] = factory()
+                logger.debug(f"Created client {key} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return client
+
+
+def reset_clients():
+    """Drop every registered client, e.g. between tests or after changing settings."""
+    with _clients_lock:
+        _clients.clear()
+
+
 class LLM:
+    """
+    Chat and embedding clients of one provider.
+
+    The clients are created on first use and shared through ``get_client``,
+    keyed by provider, model and base URL, so every ``LLM`` for the same
+    configuration reuses the same connections.
+    """
+
     def __init__(self, provider: Literal["google", "ollama","openai"] = "ollama", model_name: str = None):
         self.provider = provider
         self.model_name = model_name
+        self.base_url = None
+        # Arguments for embed_documents to embed texts as search queries.
+        self.query_embedding_kwargs = {}
         
         if self.provider == "google":
             if not ChatGoogleGenerativeAI:
                 raise ImportError("langchain-google-genai not installed")
             
-            self.llm = ChatGoogleGenerativeAI(
-                model=self.model_name or "gemini-2.5-flash",
-                temperature=0,
-                convert_system_message_to_human=True
-            )
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001",
-            )
+            self.chat_model_name = self.model_name or "gemini-2.5-flash"
+            self.embedding_model_name = EMBEDDING_MODELS["google"]
+            self.query_embedding_kwargs = {"task_type": "RETRIEVAL_QUERY"}
             
         elif self.provider == "ollama":
             if not ChatOllama:
                 raise ImportError("langchain-ollama or langchain-community not installed")
 
-            base_url = self._get_ollama_base_url()
+            self.base_url = self._get_ollama_base_url()
 
             # Default to llama3 for chat if not specified
-            chat_model = self.model_name or "mistral"
+            self.chat_model_name = self.model_name or "mistral"
             # User specifically requested nomic-embed-text for embeddings
-            embed_model = "nomic-embed-text"
-
-            self.llm = ChatOllama(model=chat_model, temperature=0, base_url=base_url)
-            self.embeddings = OllamaEmbeddings(model=embed_model, base_url=base_url)
+            self.embedding_model_name = EMBEDDING_MODELS["ollama"]
             
         elif self.provider == "openai":
             if not ChatOpenAI:
                 raise ImportError("langchain-openai not installed")
 
+            self.chat_model_name = self.model_name or "gpt-4.1-nano"
+            self.embedding_model_name = EMBEDDING_MODELS["openai"]
+
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+
+    @property
+    def llm(self):
+        key = ("chat", self.provider, self.chat_model_name, self.base_url)
+        return get_client(key, self._create_chat_client)
+
+    @property
+    def embeddings(self):
+        key = ("embeddings", self.provider, self.embedding_model_name, self.base_url)
+        return get_client(key, self._create_embeddings_client)
 
-            self.llm = ChatOpenAI(
-                model=self.model_name or "gpt-4.1-nano",
+    def _create_chat_client(self):
+        if self.provider == "google":
+            return ChatGoogleGenerativeAI(
+                model=self.chat_model_name,
                 temperature=0,
+                convert_system_message_to_human=True
             )
-            self.embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-small",
+        if self.provider == "ollama":
+            return ChatOllama(model=self.chat_model_name, temperature=0, base_url=self.base_url)
+        return ChatOpenAI(
+            model=self.chat_model_name,
+            temperature=0,
+        )
+
+    def _create_embeddings_client(self):
+        if self.provider == "google":
+            return GoogleGenerativeAIEmbeddings(
+                model=self.embedding_model_name,
             )
-
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        if self.provider == "ollama":
+            return OllamaEmbeddings(model=self.embedding_model_name, base_url=self.base_url)
+        return OpenAIEmbeddings(
+            model=self.embedding_model_name,
+        )
 
     def _get_ollama_base_url(self):
         base_url = os.environ.get("OLLAMA_BASE_URL")
@@ -103,28 +180,68 @@ class LLM:
             raise ValueError("GOOGLE_API_KEY environment variable is not set")
         return api_key
 
-    def invoke(self, *args, **kwargs):
-        return self.llm.invoke(*args, **kwargs)
+    def invoke(self, input, cache_node=None, **kwargs):
+        """
+        Call the chat model on ``input``.
+
+        When ``cache_node`` names an agent node listed in ``LLM_CACHE_NODES``,
+        the response is looked up in (and stored to) the LLM response cache,
+        keyed on the provider, the model and the formatted messages.
+        """
+        cache = get_response_cache() if cache_node and cache_enabled(cache_node) else None
+        if cache is None:
+            return self.llm.invoke(input, **kwargs)
 
+        key = response_cache_key(self.provider, self.chat_model_name, input, **kwargs)
+        response = cache.get(key)
+        cache.record(cache_node, response is not None)
+        if response is None:
+            response = self.llm.invoke(input, **kwargs)
+            cache.set(key, response)
+        return response
+
+
+    @staticmethod
+    def get(provider, model_name=None):
+        """Shared ``LLM`` for ``provider`` and ``model_name``, created on first use."""
+        return get_client(("llm", provider, model_name), lambda: LLM(provider=provider, model_name=model_name))
 
     @staticmethod
     def get_embedding_model():
         EMBEDING_MODEL = os.environ.get("EMBEDING_MODEL")
-        return LLM(provider=EMBEDING_MODEL).embeddings
+
+        def create():
+            llm = LLM.get(EMBEDING_MODEL)
+            # Repeated texts are served from the embedding cache instead of the provider.
+            return CachedEmbeddings(
+                llm.embeddings,
+                model_id=f"{llm.provider}:{llm.embedding_model_name}",
+                query_kwargs=llm.query_embedding_kwargs,
+            )
+
+        return get_client(("embedding_model", EMBEDING_MODEL), create)
+
+    @staticmethod
+    def get_embedding_model_id():
+        """Id ("provider:model") of the configured embedding model, without creating a client."""
+        EMBEDING_MODEL = os.environ.get("EMBEDING_MODEL")
+        if EMBEDING_MODEL not in EMBEDDING_MODELS:
+            return None
+        return f"{EMBEDING_MODEL}:{EMBEDDING_MODELS[EMBEDING_MODEL]}"
     
     @staticmethod
     def get_intent_analyzer_model():
         INTENT_ANALYZER_MODEL = os.environ.get("INTENT_ANALYZER_MODEL")
-        return LLM(provider=INTENT_ANALYZER_MODEL.split("::")[0], model_name=INTENT_ANALYZER_MODEL.split("::")[1])
+        return LLM.get(INTENT_ANALYZER_MODEL.split("::")[0], INTENT_ANALYZER_MODEL.split("::")[1])
     @staticmethod
     def get_attribute_extraction_model():
         ATTRIBUTE_EXTRACTION_MODEL = os.environ.get("ATTRIBUTE_EXTRACTION_MODEL")
-        return LLM(provider=ATTRIBUTE_EXTRACTION_MODEL.split("::")[0], model_name=ATTRIBUTE_EXTRACTION_MODEL.split("::")[1])
+        return LLM.get(ATTRIBUTE_EXTRACTION_MODEL.split("::")[0], ATTRIBUTE_EXTRACTION_MODEL.split("::")[1])
 
     @staticmethod
     def get_generation_model():
         GENERATION_MODEL = os.environ.get("GENERATION_MODEL")
-        return LLM(provider=GENERATION_MODEL.split("::")[0], model_name=GENERATION_MODEL.split("::")[1])
+        return LLM.get(GENERATION_MODEL.split("::")[0], GENERATION_MODEL.split("::")[1])
 
 # response = llm.invoke("Reply with OK")
 # print(response.content)
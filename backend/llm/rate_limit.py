@@ -0,0 +1,81 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Semaphore capping provider calls in flight; a multiprocessing semaphore
+# inherited from a parent process caps them across processes.
+_provider_slots = None
+
+
+def set_provider_slots(semaphore):
+    """Cap concurrent provider calls made through ``provider_slot`` (None: no cap)."""
+    global _provider_slots
+    _provider_slots = semaphore
+
+
+@contextmanager
+def provider_slot():
+    """Hold one of the provider call slots, if a cap was set, for the duration of a call."""
+    if _provider_slots is None:
+        yield
+        return
+    with _provider_slots:
+        yield
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter shared by threads.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    ``acquire`` blocks until enough are available. A ``rate`` of 0 or less
+    disables limiting. ``clock`` and ``sleep`` can be replaced in tests.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(capacity or rate, 1)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        if self.rate <= 0:
+            return
+        # Requests larger than the bucket would otherwise wait forever.
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self.sleep(wait)
+
+
+def call_with_retries(func, *args, retries=3, backoff=1.0, max_backoff=60.0, sleep=time.sleep, **kwargs):
+    """
+    Call ``func``, retrying failures with exponential backoff and jitter.
+
+    Waits ``backoff``, ``2·backoff``, ... (capped at ``max_backoff``, each
+    scaled by a random factor in [0.5, 1]) between attempts, with ``sleep``,
+    and re-raises the last error after ``retries`` retries.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(max_backoff, backoff * 2 ** attempt) * random.uniform(0.5, 1)
+            logger.warning(f"{getattr(func, '__name__', func)} failed ({e}), retrying in {delay:.1f}s")
+            sleep(delay)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from aichatbot.cache import TieredCache, register_cache
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _message_dumps(message):
+    return json.dumps(message_to_dict(message), ensure_ascii=False)
+
+
+def _message_loads(data):
+    return messages_from_dict([json.loads(data)])[0]
+
+
+class ResponseCache(TieredCache):
+    """``TieredCache`` of chat model responses that also counts hits and misses per agent node."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._nodes = {}
+        self._nodes_lock = threading.Lock()
+
+    def record(self, node, hit):
+        with self._nodes_lock:
+            counts = self._nodes.setdefault(node, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def stats(self):
+        stats = super().stats()
+        with self._nodes_lock:
+            stats["nodes"] = {node: dict(counts) for node, counts in self._nodes.items()}
+        return stats
+
+
+def get_response_cache():
+    """
+    Return the process-wide LLM response cache, or None if it is disabled.
+
+    Configured by ``LLM_CACHE_SIZE`` (0 disables it), ``LLM_CACHE_TTL`` and
+    ``LLM_CACHE_PATH`` like the embedding cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from django.conf import settings
+
+            size = getattr(settings, "LLM_CACHE_SIZE", 0)
+            if not size:
+                return None
+            _cache = register_cache("llm_responses", ResponseCache(
+                maxsize=size,
+                ttl=getattr(settings, "LLM_CACHE_TTL", None),
+                path=getattr(settings, "LLM_CACHE_PATH", None),
+                table="llm_responses",
+                dumps=_message_dumps,
+                loads=_message_loads,
+            ))
+        return _cache
+
+
+def cache_enabled(node):
+    """Whether responses of the agent ``node`` (e.g. "analyze_intent") are cached."""
+    from django.conf import settings
+
+    return node in getattr(settings, "LLM_CACHE_NODES", ())
+
+
+def _canonical(value):
+    """JSON-ready form of a model input: a string, a prompt value or a list of messages."""
+    if hasattr(value, "to_messages"):
+        value = value.to_messages()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, BaseMessage):
+        return {"type": value.type, "name": value.name, "content": value.content}
+    return value
+
+
+def response_cache_key(provider, model, messages, **kwargs):
+    """
+    Cache key of a chat call: the provider, the model and a digest of the formatted input.
+
+    Every model is configured with temperature 0, so the same input gets the
+    same response and can be served from the cache.
+    """
+    payload = json.dumps(
+        {"input": _canonical(messages), "kwargs": kwargs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f"{provider}:{model}:{digest}"
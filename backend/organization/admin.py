@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Organization, BotSettings
+from .models import Organization, BotSettings, EmbeddingJob
 
 # Register your models here.
 
@@ -14,3 +14,8 @@ class BotSettingsAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 
+@admin.register(EmbeddingJob)
+class EmbeddingJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "embedded", "failed", "total", "embedding_model", "updated_at")
+    list_filter = ("status",)
+    readonly_fields = [field.name for field in EmbeddingJob._meta.fields]
@@ -0,0 +1,161 @@
+import logging
+import os
+
+import numpy as np
+
+from .index import normalize, top_k_rows
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index.
+
+    Products are clustered with spherical k-means; each cluster ("list") keeps
+    the rows assigned to it. A query only scores the rows of the ``nprobe``
+    lists whose centroids are closest, trading a little recall for scanning a
+    fraction of the catalog. Lists are stored CSR-style: the rows of list ``l``
+    are ``order[offsets[l]:offsets[l + 1]]``.
+    """
+
+    def __init__(self, centroids, order, offsets, version=None):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.version = version
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes + self.order.nbytes + self.offsets.nbytes
+
+    @staticmethod
+    def default_lists(count):
+        """Rule-of-thumb list count (~4·√N)."""
+        return max(1, int(4 * np.sqrt(count)))
+
+    @staticmethod
+    def default_nprobe(n_lists):
+        """Lists probed when none is configured: ~10% of them, at least 8."""
+        return max(8, int(np.ceil(n_lists / 10)))
+
+    @staticmethod
+    def _assign(vectors, centroids, chunk_size=16384):
+        """Nearest centroid of every row, computed in chunks to bound memory."""
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            assign[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+        return assign
+
+    @classmethod
+    def fit(cls, vectors, n_lists, n_iter=10, seed=0, version=None):
+        """
+        Cluster the (normalized) ``vectors`` into ``n_lists`` lists.
+
+        Centroids are trained on a random sample of at most 64 rows per list and
+        every row is then assigned to its nearest centroid.
+        """
+        rng = np.random.default_rng(seed)
+        count = len(vectors)
+        n_lists = max(1, min(n_lists, count))
+        sample_size = min(count, max(n_lists * 64, 10000))
+        sample_rows = np.sort(rng.choice(count, sample_size, replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = cls._assign(sample, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=n_lists)
+            used = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts[used])[:-1]))
+            centroids[used] = np.add.reduceat(sample[order], starts, axis=0)
+            # Re-seed empty lists with random sample points.
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(sample_size, len(empty))]
+            normalize(centroids)
+
+        assign = cls._assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(n_lists + 1)).astype(np.int64)
+        return cls(centroids, order, offsets, version=version)
+
+    def search(self, vectors, query, top_k, nprobe=None):
+        """
+        Score ``query`` against the rows of the ``nprobe`` closest lists.
+
+        ``nprobe`` defaults to ``default_nprobe``, so recall holds up as the
+        list count grows with the catalog.
+
+        Returns:
+            Tuple of (row indices, cosine scores), best match first.
+        """
+        if nprobe is None:
+            nprobe = self.default_nprobe(self.n_lists)
+        nprobe = max(1, min(nprobe, self.n_lists))
+        lists = top_k_rows(self.centroids @ query, nprobe)
+        candidates = np.concatenate(
+            [self.order[self.offsets[lst]:self.offsets[lst + 1]] for lst in lists]
+        )
+        # Sorted rows keep reads from a memory-mapped matrix sequential.
+        candidates.sort()
+        scores = vectors[candidates] @ query
+        best = top_k_rows(scores, top_k)
+        return candidates[best], scores[best]
+
+    def remap(self, new_rows, vectors, added, version=None):
+        """
+        Carry the lists over to an updated matrix without re-clustering.
+
+        ``new_rows[i]`` is the row that old row ``i`` moved to, or -1 if it was
+        removed. The ``added`` rows of ``vectors`` are assigned to their nearest
+        centroid.
+        """
+        lists = np.repeat(np.arange(self.n_lists), np.diff(self.offsets))
+        rows = new_rows[self.order]
+        kept = rows >= 0
+        lists = np.concatenate([lists[kept], self._assign(vectors[added], self.centroids)])
+        rows = np.concatenate([rows[kept], added])
+        order = np.argsort(lists, kind="stable")
+        offsets = np.searchsorted(lists[order], np.arange(self.n_lists + 1)).astype(np.int64)
+        return IVFIndex(self.centroids, rows[order], offsets, version=version)
+
+    def save(self, path):
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    order=self.order,
+                    offsets=self.offsets,
+                    version=np.array(self.version or ""),
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    @classmethod
+    def load(cls, path, version=None):
+        """Load a saved index, or None if it is missing or built for another catalog."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved_version = str(data["version"])
+                if version is not None and saved_version != version:
+                    return None
+                return cls(
+                    data["centroids"],
+                    data["order"],
+                    data["offsets"],
+                    version=saved_version,
+                )
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"No usable IVF index at {path}: {e}")
+            return None
@@ -0,0 +1,346 @@
+import gzip
+import io
+import json
+import logging
+from collections import Counter
+from decimal import Decimal
+
+import numpy as np
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CatalogVersion, Products, decode_embedding
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+logger = logging.getLogger(__name__)
+
+# Product fields an import may set; the rest of an item is ignored.
+IMPORT_FIELDS = ("name", "price", "attributes", "image")
+
+
+def open_catalog(path, mode="r"):
+    """
+    Open a catalog file as text, compressed according to its extension.
+
+    ``.gz`` files are gzip-compressed and ``.zst`` files zstd-compressed (which
+    needs Python 3.14 or the ``zstandard`` package); anything else is plain.
+    """
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstd is None:
+            raise ImportError("zstd compression needs Python 3.14+ or the zstandard package")
+        if hasattr(zstd, "open"):
+            return zstd.open(path, mode + "t", encoding="utf-8")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            stream = zstd.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = zstd.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def iter_json_items(f, chunk_size=1 << 16):
+    """
+    Yield the values of a JSON array or of NDJSON (one value per line) from ``f``.
+
+    The file is read ``chunk_size`` characters at a time and each value is
+    decoded as soon as it is complete, so memory stays flat however large
+    the file is.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip(" \t\r\n")
+    array = pos < len(buffer) and buffer[pos] == "["
+    if array:
+        pos += 1
+    separators = " \t\r\n," if array else " \t\r\n"
+    while True:
+        skip(separators)
+        if pos >= len(buffer):
+            if array:
+                raise ValueError("Unterminated JSON array")
+            return
+        if array and buffer[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The value runs past the end of the buffer.
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A number may continue in the next chunk; decode it again with more input.
+            fill()
+            continue
+        pos = end
+        yield value
+
+
+def _natural_key(item, key):
+    """Value of ``key`` ("name", "image" or "attributes.<name>") in an import item."""
+    if key.startswith("attributes."):
+        return (item.get("attributes") or {}).get(key.split(".", 1)[1])
+    return item.get(key)
+
+
+def _existing_by_key(key, values):
+    """Map natural key values to the ids of the products that have them."""
+    if key.startswith("attributes."):
+        name = key.split(".", 1)[1]
+        rows = Products.objects.filter(**{f"attributes__{name}__in": values}).values_list("id", "attributes")
+        return {attributes.get(name): pk for pk, attributes in rows}
+    return dict(Products.objects.filter(**{f"{key}__in": values}).values_list(key, "id"))
+
+
+def _product(item, vector):
+    created_at = item.get("created_at")
+    product = Products(
+        name=item.get("name"),
+        price=Decimal(str(item.get("price", "0.00"))),
+        attributes=item.get("attributes", {}),
+        image=item.get("image"),
+        created_at=parse_datetime(created_at) if created_at else None,
+    )
+    product.set_embedding(
+        vector,
+        text_hash=item.get("embedding_hash", ""),
+        model_id=item.get("embedding_model", ""),
+    )
+    return product
+
+
+def _restore_created_at(products, created_at):
+    """Write back the imported ``created_at`` values, which ``bulk_create`` replaces via ``auto_now_add``."""
+    dated = []
+    for product, value in zip(products, created_at):
+        if value is not None:
+            product.created_at = value
+            dated.append(product)
+    Products.objects.bulk_update(dated, ["created_at"])
+
+
+class ImportStats:
+    """Counts of an ``import_products`` run."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+
+    @property
+    def total(self):
+        return self.created + self.updated
+
+
+def _write_batch(batch, key, stats):
+    """Insert (or, with a natural ``key``, upsert) one batch of (item, vector) pairs."""
+    if key is None:
+        products = [_product(item, vector) for item, vector in batch]
+        created_at = [product.created_at for product in products]
+        with transaction.atomic(using=Products.objects.db):
+            change_seq = CatalogVersion.bump(Products.objects.db)
+            for product in products:
+                product.change_seq = change_seq
+            Products.objects.bulk_create(products)
+            _restore_created_at(products, created_at)
+        stats.created += len(products)
+        return
+
+    # The last occurrence of a key in the batch wins.
+    by_key = {}
+    for item, vector in batch:
+        value = _natural_key(item, key)
+        if value is None:
+            raise ValueError(f"Item has no '{key}': {item}")
+        by_key[value] = (item, vector)
+
+    with transaction.atomic(using=Products.objects.db):
+        existing = _existing_by_key(key, list(by_key))
+        created, updated = [], []
+        now = timezone.now()
+        change_seq = CatalogVersion.bump(Products.objects.db)
+        for value, (item, vector) in by_key.items():
+            product = _product(item, vector)
+            product.change_seq = change_seq
+            if value in existing:
+                product.pk = existing[value]
+                # bulk_update() does not apply auto_now.
+                product.updated_at = now
+                updated.append(product)
+            else:
+                created.append(product)
+        created_at = [product.created_at for product in created + updated]
+        Products.objects.bulk_create(created)
+        fields = list(IMPORT_FIELDS) + ["updated_at", "change_seq"]
+        # Products without a new vector keep the one they have.
+        Products.objects.bulk_update([p for p in updated if p.embedding is None], fields)
+        Products.objects.bulk_update(
+            [p for p in updated if p.embedding is not None],
+            fields + ["embedding", "embedding_dtype", "embedding_dim", "embedding_hash", "embedding_model"],
+        )
+        _restore_created_at(created + updated, created_at)
+    stats.created += len(created)
+    stats.updated += len(updated)
+
+
+def import_products(items, key=None, batch_size=1000, embeddings=None, on_batch=None):
+    """
+    Write ``items`` (dicts as produced by ``iter_json_items``) to the active organization.
+
+    Items are inserted with ``bulk_create``, ``batch_size`` at a time and one
+    transaction per batch. With a natural ``key`` ("name", "image" or
+    "attributes.<name>", e.g. "attributes.sku"), items whose key matches an
+    existing product update it instead of adding a duplicate.
+
+    Embeddings come from an item's ``embedding`` list or, when
+    ``embeddings`` is given, from its row in that (N, dim) array (typically a
+    memory-mapped ``.npy`` sidecar) named by its ``embedding_row``, or at the
+    item's position in the stream when it has none.
+    ``embedding_hash`` and ``embedding_model`` are kept when the items carry
+    them, so ``embed_products`` can tell the vectors are up to date.
+
+    ``on_batch(stats)`` is called after every batch.
+
+    Returns:
+        The final ``ImportStats``.
+    """
+    stats = ImportStats()
+    batch = []
+    position = -1
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"Expected a product object at position {position}, got {type(item).__name__}")
+        vector = item.get("embedding")
+        if embeddings is not None:
+            # Exported catalogs name each product's row (None: no embedding).
+            row = item.get("embedding_row", position)
+            if row is not None and row >= len(embeddings):
+                raise ValueError(f"Embedding sidecar has {len(embeddings)} rows, product {position} needs row {row}")
+            vector = None if row is None else embeddings[row]
+        batch.append((item, vector))
+        if len(batch) >= batch_size:
+            _write_batch(batch, key, stats)
+            batch = []
+            if on_batch is not None:
+                on_batch(stats)
+    if batch:
+        _write_batch(batch, key, stats)
+        if on_batch is not None:
+            on_batch(stats)
+    return stats
+
+
+def load_embeddings(path):
+    """Memory-map an ``.npy`` embedding sidecar read-only."""
+    embeddings = np.load(path, mmap_mode="r")
+    if embeddings.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding array in {path}, got shape {embeddings.shape}")
+    return embeddings
+
+
+def _sidecar_shape(products):
+    """Most common embedding dimension of ``products`` and how many rows have it."""
+    dims = Counter(dict(
+        products.exclude(embedding__isnull=True)
+        .order_by()
+        .values("embedding_dim")
+        .annotate(count=models.Count("id"))
+        .values_list("embedding_dim", "count")
+    ))
+    if not dims:
+        return 0, 0
+    dim, count = dims.most_common(1)[0]
+    return count, dim
+
+
+def export_products(f, embeddings_path=None, chunk_size=2000, on_chunk=None):
+    """
+    Write the products of the active organization to ``f`` as NDJSON, one line per product.
+
+    Rows are streamed with ``iterator()`` and written as they are read, so
+    memory stays flat. With ``embeddings_path``, vectors are written to a
+    float32 ``.npy`` sidecar through ``open_memmap`` and each line names its
+    ``embedding_row`` (None for products without an embedding, or with a
+    dimension other than the catalog's), together with the
+    ``embedding_model`` and ``embedding_hash`` it was computed with, so
+    ``import_products`` can restore it without calling the provider again.
+
+    ``on_chunk(count)`` is called every ``chunk_size`` products.
+
+    Returns:
+        Tuple of (products written, embeddings written).
+    """
+    products = Products.objects.order_by("id")
+    fields = ["name", "price", "attributes", "image", "created_at", "embedding_model", "embedding_hash"]
+    sidecar = None
+    if embeddings_path is not None:
+        capacity, dim = _sidecar_shape(products)
+        sidecar = np.lib.format.open_memmap(
+            embeddings_path, mode="w+", dtype=np.float32, shape=(capacity, dim)
+        )
+        fields += ["embedding", "embedding_dtype", "embedding_dim"]
+
+    count = rows = skipped = 0
+    try:
+        for values in products.values_list(*fields).iterator(chunk_size=chunk_size):
+            product = dict(zip(fields, values))
+            item = {
+                "name": product["name"],
+                "price": str(product["price"]),
+                "attributes": product["attributes"],
+                "image": product["image"],
+                "created_at": product["created_at"].isoformat() if product["created_at"] else None,
+            }
+            if sidecar is not None:
+                item["embedding_row"] = None
+                if product["embedding"] is not None:
+                    # Products added since the sidecar was sized are left without one.
+                    if product["embedding_dim"] == sidecar.shape[1] and rows < len(sidecar):
+                        sidecar[rows] = decode_embedding(product["embedding"], product["embedding_dtype"])
+                        item["embedding_row"] = rows
+                        item["embedding_model"] = product["embedding_model"]
+                        item["embedding_hash"] = product["embedding_hash"]
+                        rows += 1
+                    else:
+                        skipped += 1
+            f.write(json.dumps(item, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+            if on_chunk is not None and count % chunk_size == 0:
+                on_chunk(count)
+    finally:
+        if sidecar is not None:
+            sidecar.flush()
+            del sidecar
+    if skipped:
+        logger.warning(f"Left {skipped} embeddings out of the sidecar (other dimension or added during export)")
+    return count, rows
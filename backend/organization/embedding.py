@@ -0,0 +1,261 @@
+import hashlib
+import logging
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from llm.rate_limit import call_with_retries, provider_slot
+
+from .models import CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+
+def product_embedding_text(name, attributes):
+    """Text a product is embedded from: its name followed by its attributes."""
+    text = f"{name} "
+    if attributes:
+        if isinstance(attributes, dict):
+            text += " ".join([f"{k}: {v}" for k, v in attributes.items()])
+        else:
+            text += str(attributes)
+    return text
+
+
+def embedding_text_hash(text):
+    """SHA-256 of the exact text sent to the embedding model."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def stale_products(products, model_id=None):
+    """
+    Find the ``products`` whose stored embedding is out of date.
+
+    A product is stale when it has no embedding, when it was embedded by a
+    model other than ``model_id`` (skipped when None) or when the hash of its
+    current text differs from the one it was embedded from. Only names and
+    attributes are read; nothing is sent to the provider.
+
+    Returns:
+        Tuple of (ids ordered by id, ``Counter`` of reasons: "missing",
+        "model", "text").
+    """
+    reasons = Counter()
+    stale = list(products.filter(embedding__isnull=True).values_list("id", flat=True))
+    reasons["missing"] = len(stale)
+    rows = products.exclude(embedding__isnull=True).values_list(
+        "id", "name", "attributes", "embedding_hash", "embedding_model"
+    )
+    for pk, name, attributes, text_hash, embedding_model in rows.iterator(chunk_size=2000):
+        if model_id is not None and embedding_model != model_id:
+            reasons["model"] += 1
+        elif text_hash != embedding_text_hash(product_embedding_text(name, attributes)):
+            reasons["text"] += 1
+        else:
+            continue
+        stale.append(pk)
+    stale.sort()
+    return stale, reasons
+
+
+class EmbeddingProgress:
+    """Running totals of an ``embed_products_batched`` run."""
+
+    def __init__(self, total):
+        self.total = total
+        self.embedded = 0
+        self.failed = 0
+        # Last product id of the batches finished in order, see finish_batch().
+        self.cursor = 0
+        self.started = time.perf_counter()
+        self._finished = {}
+        self._next_batch = 0
+
+    @property
+    def done(self):
+        return self.embedded + self.failed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        """Products embedded per second so far."""
+        return self.embedded / self.elapsed if self.elapsed else 0.0
+
+    def finish_batch(self, number, last_id):
+        """
+        Mark batch ``number`` done, embedded or failed.
+
+        Batches finish out of order when several run at once; the cursor only
+        moves past a batch once every batch before it is done too.
+        """
+        self._finished[number] = last_id
+        while self._next_batch in self._finished:
+            self.cursor = self._finished.pop(self._next_batch)
+            self._next_batch += 1
+
+
+def _batches(products, ids, batch_size):
+    """Yield ``(ids, texts)`` batches of the ``ids`` rows of ``products``."""
+    for start in range(0, len(ids), batch_size):
+        rows = products.filter(id__in=ids[start:start + batch_size]).order_by("id")
+        rows = list(rows.values_list("id", "name", "attributes"))
+        if rows:
+            yield [row[0] for row in rows], [product_embedding_text(row[1], row[2]) for row in rows]
+
+
+def _write_embeddings(products, ids, texts, vectors, model_id, in_transaction=None):
+    model = products.model
+    now = timezone.now()
+    objs = []
+    for pk, text, vector in zip(ids, texts, vectors):
+        obj = model(pk=pk, updated_at=now)
+        obj.set_embedding(vector, text_hash=embedding_text_hash(text), model_id=model_id)
+        objs.append(obj)
+    # bulk_update() neither fires the signals nor applies auto_now, so the
+    # rows are stamped with the bumped counter for the incremental index
+    # refresh here.
+    with transaction.atomic(using=products.db):
+        change_seq = CatalogVersion.bump(products.db)
+        for obj in objs:
+            obj.change_seq = change_seq
+        model.objects.using(products.db).bulk_update(
+            objs,
+            [
+                "embedding", "embedding_dtype", "embedding_dim",
+                "embedding_hash", "embedding_model", "updated_at", "change_seq",
+            ],
+        )
+        if in_transaction is not None:
+            in_transaction()
+
+
+def embed_products_batched(
+    products,
+    embedding_model,
+    ids=None,
+    batch_size=64,
+    concurrency=4,
+    limiter=None,
+    retries=3,
+    backoff=1.0,
+    on_batch=None,
+    checkpoint=None,
+):
+    """
+    Embed the ``ids`` rows of ``products`` (default: every row) in batches.
+
+    Vectors are stored with the hash of the text they were computed from and
+    the id of ``embedding_model``.
+    Up to ``concurrency`` ``embed_documents`` calls run at once in threads,
+    each waiting on ``limiter`` (a ``TokenBucket`` counting products) and
+    retried with backoff on failure. Results are written from the calling
+    thread, one ``bulk_update`` transaction per batch, so the database is
+    only touched from the thread that holds the organization context.
+    A batch that still fails after its retries is logged and skipped.
+
+    ``checkpoint(progress, ids, error)`` is called for every batch, inside its
+    write transaction when it succeeded (``error`` None) and with the
+    exception when it failed, once ``progress.cursor`` has been advanced; a
+    job table updated there never disagrees with the stored vectors.
+    ``on_batch(progress)`` is called after every batch.
+
+    Returns:
+        The final ``EmbeddingProgress``.
+    """
+    if ids is None:
+        ids = list(products.order_by("id").values_list("id", flat=True))
+    model_id = getattr(embedding_model, "model_id", "")
+    progress = EmbeddingProgress(len(ids))
+
+    def embed_documents(texts):
+        with provider_slot():
+            return embedding_model.embed_documents(texts)
+
+    def embed(texts):
+        if limiter is not None:
+            limiter.acquire(len(texts))
+        return call_with_retries(embed_documents, texts, retries=retries, backoff=backoff)
+
+    batches = enumerate(_batches(products, ids, batch_size))
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending = {}
+        while True:
+            # Keep a bounded number of batches in flight.
+            for number, (batch_ids, texts) in batches:
+                pending[executor.submit(embed, texts)] = (number, batch_ids, texts)
+                if len(pending) >= concurrency * 2:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                number, batch_ids, texts = pending.pop(future)
+                progress.finish_batch(number, batch_ids[-1])
+                in_transaction = None
+                if checkpoint is not None:
+                    in_transaction = partial(checkpoint, progress, batch_ids, None)
+                try:
+                    _write_embeddings(products, batch_ids, texts, future.result(), model_id, in_transaction)
+                    progress.embedded += len(batch_ids)
+                except Exception as e:
+                    logger.error(f"Failed to embed products {batch_ids[0]}-{batch_ids[-1]}: {e}")
+                    progress.failed += len(batch_ids)
+                    if checkpoint is not None:
+                        checkpoint(progress, batch_ids, e)
+                if on_batch is not None:
+                    on_batch(progress)
+    return progress
+
+
+def run_embedding_job(job, products, embedding_model, ids, retry_failed=False, **options):
+    """
+    Run ``job`` (an ``EmbeddingJob``) over the ``ids`` rows of ``products``.
+
+    The job's counters, cursor and failure list are saved with every batch,
+    so a job interrupted by a crash or restart is resumed after its last
+    committed batch. With ``retry_failed``, ``ids`` are the job's failed
+    products and are taken off its failure list as they succeed. Other
+    ``options`` are passed to ``embed_products_batched``.
+
+    Returns:
+        The ``EmbeddingProgress`` of this run.
+    """
+    def checkpoint(progress, batch_ids, error):
+        if error is None:
+            job.embedded += len(batch_ids)
+            if retry_failed:
+                done = set(batch_ids)
+                job.failed_ids = [pk for pk in job.failed_ids if pk not in done]
+                job.failed = len(job.failed_ids)
+        else:
+            job.error = str(error)
+            if not retry_failed:
+                job.failed_ids.extend(batch_ids)
+                job.failed += len(batch_ids)
+        if not retry_failed:
+            job.cursor = max(job.cursor, progress.cursor)
+        job.save()
+
+    job.status, job.error = "running", ""
+    job.embedding_model = getattr(embedding_model, "model_id", "")
+    job.save()
+    try:
+        progress = embed_products_batched(
+            products, embedding_model, ids=ids, checkpoint=checkpoint, **options
+        )
+    except BaseException as e:
+        job.status = "failed"
+        job.error = str(e) or type(e).__name__
+        job.save()
+        raise
+    job.status = "completed"
+    job.finished_at = timezone.now()
+    job.save()
+    return progress
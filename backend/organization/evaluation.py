@@ -0,0 +1,119 @@
+import hashlib
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .index import ProductIndex, normalize
+
+COLORS = ["Red", "Blue", "Black", "White", "Green", "Grey", "Navy", "Beige"]
+MATERIALS = ["Cotton", "Linen", "Wool", "Denim", "Silk", "Polyester"]
+CATEGORIES = ["Shirt", "T-Shirt", "Jeans", "Jacket", "Dress", "Sweater", "Shorts"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+
+
+def synthetic_catalog(count, dim, seed=0):
+    """
+    Deterministic synthetic catalog of ``count`` products with random unit vectors.
+
+    Returns:
+        Tuple of (ProductIndex with ids ``1..count``, one attributes dict per row).
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 65536):
+        end = min(start + 65536, count)
+        vectors[start:end] = rng.standard_normal((end - start, dim), dtype=np.float32)
+    normalize(vectors)
+
+    picks = {
+        "color": rng.integers(len(COLORS), size=count),
+        "material": rng.integers(len(MATERIALS), size=count),
+        "category": rng.integers(len(CATEGORIES), size=count),
+        "size": rng.integers(len(SIZES), size=count),
+    }
+    attributes = [
+        {
+            "color": COLORS[picks["color"][i]],
+            "material": MATERIALS[picks["material"][i]],
+            "category": CATEGORIES[picks["category"][i]],
+            "size": SIZES[picks["size"][i]],
+        }
+        for i in range(count)
+    ]
+    names = [
+        f"{a['color']} {a['material']} {a['category']} {i + 1}" for i, a in enumerate(attributes)
+    ]
+    prices = np.round(rng.uniform(199, 9999, size=count), 2)
+    index = ProductIndex(np.arange(1, count + 1), names, prices, [None] * count, vectors)
+    return index, attributes
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Offline stand-in for the embedding model.
+
+    Every text maps to a fixed random unit vector seeded from its hash, so runs
+    are reproducible without calling a provider.
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def embed_query(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_queries(self, texts):
+        return self.embed_documents(texts)
+
+
+def sample_queries(index, count, noise=0.05, seed=0):
+    """
+    Draw query vectors from the catalog itself.
+
+    Each query is a random product vector with a little Gaussian noise, so the
+    exact neighbours are not trivially the product it came from.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(count, len(index)), replace=False)
+    queries = np.asarray(index.vectors[np.sort(rows)], dtype=np.float32)
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(index.dim)
+    return normalize(queries)
+
+
+def exact_top_k(index, queries, top_k):
+    """Ground-truth rows for ``queries`` from a full-precision exact scan."""
+    return [rows for rows, _ in index.search_many(queries, top_k)]
+
+
+def recall_at_k(truth, found):
+    """Mean fraction of each exact top-k that the approximate search returned."""
+    hits = [len(np.intersect1d(t, f)) / max(len(t), 1) for t, f in zip(truth, found)]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def evaluate(index, queries, top_k, bot_settings=None, truth=None):
+    """
+    Run ``queries`` one at a time through ``index.search``.
+
+    Returns:
+        Dict with recall@k against ``truth`` (when given) and p50/p95/p99
+        latency in milliseconds.
+    """
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(query, top_k, bot_settings)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(rows)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    report = {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+    if truth is not None:
+        report["recall"] = recall_at_k(truth, found)
+    return report
@@ -0,0 +1,156 @@
+import logging
+import re
+
+import numpy as np
+
+from .lexical import attribute_values, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Extracted attribute keys that describe a price rather than a product attribute.
+PRICE_KEYS = {"price", "budget", "price_range", "min_price", "max_price"}
+
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+UPPER_BOUND_RE = re.compile(r"\b(under|below|less than|upto|up to|within|max(?:imum)?|<)")
+LOWER_BOUND_RE = re.compile(r"\b(over|above|more than|at least|min(?:imum)?|from|>)")
+
+
+def normalize_key(key):
+    return str(key).strip().lower().replace(" ", "_")
+
+
+def normalize_value(value):
+    return " ".join(tokenize(str(value)))
+
+
+def _numbers(text):
+    return [float(n.replace(",", "")) for n in NUMBER_RE.findall(str(text))]
+
+
+def price_range(attributes):
+    """
+    Parse a (low, high) price range out of extracted attributes.
+
+    Understands numeric ``min_price``/``max_price`` values as well as free text
+    such as "under 2000", "above 500" or "1000-2000" under ``price``,
+    ``budget`` or ``price_range``. Returns None if no price is mentioned.
+    """
+    low, high = None, None
+    for key, value in attributes.items():
+        key = normalize_key(key)
+        if key not in PRICE_KEYS or value in (None, ""):
+            continue
+        numbers = _numbers(value)
+        if not numbers:
+            continue
+        text = str(value).lower()
+        if key == "min_price":
+            low = numbers[0]
+        elif key == "max_price":
+            high = numbers[0]
+        elif len(numbers) >= 2:
+            low, high = min(numbers[:2]), max(numbers[:2])
+        elif LOWER_BOUND_RE.search(text):
+            low = numbers[0]
+        else:
+            # A bare budget ("2000", "under 2000") is a ceiling.
+            high = numbers[0]
+    if low is None and high is None:
+        return None
+    return low, high
+
+
+class AttributeFilterIndex:
+    """
+    Inverted index from attribute key/value to the rows carrying it.
+
+    Each ``(key, value)`` maps to a sorted int32 array of rows of the vector
+    index it was built for. Multi-word values are also indexed under each of
+    their words so "blue" matches "Navy Blue". Prices are kept sorted for
+    range lookups with ``searchsorted``.
+    """
+
+    def __init__(self, postings, prices):
+        self.postings = postings
+        self.keys = {key for key, _ in postings}
+        self.count = len(prices)
+        self.price_order = np.argsort(prices, kind="stable")
+        self.sorted_prices = np.asarray(prices)[self.price_order]
+
+    @property
+    def nbytes(self):
+        postings = sum(rows.nbytes for rows in self.postings.values())
+        return postings + self.price_order.nbytes + self.sorted_prices.nbytes
+
+    @classmethod
+    def build(cls, attributes, prices):
+        """Index ``attributes`` (one ``Products.attributes`` dict per row)."""
+        postings = {}
+        for row, product_attributes in enumerate(attributes):
+            if not isinstance(product_attributes, dict):
+                continue
+            for key, value in product_attributes.items():
+                key = normalize_key(key)
+                terms = set()
+                for item in attribute_values(value):
+                    item = normalize_value(item)
+                    terms.add(item)
+                    terms.update(item.split())
+                for term in terms:
+                    postings.setdefault((key, term), []).append(row)
+        postings = {k: np.asarray(v, dtype=np.int32) for k, v in postings.items()}
+        return cls(postings, prices)
+
+    def _value_rows(self, key, value):
+        value = normalize_value(value)
+        rows = self.postings.get((key, value))
+        if rows is not None or not value:
+            return rows
+        # Fall back to products matching every word of a multi-word value.
+        words = [self.postings.get((key, word)) for word in value.split()]
+        if any(w is None for w in words):
+            return np.empty(0, dtype=np.int32)
+        rows = words[0]
+        for other in words[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def candidates(self, attributes):
+        """
+        Rows matching every known attribute and the price range in ``attributes``.
+
+        Values of one key are OR-ed (a list means "any of"), keys are AND-ed.
+        Keys the catalog does not use are ignored. Returns None when nothing
+        could be filtered on, or when the filters exclude every product, so the
+        caller falls back to searching the whole catalog.
+        """
+        if not attributes:
+            return None
+        mask = None
+        for key, value in attributes.items():
+            key = normalize_key(key)
+            if key in PRICE_KEYS or key not in self.keys or value in (None, "", []):
+                continue
+            key_mask = np.zeros(self.count, dtype=bool)
+            for item in attribute_values(value):
+                rows = self._value_rows(key, item)
+                if rows is not None:
+                    key_mask[rows] = True
+            mask = key_mask if mask is None else mask & key_mask
+
+        prices = price_range(attributes)
+        if prices is not None:
+            low, high = prices
+            start = 0 if low is None else np.searchsorted(self.sorted_prices, low, "left")
+            end = self.count if high is None else np.searchsorted(self.sorted_prices, high, "right")
+            price_mask = np.zeros(self.count, dtype=bool)
+            price_mask[self.price_order[start:end]] = True
+            mask = price_mask if mask is None else mask & price_mask
+
+        if mask is None:
+            return None
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            logger.info(f"Attribute filters {attributes} matched no products; not filtering")
+            return None
+        return rows
@@ -0,0 +1,831 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .models import BotSettings, CatalogVersion, Products, decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout changes so old files are rebuilt.
+INDEX_FORMAT_VERSION = 2
+
+# Changed products an index is refreshed in place for (or 10% of the catalog,
+# whichever is more) before a full rebuild is cheaper.
+REFRESH_MAX_ROWS = 1000
+
+# How far before the newest ``updated_at`` an index has seen a refresh also
+# looks for writes that bypassed the change counter, whose timestamps may have
+# been taken before an earlier-stamped row committed.
+REFRESH_WATERMARK_MARGIN = timedelta(minutes=1)
+
+# Smallest row range worth scanning on its own thread.
+SHARD_MIN_ROWS = 20000
+
+
+def index_paths(org_slug):
+    """Paths of the vector matrix and its metadata sidecar, next to the tenant DB."""
+    db_dir = settings.BASE_DIR / "db"
+    return db_dir / f"{org_slug}.vectors.npy", db_dir / f"{org_slug}.vectors.json"
+
+
+def ann_path(org_slug):
+    return settings.BASE_DIR / "db" / f"{org_slug}.ivf.npz"
+
+
+def projection_path(org_slug):
+    return settings.BASE_DIR / "db" / f"{org_slug}.pca.npz"
+
+
+def quantized_path(org_slug, kind):
+    return settings.BASE_DIR / "db" / f"{org_slug}.{kind}.npy"
+
+
+def normalize(vectors):
+    """L2-normalize the rows of ``vectors`` in place (zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def top_k_rows(scores, top_k):
+    """
+    Return the row indices of the ``top_k`` highest scores, best first.
+
+    Uses ``argpartition`` so only the winners are sorted. Equal scores come
+    lowest row first, so sharded and single scans rank ties alike.
+    """
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        rows = np.sort(np.argpartition(-scores, k - 1)[:k])
+    else:
+        rows = np.arange(len(scores))
+    return rows[np.argsort(-scores[rows], kind="stable")]
+
+
+def embedded_products():
+    """
+    Products of the active organization with an embedding the index can use.
+
+    Once ``EMBEDING_MODEL`` names a model, vectors computed by any other model
+    are left out rather than mixed into its vector space; products with no
+    recorded model (embedded before it was tracked) are kept.
+    """
+    from llm.llm import LLM
+
+    products = Products.objects.exclude(embedding__isnull=True)
+    model_id = LLM.get_embedding_model_id()
+    if model_id is not None:
+        products = products.filter(embedding_model__in=[model_id, ""])
+    return products
+
+
+def read_rows(queryset, dim=None):
+    """
+    Read the ids, names, prices, images and normalized vectors of ``queryset``.
+
+    Rows come back ordered by id. Embeddings whose dimension differs from
+    ``dim`` (or from the first row when ``dim`` is None) are skipped.
+    """
+    rows = queryset.order_by("id").values_list(
+        "id", "name", "price", "image", "embedding", "embedding_dtype"
+    )
+    ids, names, prices, images, embeddings = [], [], [], [], []
+    skipped = 0
+    for pk, name, price, image, data, dtype in rows.iterator(chunk_size=2000):
+        embedding = decode_embedding(data, dtype)
+        if embedding is None or not len(embedding):
+            continue
+        if dim is None:
+            dim = len(embedding)
+        if len(embedding) != dim:
+            skipped += 1
+            continue
+        ids.append(pk)
+        names.append(name)
+        prices.append(float(price))
+        images.append(image or None)
+        embeddings.append(embedding)
+
+    if skipped:
+        logger.warning(f"Skipped {skipped} products whose embedding dimension differs from {dim}")
+
+    if embeddings:
+        # One copy from the raw buffers; float16 rows are widened here.
+        vectors = np.vstack(embeddings).astype(np.float32, copy=False)
+    else:
+        vectors = np.empty((0, dim or 0), dtype=np.float32)
+    return ids, names, prices, images, normalize(vectors)
+
+
+class ProductIndex:
+    """
+    Vector index over the embedded products of one organization.
+
+    Embeddings are kept as a single contiguous float32 matrix of L2-normalized
+    rows, so cosine similarity against a query is one matrix-vector product.
+    Row ``i`` of ``vectors`` lines up with ``ids[i]``, ``names[i]``,
+    ``prices[i]`` and ``images[i]``.
+    """
+
+    def __init__(self, ids, names, prices, images, vectors, version=None, org_slug=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = np.asarray(names, dtype=object)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.images = np.asarray(images, dtype=object)
+        self.vectors = vectors
+        self.version = version
+        self.org_slug = org_slug
+        self._ann = {}
+        self._lexical = None
+        self._filters = None
+        self._quantized = {}
+        self._projections = {}
+        self._lock = threading.Lock()
+        # Called after a derived index is built, so the cache holding this
+        # index can re-check its byte budget.
+        self.on_resize = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    @property
+    def nbytes(self):
+        """Approximate resident size: the vectors plus the derived indexes built so far."""
+        total = self.vectors.nbytes + self.ids.nbytes + self.prices.nbytes
+        total += self.names.nbytes + self.images.nbytes
+        total += sum(ann.nbytes for ann in self._ann.values())
+        total += sum(quantized.nbytes for quantized in self._quantized.values())
+        total += sum(projection.nbytes for projection in self._projections.values())
+        for derived in (self._lexical, self._filters):
+            if derived is not None:
+                total += derived.nbytes
+        return total
+
+    def _resized(self):
+        if self.on_resize is not None:
+            self.on_resize()
+
+    @classmethod
+    def build(cls, version=None, org_slug=None):
+        """Load every embedded product of the active organization."""
+        ids, names, prices, images, vectors = read_rows(embedded_products())
+        return cls(ids, names, prices, images, vectors, version=version, org_slug=org_slug)
+
+    def save(self, org_slug):
+        """
+        Write the index next to the organization database.
+
+        Both files are written to temporary paths first and swapped in with
+        ``os.replace`` so readers never see a half-written file.
+        """
+        vectors_path, meta_path = index_paths(org_slug)
+        meta = {
+            "format": INDEX_FORMAT_VERSION,
+            "catalog_version": self.version,
+            "count": len(self),
+            "dim": self.dim,
+            "ids": self.ids.tolist(),
+            "names": self.names.tolist(),
+            "prices": self.prices.tolist(),
+            "images": self.images.tolist(),
+        }
+        tmp_vectors = vectors_path.with_name(vectors_path.name + f".{os.getpid()}.tmp")
+        tmp_meta = meta_path.with_name(meta_path.name + f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_vectors, "wb") as f:
+                np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_vectors, vectors_path)
+            os.replace(tmp_meta, meta_path)
+        finally:
+            for path in (tmp_vectors, tmp_meta):
+                if path.exists():
+                    path.unlink()
+
+    @classmethod
+    def load(cls, org_slug, version=None):
+        """
+        Open a saved index with the vectors memory-mapped read-only.
+
+        The OS page cache then holds a single copy of the matrix shared by every
+        worker process. Returns None if the file is missing, was written by a
+        different format or does not match ``version``.
+        """
+        vectors_path, meta_path = index_paths(org_slug)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != INDEX_FORMAT_VERSION:
+                return None
+            if version is not None and meta.get("catalog_version") != version:
+                return None
+            vectors = np.load(vectors_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.debug(f"No usable search index file for '{org_slug}': {e}")
+            return None
+
+        if vectors.shape != (meta["count"], meta["dim"]):
+            # Vectors were swapped by a concurrent rebuild after we read the metadata.
+            return None
+        return cls(
+            meta["ids"],
+            meta["names"],
+            meta["prices"],
+            meta["images"],
+            vectors,
+            version=meta["catalog_version"],
+            org_slug=org_slug,
+        )
+
+    def refresh(self, version):
+        """
+        Return a copy of the index with the catalog changes since it was built merged in.
+
+        Products whose ``change_seq`` is above the counter the index was built
+        at (plus any saved within ``REFRESH_WATERMARK_MARGIN`` of the newest
+        ``updated_at`` it has seen, for writes that skip the counter) are
+        re-read and merged by id, and products that were deleted or no longer
+        have a usable embedding are dropped, so the rest of the matrix is
+        never read back from the database. IVF lists, PCA projections and quantized
+        matrices are carried over, with changed rows re-assigned, re-projected
+        or re-encoded; the lexical and filter indexes are rebuilt lazily. Returns None when so much has
+        changed that a full rebuild is cheaper.
+        """
+        counter, _, watermark = parse_version(self.version)
+        if not len(self):
+            return None
+        since = Q(change_seq__gt=counter)
+        if watermark is not None:
+            since |= Q(updated_at__gte=watermark - REFRESH_WATERMARK_MARGIN)
+        changed = Products.objects.filter(since)
+        if changed.count() > max(REFRESH_MAX_ROWS, len(self) // 10):
+            return None
+
+        embedded = embedded_products()
+        ids, names, prices, images, vectors = read_rows(embedded.filter(since), dim=self.dim)
+        ids = np.asarray(ids, dtype=np.int64)
+        cleared = np.fromiter(
+            changed.exclude(id__in=embedded.values("id")).values_list("id", flat=True), dtype=np.int64
+        )
+        # Re-read rows replace their old version; cleared rows just go.
+        replaced = np.isin(self.ids, ids, assume_unique=True)
+        removed = replaced | np.isin(self.ids, cleared, assume_unique=True)
+        if len(self) - removed.sum() + len(ids) != embedded.count():
+            # Some products were deleted; only their ids are needed to find them.
+            current = np.fromiter(
+                embedded.values_list("id", flat=True)
+                .iterator(chunk_size=10000),
+                dtype=np.int64,
+            )
+            removed |= ~np.isin(self.ids, current, assume_unique=True)
+
+        keep = np.flatnonzero(~removed)
+        merged_ids = np.concatenate([self.ids[keep], ids])
+        order = np.argsort(merged_ids, kind="stable")
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        moved, added = position[:len(keep)], position[len(keep):]
+
+        merged = np.empty((len(order), self.dim), dtype=np.float32)
+        merged[moved] = self.vectors[keep]
+        merged[added] = vectors
+        index = ProductIndex(
+            merged_ids[order],
+            np.concatenate([self.names[keep], np.asarray(names, dtype=object)])[order],
+            np.concatenate([self.prices[keep], np.asarray(prices, dtype=np.float64)])[order],
+            np.concatenate([self.images[keep], np.asarray(images, dtype=object)])[order],
+            merged,
+            version=version,
+            org_slug=self.org_slug,
+        )
+
+        new_rows = np.full(len(self), -1, dtype=np.int64)
+        new_rows[keep] = moved
+        with self._lock:
+            index._ann = {
+                n_lists: ann.remap(new_rows, merged, added, version=version)
+                for n_lists, ann in self._ann.items()
+            }
+            index._projections = {
+                n_components: projection.remap(new_rows, merged, added, version=version)
+                for n_components, projection in self._projections.items()
+            }
+            index._quantized = {
+                kind: quantized.remap(new_rows, merged, added, version=version)
+                for kind, quantized in self._quantized.items()
+            }
+        logger.info(
+            f"Refreshed search index for '{self.org_slug}': {len(ids)} upserted, "
+            f"{removed.sum() - replaced.sum()} removed"
+        )
+        return index
+
+    def get_ann(self, bot_settings):
+        """
+        Return the approximate index selected by ``bot_settings``.
+
+        Returns None when the organization uses exact search or the catalog is
+        smaller than ``SEARCH_ANN_MIN_PRODUCTS``, where a full scan is cheap
+        enough. The IVF lists are fitted once per catalog version and cached on
+        disk next to the vectors.
+        """
+        if bot_settings is None or bot_settings.search_engine != "ivf":
+            return None
+        if len(self) < settings.SEARCH_ANN_MIN_PRODUCTS:
+            return None
+
+        from .ann import IVFIndex
+
+        n_lists = min(bot_settings.ivf_lists or IVFIndex.default_lists(len(self)), len(self))
+        with self._lock:
+            ann = self._ann.get(n_lists)
+            if ann is not None:
+                return ann
+
+            path = ann_path(self.org_slug) if self.org_slug else None
+            if path is not None:
+                ann = IVFIndex.load(path, version=self.version)
+            if ann is None or ann.n_lists != n_lists:
+                ann = IVFIndex.fit(self.vectors, n_lists, version=self.version)
+                logger.info(f"Fitted IVF index with {n_lists} lists for '{self.org_slug}'")
+                if path is not None:
+                    try:
+                        ann.save(path)
+                    except OSError as e:
+                        logger.warning(f"Could not write IVF index file {path}: {e}")
+            self._ann[n_lists] = ann
+        self._resized()
+        return ann
+
+    def get_projection(self, bot_settings):
+        """
+        Return the PCA projection selected by ``bot_settings.pca_components``, or None.
+
+        Fitted once per catalog version and cached on disk next to the vectors,
+        like the IVF lists.
+        """
+        if bot_settings is None or not bot_settings.pca_components or not len(self):
+            return None
+        if bot_settings.pca_components >= self.dim:
+            return None
+
+        from .projection import PCAProjection
+
+        n_components = bot_settings.pca_components
+        with self._lock:
+            projection = self._projections.get(n_components)
+            if projection is not None:
+                return projection
+
+            path = projection_path(self.org_slug) if self.org_slug else None
+            if path is not None:
+                projection = PCAProjection.load(path, version=self.version)
+            if (
+                projection is None
+                or projection.n_components != n_components
+                or len(projection.reduced) != len(self)
+            ):
+                projection = PCAProjection.fit(self.vectors, n_components, version=self.version)
+                logger.info(
+                    f"Fitted PCA with {n_components} components for '{self.org_slug}', "
+                    f"explained variance {projection.explained_variance:.3f}"
+                )
+                if path is not None:
+                    try:
+                        projection.save(path)
+                    except OSError as e:
+                        logger.warning(f"Could not write PCA projection file {path}: {e}")
+            self._projections[n_components] = projection
+        self._resized()
+        return projection
+
+    def get_quantized(self, bot_settings):
+        """
+        Return the quantized matrix selected by ``bot_settings``, or None.
+
+        Built once per catalog version and cached on disk next to the vectors,
+        like the IVF lists; the saved matrix is memory-mapped, so workers
+        share it and only the re-ranked float32 rows are ever read.
+        """
+        if bot_settings is None or bot_settings.search_quantization == "none":
+            return None
+        from .quantization import QuantizedMatrix
+
+        kind = bot_settings.search_quantization
+        with self._lock:
+            quantized = self._quantized.get(kind)
+            if quantized is not None:
+                return quantized
+
+            path = quantized_path(self.org_slug, kind) if self.org_slug else None
+            if path is not None:
+                quantized = QuantizedMatrix.load(path, version=self.version)
+            if quantized is None or quantized.data.shape != self.vectors.shape:
+                quantized = QuantizedMatrix.build(self.vectors, kind, version=self.version)
+                logger.info(f"Built {kind} quantized vectors for '{self.org_slug}'")
+                if path is not None:
+                    try:
+                        quantized.save(path)
+                    except OSError as e:
+                        logger.warning(f"Could not write quantized vectors file {path}: {e}")
+            self._quantized[kind] = quantized
+        self._resized()
+        return quantized
+
+    def _load_attributes(self):
+        """Read ``Products.attributes`` for every row of the index, in row order."""
+        attributes = [None] * len(self)
+        products = Products.objects.order_by("id").values_list("id", "attributes")
+        for pk, product_attributes in products.iterator(chunk_size=2000):
+            row = np.searchsorted(self.ids, pk)
+            if row < len(self) and self.ids[row] == pk:
+                attributes[row] = product_attributes
+        return attributes
+
+    def get_lexical(self):
+        """
+        Return the BM25 index over product names and attribute values.
+
+        Built lazily from the database on first use; row ``i`` matches row ``i``
+        of this index.
+        """
+        from .lexical import BM25Index, attribute_values
+
+        with self._lock:
+            if self._lexical is not None:
+                return self._lexical
+            documents = [
+                " ".join([name, *attribute_values(attributes)])
+                for name, attributes in zip(self.names, self._load_attributes())
+            ]
+            self._lexical = BM25Index.build(documents)
+        self._resized()
+        return self._lexical
+
+    def get_filters(self):
+        """Return the attribute/price pre-filter index, built lazily like ``get_lexical``."""
+        from .filters import AttributeFilterIndex
+
+        with self._lock:
+            if self._filters is not None:
+                return self._filters
+            self._filters = AttributeFilterIndex.build(self._load_attributes(), self.prices)
+        self._resized()
+        return self._filters
+
+    def _vector_search(self, query, top_k, bot_settings, candidates=None):
+        if candidates is not None:
+            # Pre-filtered subsets are scored exactly. A large subset is cheaper
+            # to take from one full matrix-vector product than to gather.
+            if len(candidates) * 2 > len(self):
+                scores = (self.vectors @ query)[candidates]
+            else:
+                scores = self.vectors[candidates] @ query
+            best = top_k_rows(scores, top_k)
+            return candidates[best], scores[best]
+
+        ann = self.get_ann(bot_settings)
+        if ann is not None:
+            return ann.search(self.vectors, query, top_k, bot_settings.ivf_nprobe)
+
+        shards = self.shard_count(bot_settings)
+        approximate = self.get_projection(bot_settings) or self.get_quantized(bot_settings)
+        if approximate is not None:
+            # Coarse top-N on the reduced or compressed matrix, then exact
+            # re-ranking of only those rows against the full vectors.
+            pool = max(bot_settings.rerank_candidates, top_k)
+            if shards > 1:
+                coarse, _ = self._sharded_top_k(
+                    lambda start, end: approximate.scores(query, start, end), pool, shards
+                )
+            else:
+                coarse = top_k_rows(approximate.scores(query), pool)
+            coarse.sort()
+            scores = self.vectors[coarse] @ query
+            best = top_k_rows(scores, top_k)
+            return coarse[best], scores[best]
+
+        if shards > 1:
+            return self._sharded_top_k(
+                lambda start, end: self.vectors[start:end] @ query, top_k, shards
+            )
+        scores = self.vectors @ query
+        rows = top_k_rows(scores, top_k)
+        return rows, scores[rows]
+
+    def shard_count(self, bot_settings):
+        """Shards a full scan is split into, keeping at least ``SHARD_MIN_ROWS`` rows each."""
+        if bot_settings is None or bot_settings.search_shards <= 1:
+            return 1
+        return max(1, min(bot_settings.search_shards, len(self) // SHARD_MIN_ROWS))
+
+    def _sharded_top_k(self, score_rows, top_k, shards):
+        """
+        Scatter a full scan over ``shards`` contiguous row ranges and gather the top-k.
+
+        ``score_rows(start, end)`` scores one range. Ranges run on the shared
+        shard thread pool (NumPy releases the GIL inside the matrix products),
+        each keeps its own top-k, and the per-shard winners are merged with a
+        heap.
+        """
+        bounds = np.linspace(0, len(self), shards + 1).astype(np.int64)
+
+        def scan(start, end):
+            scores = score_rows(start, end)
+            rows = top_k_rows(scores, top_k)
+            return (rows + start).tolist(), scores[rows].tolist()
+
+        futures = [
+            shard_pool().submit(scan, start, end) for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        best = list(islice(
+            heapq.merge(
+                *[zip(*future.result()) for future in futures], key=lambda hit: -hit[1]
+            ),
+            top_k,
+        ))
+        rows = np.fromiter((row for row, _ in best), dtype=np.int64, count=len(best))
+        scores = np.fromiter((score for _, score in best), dtype=np.float32, count=len(best))
+        return rows, scores
+
+    def _hybrid_search(self, query, query_text, top_k, bot_settings, candidates=None):
+        """
+        Fuse vector and BM25 rankings with reciprocal-rank fusion.
+
+        Both engines contribute a candidate pool a few times larger than
+        ``top_k``; the fused winners are then scored by cosine similarity so
+        the returned scores stay comparable with vector-only search.
+        """
+        from .lexical import reciprocal_rank_fusion
+
+        pool = max(top_k * 4, 50)
+        vector_rows, _ = self._vector_search(query, pool, bot_settings, candidates)
+        lexical_rows, _ = self.get_lexical().search(query_text, pool, rows=candidates)
+        rows, _ = reciprocal_rank_fusion(
+            [vector_rows, lexical_rows], weights=[1.0, bot_settings.lexical_weight]
+        )
+        rows = rows[:top_k]
+        return rows, np.asarray(self.vectors[rows] @ query)
+
+    def search(self, query_vector, top_k, bot_settings=None, query_text=None, attributes=None):
+        """
+        Score ``query_vector`` against the catalog.
+
+        Uses the engine selected in ``bot_settings`` (exact scan by default) and,
+        when hybrid search is enabled, fuses it with BM25 over ``query_text``.
+        Extracted ``attributes`` (colour, size, price range, ...) first narrow
+        the catalog to the matching rows, and only those are scored. With
+        ``mmr_lambda`` set, a pool of ``mmr_candidates`` hits is re-ranked by
+        maximal marginal relevance so near-identical variants do not crowd out
+        the rest.
+
+        Returns:
+            Tuple of (row indices, cosine scores), best match first.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize(np.array(query_vector, dtype=np.float32))
+
+        candidates = self.get_filters().candidates(attributes) if attributes else None
+
+        mmr_lambda = bot_settings.mmr_lambda if bot_settings is not None else None
+        pool = max(bot_settings.mmr_candidates, top_k) if mmr_lambda is not None else top_k
+
+        if bot_settings is not None and bot_settings.hybrid_search and query_text:
+            rows, scores = self._hybrid_search(query, query_text, pool, bot_settings, candidates)
+        else:
+            rows, scores = self._vector_search(query, pool, bot_settings, candidates)
+
+        if mmr_lambda is not None:
+            from .mmr import maximal_marginal_relevance
+
+            picked = maximal_marginal_relevance(self.vectors[rows], scores, top_k, mmr_lambda)
+            rows, scores = rows[picked], scores[picked]
+        return rows, scores
+
+    def search_many(self, query_vectors, top_k, bot_settings=None):
+        """
+        Score a batch of queries against the catalog.
+
+        Exact search computes the score matrix block by block with one
+        matrix-matrix product per block, bounding its size to ~64 MB.
+
+        Returns:
+            One ``(row indices, cosine scores)`` tuple per query.
+        """
+        if not len(self):
+            # The empty matrix has no dimension to reshape the queries to.
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty for _ in query_vectors]
+
+        queries = normalize(np.array(query_vectors, dtype=np.float32).reshape(-1, self.dim))
+
+        ann = self.get_ann(bot_settings)
+        if ann is not None:
+            return [
+                ann.search(self.vectors, query, top_k, bot_settings.ivf_nprobe)
+                for query in queries
+            ]
+
+        k = min(top_k, len(self))
+        block = max(1, (64 << 20) // (4 * len(self)))
+        results = []
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ self.vectors.T
+            if k < len(self):
+                rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                rows = np.broadcast_to(np.arange(len(self)), scores.shape)
+            top = np.take_along_axis(scores, rows, axis=1)
+            order = np.argsort(-top, axis=1, kind="stable")
+            rows = np.take_along_axis(rows, order, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            results.extend(zip(rows, top))
+        return results
+
+
+_shard_pool = None
+_shard_pool_lock = threading.Lock()
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def shard_pool():
+    """Thread pool shared by sharded scans, sized by ``SEARCH_SHARD_THREADS`` (default: CPU count)."""
+    global _shard_pool
+    with _shard_pool_lock:
+        if _shard_pool is None:
+            _shard_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "SEARCH_SHARD_THREADS", None) or os.cpu_count(),
+                thread_name_prefix="search-shard",
+            )
+        return _shard_pool
+
+
+def get_index_cache():
+    """
+    Return the process-wide ``IndexCache``.
+
+    ``SEARCH_INDEX_CACHE_BYTES`` sets the byte budget shared by all
+    organizations and ``SEARCH_INDEX_PINNED`` lists organizations that are
+    never evicted.
+    """
+    global _index_cache
+    with _index_cache_lock:
+        if _index_cache is None:
+            from aichatbot.cache import register_cache
+
+            from .index_cache import IndexCache
+
+            _index_cache = register_cache("search_indexes", IndexCache(
+                budget=getattr(settings, "SEARCH_INDEX_CACHE_BYTES", None),
+                pinned=getattr(settings, "SEARCH_INDEX_PINNED", ()),
+            ))
+        return _index_cache
+
+
+def catalog_version():
+    """
+    Fingerprint of the active organization's catalog, read without scanning it.
+
+    Combines the ``CatalogVersion`` counter, bumped by every signal-firing
+    save or delete and by the bulk embedding and import paths, with the
+    highest product id and the latest ``updated_at`` (both read off an
+    index), which also catch bulk inserts and updates that bypass the
+    counter, and the embedding model the index is built with.
+    """
+    from llm.llm import LLM
+
+    counter = CatalogVersion.current()
+    # One aggregate per query so SQLite answers each from its index.
+    last_id = Products.objects.aggregate(last_id=Max("id"))["last_id"]
+    updated_at = Products.objects.aggregate(updated_at=Max("updated_at"))["updated_at"]
+    model_id = LLM.get_embedding_model_id() or ""
+    model = hashlib.sha256(model_id.encode()).hexdigest()[:8] if model_id else "-"
+    updated_at = updated_at.isoformat() if updated_at else ""
+    return f"{counter}:{last_id}:{model}:{updated_at}"
+
+
+def parse_version(version):
+    """Split a ``catalog_version`` string into (counter, last id, latest ``updated_at``)."""
+    counter, last_id, _, updated_at = (version or "0:None:-:").split(":", 3)
+    return (
+        int(counter),
+        None if last_id == "None" else int(last_id),
+        datetime.fromisoformat(updated_at) if updated_at else None,
+    )
+
+
+def rebuild_index(org_slug):
+    """
+    Build the index (and any approximate index) from the database and write it to disk.
+
+    The organization context must already be set.
+    """
+    index = ProductIndex.build(version=catalog_version(), org_slug=org_slug)
+    try:
+        index.save(org_slug)
+    except OSError as e:
+        logger.warning(f"Could not write search index file for '{org_slug}': {e}")
+    # Fit the approximate indexes now rather than on the first query.
+    bot_settings = BotSettings.objects.first()
+    index.get_ann(bot_settings)
+    index.get_projection(bot_settings)
+    index.get_quantized(bot_settings)
+    logger.info(f"Built search index for '{org_slug}' with {len(index)} products")
+    get_index_cache().put(org_slug, index)
+    return index
+
+
+def current_index(org_slug, version, index=None):
+    """
+    Bring ``index`` (or the file on disk, when None) up to ``version``.
+
+    A stale index is refreshed with just the products changed since it was
+    built, and only rebuilt from the database when there is nothing to start
+    from or too much has changed.
+    """
+    if index is None:
+        index = ProductIndex.load(org_slug)
+        if index is not None and index.version != version:
+            # Pick up the IVF lists, projection and quantized vectors saved
+            # with the file before merging changes in.
+            bot_settings = BotSettings.objects.first()
+            index.get_ann(bot_settings)
+            index.get_projection(bot_settings)
+            index.get_quantized(bot_settings)
+    if index is not None and index.version != version:
+        index = index.refresh(version)
+    if index is None:
+        index = rebuild_index(org_slug)
+    return index
+
+
+def get_index(org_slug, version=None):
+    """
+    Return the index for ``org_slug``, reloading it if the catalog changed.
+
+    Tries the in-process ``IndexCache`` first, then the memory-mapped file on disk (or
+    the shared-memory copy published for all workers, with
+    ``SEARCH_SHARED_MEMORY``); see ``current_index``. The organization context
+    must already be set so the router picks the organization database.
+    ``version`` may be passed when the caller already has the current
+    ``catalog_version``.
+    """
+    version = version or catalog_version()
+    cache = get_index_cache()
+    index = cache.get(org_slug)
+    if index is not None and index.version == version:
+        # A private copy held back from shared memory is published once due.
+        publish_after = getattr(index, "publish_after", None)
+        if publish_after is None or time.time() < publish_after:
+            return index
+
+    start = time.perf_counter()
+    if getattr(settings, "SEARCH_SHARED_MEMORY", False):
+        from .shared_index import shared_index
+
+        index = shared_index(org_slug, version, index)
+    else:
+        index = current_index(org_slug, version, index)
+    cache.put(org_slug, index, load_seconds=time.perf_counter() - start)
+    return index
+
+
+def refresh_index(org_slug):
+    """
+    Bring this process's cached index for ``org_slug`` up to date, if it has one.
+
+    Called after products are saved or deleted so the next search does not pay
+    for the refresh. The organization context must already be set.
+    """
+    if org_slug in get_index_cache():
+        get_index(org_slug)
+
+
+def invalidate_index(org_slug=None):
+    """Drop the cached index for ``org_slug`` (or every organization)."""
+    cache = get_index_cache()
+    if org_slug is None:
+        cache.clear()
+    else:
+        cache.pop(org_slug)
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class IndexCache:
+    """
+    Per-process cache of organization search indexes under a global byte budget.
+
+    Indexes are loaded lazily by the caller on a miss and handed to ``put``.
+    When the resident total (``ProductIndex.nbytes``, which grows as derived
+    indexes are built) exceeds ``budget``, the least recently used
+    organizations are evicted, except pinned ones and the one just loaded or
+    grown. The budget is checked on ``put`` and again whenever a cached index
+    builds a derived index. A budget of 0 or None means unbounded.
+    """
+
+    def __init__(self, budget=None, pinned=()):
+        self.budget = budget
+        self.pinned = set(pinned)
+        self._indexes = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, org_slug):
+        with self._lock:
+            return org_slug in self._indexes
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def _org_stats(self, org_slug):
+        return self._stats.setdefault(org_slug, {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "last_load_seconds": None,
+            "total_load_seconds": 0.0,
+            "evictions": 0,
+            "last_used": None,
+        })
+
+    def get(self, org_slug):
+        with self._lock:
+            stats = self._org_stats(org_slug)
+            index = self._indexes.get(org_slug)
+            if index is None:
+                self.misses += 1
+                stats["misses"] += 1
+                return None
+            self._indexes.move_to_end(org_slug)
+            self.hits += 1
+            stats["hits"] += 1
+            stats["last_used"] = time.time()
+            return index
+
+    def put(self, org_slug, index, load_seconds=None):
+        """Store a freshly loaded ``index`` and evict others if over budget."""
+        index.on_resize = lambda: self.resized(org_slug, index)
+        with self._lock:
+            self._indexes[org_slug] = index
+            self._indexes.move_to_end(org_slug)
+            stats = self._org_stats(org_slug)
+            stats["last_used"] = time.time()
+            if load_seconds is not None:
+                stats["loads"] += 1
+                stats["last_load_seconds"] = load_seconds
+                stats["total_load_seconds"] += load_seconds
+            self._evict(keep=org_slug)
+
+    def resized(self, org_slug, index):
+        """Evict others if ``index``, cached for ``org_slug``, outgrew the budget."""
+        with self._lock:
+            if self._indexes.get(org_slug) is index:
+                self._evict(keep=org_slug)
+
+    def _evict(self, keep):
+        if not self.budget:
+            return
+        sizes = {org_slug: index.nbytes for org_slug, index in self._indexes.items()}
+        total = sum(sizes.values())
+        # Least recently used first.
+        for org_slug in list(self._indexes):
+            if total <= self.budget:
+                break
+            if org_slug == keep or org_slug in self.pinned:
+                continue
+            del self._indexes[org_slug]
+            total -= sizes[org_slug]
+            self.evictions += 1
+            self._stats[org_slug]["evictions"] += 1
+            logger.info(f"Evicted search index of '{org_slug}' ({sizes[org_slug] >> 20} MB)")
+        if total > self.budget:
+            logger.warning(
+                f"Search indexes use {total >> 20} MB, over the {self.budget >> 20} MB budget, "
+                "with only pinned or in-use organizations left"
+            )
+
+    def pin(self, org_slug):
+        with self._lock:
+            self.pinned.add(org_slug)
+
+    def unpin(self, org_slug):
+        with self._lock:
+            self.pinned.discard(org_slug)
+
+    def pop(self, org_slug):
+        with self._lock:
+            return self._indexes.pop(org_slug, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self):
+        with self._lock:
+            resident = {org_slug: index.nbytes for org_slug, index in self._indexes.items()}
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._indexes),
+                "budget_bytes": self.budget or None,
+                "resident_bytes": sum(resident.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "orgs": {
+                    org_slug: {
+                        **stats,
+                        "resident": org_slug in resident,
+                        "resident_bytes": resident.get(org_slug, 0),
+                        "pinned": org_slug in self.pinned,
+                    }
+                    for org_slug, stats in self._stats.items()
+                },
+            }
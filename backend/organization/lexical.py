@@ -0,0 +1,140 @@
+import re
+
+import numpy as np
+
+from .index import top_k_rows
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def attribute_values(attributes):
+    """Flatten the values of a ``Products.attributes`` JSON blob into strings."""
+    if isinstance(attributes, dict):
+        for value in attributes.values():
+            yield from attribute_values(value)
+    elif isinstance(attributes, (list, tuple)):
+        for value in attributes:
+            yield from attribute_values(value)
+    elif attributes is not None:
+        yield str(attributes)
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over product names and attribute values.
+
+    Postings are stored CSR-style: the documents containing term ``t`` are
+    ``doc_rows[indptr[t]:indptr[t + 1]]`` with matching term frequencies in
+    ``term_freqs``. Document ``i`` is row ``i`` of the vector index it was built
+    for, so lexical and vector results can be fused by row.
+    """
+
+    def __init__(self, vocabulary, indptr, doc_rows, term_freqs, doc_lengths, k1=1.2, b=0.75):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_rows = doc_rows
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if doc_lengths.any() else 1.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @property
+    def nbytes(self):
+        arrays = (self.indptr, self.doc_rows, self.term_freqs, self.doc_lengths)
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def build(cls, documents, **kwargs):
+        """Index ``documents`` (one string per row)."""
+        vocabulary = {}
+        term_ids, rows, counts = [], [], []
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+        for row, text in enumerate(documents):
+            tokens = tokenize(text)
+            doc_lengths[row] = len(tokens)
+            tf = {}
+            for token in tokens:
+                tf[token] = tf.get(token, 0) + 1
+            for token, count in tf.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                rows.append(row)
+                counts.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        indptr = np.searchsorted(term_ids[order], np.arange(len(vocabulary) + 1))
+        return cls(
+            vocabulary,
+            indptr,
+            np.asarray(rows, dtype=np.int64)[order],
+            np.asarray(counts, dtype=np.float32)[order],
+            doc_lengths,
+            **kwargs,
+        )
+
+    def search(self, text, top_k, rows=None):
+        """
+        Score ``text`` against the index.
+
+        Only the postings of the query terms are touched: their contributions
+        are accumulated per document with ``bincount`` instead of a dense
+        per-document loop. ``rows`` (sorted) restricts the result to a
+        pre-filtered subset.
+
+        Returns:
+            Tuple of (row indices, BM25 scores), best match first.
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize(text) if t in self.vocabulary}
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        count = len(self)
+        postings, weights = [], []
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_rows[start:end]
+            tf = self.term_freqs[start:end]
+            idf = np.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+            postings.append(docs)
+            weights.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        candidates, inverse = np.unique(np.concatenate(postings), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        if rows is not None:
+            keep = np.isin(candidates, rows, assume_unique=True)
+            candidates, scores = candidates[keep], scores[keep]
+        best = top_k_rows(scores, top_k)
+        return candidates[best], scores[best]
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=60):
+    """
+    Fuse several ranked lists of rows with (weighted) reciprocal-rank fusion.
+
+    Each row scores ``sum(weight / (k + rank))`` over the lists it appears in.
+
+    Returns:
+        Tuple of (row indices, fused scores), best first.
+    """
+    weights = weights or [1.0] * len(rankings)
+    rows, contributions = [], []
+    for ranking, weight in zip(rankings, weights):
+        ranking = np.asarray(ranking, dtype=np.int64)
+        rows.append(ranking)
+        contributions.append(weight / (k + 1 + np.arange(len(ranking))))
+    if not rows or not sum(len(r) for r in rows):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    candidates, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(contributions))
+    best = top_k_rows(scores, len(scores))
+    return candidates[best], scores[best]
@@ -0,0 +1,238 @@
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from aichatbot.utils import clear_organization_slug, set_organization_slug
+from organization.evaluation import (
+    HashEmbeddings,
+    evaluate,
+    exact_top_k,
+    recall_at_k,
+    sample_queries,
+    synthetic_catalog,
+)
+from organization.index import SHARD_MIN_ROWS, ann_path, index_paths, invalidate_index, rebuild_index
+from organization.models import BotSettings, Products
+from organization.search import search_products
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# BotSettings overrides selecting each engine.
+ENGINES = {
+    "exact": {},
+    "ivf": {"search_engine": "ivf"},
+    "float16": {"search_quantization": "float16"},
+    "int8": {"search_quantization": "int8"},
+}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark product search on deterministic synthetic catalogs, offline. '
+        'Reports build time, recall@k against exact search, p50/p95/p99 latency and peak RSS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000, 1000000],
+            help='Catalog sizes to benchmark (default 1000 10000 100000 1000000).',
+        )
+        parser.add_argument('--dim', type=int, default=768, help='Embedding dimension (default 768).')
+        parser.add_argument('--k', type=int, default=10, help='Number of results per query (default 10).')
+        parser.add_argument('--queries', type=int, default=200, help='Number of queries per run (default 200).')
+        parser.add_argument(
+            '--engines',
+            nargs='+',
+            choices=list(ENGINES),
+            default=list(ENGINES),
+            help='Engines to run (default: all). IVF falls back to exact search below SEARCH_ANN_MIN_PRODUCTS.',
+        )
+        parser.add_argument(
+            '--db-max',
+            type=int,
+            default=100000,
+            help='Largest catalog also loaded into a temporary organization DB to time '
+                 'search_products end to end (default 100000, 0 to skip).',
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            nargs='+',
+            default=[1],
+            help='Shard counts to run each engine with, e.g. 1 2 4 8 to measure '
+                 f'scaling across cores (default 1). Each shard scans at least {SHARD_MIN_ROWS} '
+                 'rows, so smaller catalogs use fewer shards; IVF is never sharded.',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default 0).')
+        parser.add_argument('--output', type=str, help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        results = []
+        for count in sorted(options['sizes']):
+            self.stdout.write(f"\n{count} products, {options['dim']} dims, recall@{options['k']}")
+            max_shards = max(1, count // SHARD_MIN_ROWS)
+            if max(options['shards']) > max_shards:
+                self.stdout.write(
+                    f"(at most {max_shards} shard(s): each shard scans at least {SHARD_MIN_ROWS} rows)"
+                )
+            self.stdout.write(
+                f"{'engine':<16}{'build s':>9}{'recall':>9}{'p50 ms':>9}"
+                f"{'p95 ms':>9}{'p99 ms':>9}{'peak RSS MB':>13}"
+            )
+            results.extend(self._benchmark_index(count, options))
+            if count <= options['db_max']:
+                results.extend(self._benchmark_search_products(count, options))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nResults written to {options['output']}"))
+
+    def _row(self, result):
+        self.stdout.write(
+            f"{result['engine']:<16}{result['build_s']:>9.2f}{result['recall']:>9.3f}"
+            f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+            f"{result['peak_rss_mb']:>13.0f}"
+        )
+
+    def _benchmark_index(self, count, options):
+        """Time each engine directly on an in-memory ProductIndex."""
+        start = time.perf_counter()
+        index, _ = synthetic_catalog(count, options['dim'], seed=options['seed'])
+        generated = time.perf_counter() - start
+
+        queries = sample_queries(index, options['queries'], seed=options['seed'])
+        truth = exact_top_k(index, queries, options['k'])
+
+        results = []
+        for engine in options['engines']:
+            # Requested counts the catalog is too small for collapse into one run.
+            shard_counts = []
+            for shards in (options['shards'] if engine != 'ivf' else [1]):
+                effective = index.shard_count(BotSettings(search_shards=shards))
+                if effective not in shard_counts:
+                    shard_counts.append(effective)
+            for shards in shard_counts:
+                bot_settings = BotSettings(search_shards=shards, **ENGINES[engine])
+                start = time.perf_counter()
+                index.get_ann(bot_settings)
+                index.get_quantized(bot_settings)
+                build_s = time.perf_counter() - start
+                if engine == 'exact':
+                    build_s = generated
+
+                report = evaluate(index, queries, options['k'], bot_settings, truth=truth)
+                result = {
+                    'count': count,
+                    'dim': options['dim'],
+                    'engine': engine if shards == 1 else f"{engine} x{shards}",
+                    'shards': shards,
+                    'build_s': build_s,
+                    'peak_rss_mb': peak_rss_mb(),
+                    **report,
+                }
+                self._row(result)
+                results.append(result)
+        return results
+
+    def _benchmark_search_products(self, count, options):
+        """
+        Time ``search_products`` end to end against a temporary organization DB.
+
+        Covers the catalog version check, index build from the database and
+        result materialization, with queries embedded by ``HashEmbeddings``.
+        """
+        alias = f"benchmark_{count}"
+        tmp_dir = Path(tempfile.mkdtemp(prefix="search-benchmark-"))
+        db = settings.DATABASES['default'].copy()
+        db['NAME'] = tmp_dir / f"{alias}.sqlite3"
+        settings.DATABASES[alias] = db
+        set_organization_slug(alias)
+        try:
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            index, attributes = synthetic_catalog(count, options['dim'], seed=options['seed'])
+            for start in range(0, count, 2000):
+                Products.objects.bulk_create([
+                    Products(
+                        name=index.names[row],
+                        price=round(float(index.prices[row]), 2),
+                        attributes=attributes[row],
+                        embedding=index.vectors[row].tobytes(),
+                        embedding_dim=index.dim,
+                    )
+                    for row in range(start, min(start + 2000, count))
+                ])
+            del index, attributes
+
+            start = time.perf_counter()
+            index = rebuild_index(alias)
+            build_s = time.perf_counter() - start
+
+            model = HashEmbeddings(options['dim'])
+            texts = [f"{name} gift" for name in index.names[:options['queries']]]
+            truth = exact_top_k(index, model.embed_documents(texts), options['k'])
+
+            results = []
+            for engine in options['engines']:
+                bot_settings = BotSettings(**ENGINES[engine])
+                search_products(
+                    texts[0], alias, options['k'], bot_settings,
+                    embedding_model=model, use_cache=False,
+                )
+
+                found, latencies = [], []
+                for text in texts:
+                    start = time.perf_counter()
+                    hits = search_products(
+                        text, alias, options['k'], bot_settings,
+                        embedding_model=model, use_cache=False,
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found.append([hit['name'] for hit in hits])
+
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                expected = [index.names[rows] for rows in truth]
+                result = {
+                    'count': count,
+                    'dim': options['dim'],
+                    'engine': f"{engine} (e2e)",
+                    'build_s': build_s,
+                    'recall': recall_at_k(expected, found),
+                    'p50_ms': float(p50),
+                    'p95_ms': float(p95),
+                    'p99_ms': float(p99),
+                    'peak_rss_mb': peak_rss_mb(),
+                }
+                self._row(result)
+                results.append(result)
+            return results
+        finally:
+            invalidate_index(alias)
+            clear_organization_slug()
+            connections[alias].close()
+            del connections[alias]
+            settings.DATABASES.pop(alias, None)
+            for path in (*index_paths(alias), ann_path(alias)):
+                path.unlink(missing_ok=True)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
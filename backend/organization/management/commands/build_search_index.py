@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from aichatbot.utils import clear_organization_slug, set_organization_slug
+from organization.evaluation import evaluate, exact_top_k, sample_queries
+from organization.index import index_paths, rebuild_index
+from organization.models import BotSettings
+
+# Recall of the configured search settings below which the build warns.
+MIN_RECALL = 0.9
+
+
+class Command(BaseCommand):
+    help = 'Build the on-disk vector search index for an organization.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('org_slug', type=str, help='The slug of the organization to index.')
+        parser.add_argument('--k', type=int, default=10, help='Number of results per query for the recall check (default 10).')
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Queries sampled to measure recall of the configured search settings (default 200, 0 to skip).',
+        )
+
+    def handle(self, *args, **options):
+        org_slug = options['org_slug']
+
+        set_organization_slug(org_slug)
+
+        if org_slug not in settings.DATABASES:
+             new_db = settings.DATABASES['default'].copy()
+             new_db['NAME'] = settings.BASE_DIR / f"db/{org_slug}.sqlite3"
+             settings.DATABASES[org_slug] = new_db
+
+        try:
+            index = rebuild_index(org_slug)
+            vectors_path, _ = index_paths(org_slug)
+            self.stdout.write(self.style.SUCCESS(
+                f"Indexed {len(index)} products ({index.dim} dims) into {vectors_path}"
+            ))
+            if not len(index):
+                return
+
+            bot_settings = BotSettings.objects.first()
+            projection = index.get_projection(bot_settings)
+            if projection is not None:
+                self.stdout.write(
+                    f"PCA: {projection.n_components} of {index.dim} dims, "
+                    f"explained variance {projection.explained_variance:.3f}, "
+                    f"{projection.reduced.nbytes / 2**20:.1f} MB scored instead of "
+                    f"{index.vectors.nbytes / 2**20:.1f} MB"
+                )
+
+            if options['queries']:
+                queries = sample_queries(index, options['queries'])
+                truth = exact_top_k(index, queries, options['k'])
+                report = evaluate(index, queries, options['k'], bot_settings, truth=truth)
+                self.stdout.write(
+                    f"recall@{options['k']} {report['recall']:.3f}, "
+                    f"p50 {report['p50_ms']:.2f} ms, p95 {report['p95_ms']:.2f} ms"
+                )
+                if report['recall'] < MIN_RECALL:
+                    hint = (
+                        "raise ivf_nprobe" if bot_settings and bot_settings.search_engine == "ivf"
+                        else "raise rerank_candidates or pca_components"
+                    )
+                    self.stdout.write(self.style.WARNING(
+                        f"recall@{options['k']} is below {MIN_RECALL}: {hint} in the bot settings."
+                    ))
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f"Failed to build search index: {e}"))
+        finally:
+            clear_organization_slug()
@@ -1,53 +1,71 @@
-import json
-import os
-from datetime import datetime
-from decimal import Decimal
+import time
 
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from aichatbot.utils import set_organization_slug
-from organization.models import Products
+from organization.catalog_io import export_products, open_catalog
 
 
 class Command(BaseCommand):
-    help = 'Dump products from an organization database to a JSON file'
+    help = (
+        'Dump products from an organization database to an NDJSON file '
+        '(gzip or zstd compressed for .gz/.zst) with embeddings in an .npy sidecar'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('--org', type=str, required=True, help='Organization slug')
-        parser.add_argument('--output', type=str, required=True, help='Output JSON file path')
+        parser.add_argument(
+            '--output',
+            type=str,
+            required=True,
+            help='Output file path, e.g. catalog.ndjson.gz or catalog.ndjson.zst',
+        )
+        parser.add_argument(
+            '--embeddings',
+            type=str,
+            help='Embedding sidecar path (default: the output path followed by .npy).',
+        )
+        parser.add_argument(
+            '--no-embeddings',
+            action='store_true',
+            help='Leave embeddings out of the dump.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Products read from the database at a time (default 2000).',
+        )
 
     def handle(self, *args, **options):
         org_slug = options['org']
         output_file = options['output']
+        embeddings_file = None
+        if not options['no_embeddings']:
+            embeddings_file = options['embeddings'] or f"{output_file}.npy"
 
         # Set the organization context
         set_organization_slug(org_slug)
 
-        # Trigger DB router logic to ensure DB is configured
-        # We can do this by just accessing the DB, but set_organization_slug + accessing model should work
-        # based on the router logic we read.
-        
+        self.stdout.write(f"Fetching products for organization: {org_slug}")
+        start = time.perf_counter()
+
+        def report(count):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{count} products written ({count / elapsed:.0f}/s)")
+
         try:
-            products = Products.objects.all()
-            data = []
-            
-            self.stdout.write(f"Fetching products for organization: {org_slug}")
-
-            for product in products:
-                item = {
-                    'name': product.name,
-                    'price': str(product.price), # Decimal to string
-                    'attributes': product.attributes,
-                    'image': product.image,
-                    'created_at': product.created_at.isoformat() if product.created_at else None,
-                }
-                data.append(item)
-
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-
-            self.stdout.write(self.style.SUCCESS(f'Successfully dumped {len(data)} products to "{output_file}"'))
+            with open_catalog(output_file, 'w') as f:
+                count, embedded = export_products(
+                    f,
+                    embeddings_path=embeddings_file,
+                    chunk_size=max(1, options['chunk_size']),
+                    on_chunk=report,
+                )
+
+            self.stdout.write(self.style.SUCCESS(f'Successfully dumped {count} products to "{output_file}"'))
+            if embeddings_file:
+                self.stdout.write(self.style.SUCCESS(f'Wrote {embedded} embeddings to "{embeddings_file}"'))
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
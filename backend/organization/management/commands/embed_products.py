@@ -1,32 +1,104 @@
-from time import sleep
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from organization.models import Products
+from organization.models import EmbeddingJob, Products
+from organization.embedding import run_embedding_job, stale_products
 from llm.llm import LLM
+from llm.rate_limit import TokenBucket
+from organization.index import rebuild_index
+from organization.tenants import organization_slugs, run_command_per_organization, write_summary
 from aichatbot.utils import set_organization_slug, clear_organization_slug
-import sys
 
 class Command(BaseCommand):
     help = 'Generate embeddings for products in a specific organization.'
 
     def add_arguments(self, parser):
-        parser.add_argument('org_slug', type=str, help='The slug of the organization to process.')
+        parser.add_argument('org_slug', type=str, nargs='?', help='The slug of the organization to process.')
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Process every organization and print a summary.',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='With --all, organizations processed at once in separate processes (default 1).',
+        )
+        parser.add_argument(
+            '--provider-calls',
+            type=int,
+            help='With --all, embedding requests in flight across all organizations '
+                 '(default: --concurrency).',
+        )
         parser.add_argument(
             '--force',
             action='store_true',
-            help='Force regeneration of embeddings for all products, even if they already exist.',
+            help='Force regeneration of embeddings for all products, even if they are up to date.',
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            nargs='?',
+            const=0,
+            metavar='JOB_ID',
+            help='Resume an interrupted embedding job after its last committed batch '
+                 '(default: the latest unfinished job).',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            type=int,
+            nargs='?',
+            const=0,
+            metavar='JOB_ID',
+            help='Retry only the products that failed in an embedding job '
+                 '(default: the latest job with failures).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=64,
+            help='Products sent to the embedding provider per request (default 64).',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Embedding requests in flight at once (default 4).',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Maximum products embedded per second, 0 for no limit (default 0).',
+        )
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=3,
+            help='Retries per failed batch, with exponential backoff (default 3).',
         )
         parser.add_argument(
             '--timeout',
-            action='store_true',
-            help='Add timeout between every embeding default 0.',
+            type=float,
             default=0,
+            help='Seconds to wait between requests; shorthand for --rate with one batch per interval (default 0).',
         )
 
     def handle(self, *args, **options):
+        if options['all']:
+            # Job ids belong to one organization's database.
+            for option in ('resume', 'retry_failed'):
+                if options[option]:
+                    flag = '--' + option.replace('_', '-')
+                    raise CommandError(f"{flag} JOB_ID cannot be combined with --all; pass {flag} alone.")
+            self._embed_all(options)
+            return
+        if not options['org_slug']:
+            raise CommandError("Pass an organization slug or --all.")
+
         org_slug = options['org_slug']
         force = options['force']
-        timeout = options['timeout']
+        batch_size = max(1, options['batch_size'])
 
         self.stdout.write(f"Processing organization: {org_slug}")
 
@@ -44,48 +116,133 @@ class Command(BaseCommand):
             try:
                 embedding_model = LLM.get_embedding_model()
             except Exception as e:
-                self.stderr.write(self.style.ERROR(f"Failed to initialize LLM: {e}"))
-                return
+                raise CommandError(f"Failed to initialize LLM: {e}") from e
 
-            if force:
-                products = Products.objects.all()
-                self.stdout.write(f"Force mode: Processing all {products.count()} products.")
+            products = Products.objects.all()
+            model_id = getattr(embedding_model, 'model_id', None)
+            job = None
+            if options['resume'] is not None or options['retry_failed'] is not None:
+                job, ids = self._existing_job(products, model_id, options)
+                if job is None:
+                    return
+            elif force:
+                ids = list(products.order_by('id').values_list('id', flat=True))
+                self.stdout.write(f"Force mode: Processing all {len(ids)} products.")
             else:
-                products = Products.objects.filter(embedding__isnull=True)
-                count = products.count()
-                if count == 0:
+                # Products whose embedded text and model are unchanged are skipped.
+                ids, reasons = stale_products(products, model_id)
+                if not ids:
                     self.stdout.write("No products found needing embeddings.")
                     return
-                self.stdout.write(f"Processing {count} products (skipping existing).")
-
-            for product in products:
-                try:
-                    self.stdout.write(f"Generating embedding for: {product.name}", ending='... ')
-                    
-                    # Construct text to embed
-                    text_to_embed = f"{product.name} "
-                    if product.attributes:
-                        if isinstance(product.attributes, dict):
-                            text_to_embed += " ".join([f"{k}: {v}" for k, v in product.attributes.items()])
-                        else:
-                            text_to_embed += str(product.attributes)
-                    
-                    # Generate embedding
-                    vector = embedding_model.embed_query(text_to_embed)
-                    if timeout > 0:
-                        sleep(timeout)
-                    
-                    # Save (using update to be fast and safe, though iterator is already hitting DB)
-                    # For bulk updates we could use bulk_update but loop is safer for error handling per item
-                    product.embedding = vector
-                    product.save(update_fields=['embedding'])
-                    
-                    self.stdout.write(self.style.SUCCESS("OK"))
-                    
-                except Exception as e:
-                    self.stderr.write(self.style.ERROR(f"FAILED: {e}"))
+                self.stdout.write(
+                    f"Processing {len(ids)} products: {reasons['missing']} without an embedding, "
+                    f"{reasons['model']} from another model, {reasons['text']} with changed text."
+                )
+            if job is None:
+                job = EmbeddingJob.objects.create(force=force, total=len(ids))
+                self.stdout.write(f"Started embedding job #{job.pk}.")
+
+            rate = options['rate']
+            if options['timeout'] > 0:
+                rate = batch_size / options['timeout']
+            limiter = TokenBucket(rate, capacity=batch_size) if rate > 0 else None
+
+            progress = run_embedding_job(
+                job,
+                products,
+                embedding_model,
+                ids,
+                retry_failed=options['retry_failed'] is not None,
+                batch_size=batch_size,
+                concurrency=max(1, options['concurrency']),
+                limiter=limiter,
+                retries=options['retries'],
+                on_batch=self._report,
+            )
+            summary = (
+                f"Embedded {progress.embedded} products in {progress.elapsed:.1f}s "
+                f"({progress.rate:.1f} items/s)"
+            )
+            if not progress.failed:
+                self.stdout.write(self.style.SUCCESS(f"{summary}."))
+
+            index = rebuild_index(org_slug)
+            self.stdout.write(self.style.SUCCESS(f"Search index rebuilt with {len(index)} products."))
 
+            if progress.failed:
+                raise CommandError(
+                    f"{summary}, {progress.failed} failed. "
+                    f"Retry them with --retry-failed {job.pk}."
+                )
+        except CommandError:
+            raise
         except Exception as e:
-            self.stderr.write(self.style.ERROR(f"Error accessing database or processing: {e}"))
+            raise CommandError(f"Error accessing database or processing: {e}") from e
         finally:
             clear_organization_slug()
+
+    def _embed_all(self, options):
+        slugs = organization_slugs()
+        jobs = max(1, min(options['jobs'], len(slugs) or 1))
+        self.stdout.write(f"Embedding products of {len(slugs)} organizations, {jobs} at a time...")
+        # Every process gets an equal share of the rate limit.
+        results = run_command_per_organization(
+            'embed_products',
+            slugs,
+            jobs=jobs,
+            provider_calls=options['provider_calls'] or options['concurrency'],
+            on_result=self._report_organization,
+            force=options['force'],
+            resume=options['resume'],
+            retry_failed=options['retry_failed'],
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            rate=options['rate'] / jobs,
+            retries=options['retries'],
+            timeout=options['timeout'] * jobs,
+        )
+        write_summary(self, results)
+
+    def _report_organization(self, result):
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f"'{result['slug']}' failed after {result['seconds']:.1f}s"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"'{result['slug']}' done in {result['seconds']:.1f}s"))
+
+    def _existing_job(self, products, model_id, options):
+        """Find the job to resume or retry and the product ids left to embed in it."""
+        retry = options['retry_failed'] is not None
+        job_id = options['retry_failed'] if retry else options['resume']
+        jobs = EmbeddingJob.objects.order_by('-pk')
+        if job_id:
+            job = jobs.filter(pk=job_id).first()
+        elif retry:
+            job = jobs.filter(failed__gt=0).first()
+        else:
+            job = jobs.filter(status__in=['running', 'failed']).first()
+        if job is None:
+            if job_id:
+                raise CommandError(f"Embedding job #{job_id} not found.")
+            self.stdout.write("No embedding job to resume.")
+            return None, None
+
+        if retry:
+            ids = sorted(job.failed_ids)
+            self.stdout.write(f"Retrying {len(ids)} failed products of job #{job.pk}.")
+        else:
+            remaining = products.filter(id__gt=job.cursor)
+            if job.force:
+                ids = list(remaining.order_by('id').values_list('id', flat=True))
+            else:
+                ids, _ = stale_products(remaining, model_id)
+            self.stdout.write(
+                f"Resuming job #{job.pk} after product {job.cursor}: "
+                f"{job.embedded}/{job.total} embedded, {len(ids)} left."
+            )
+        return job, ids
+
+    def _report(self, progress):
+        failed = f", {progress.failed} failed" if progress.failed else ""
+        self.stdout.write(
+            f"{progress.done}/{progress.total} products, {progress.rate:.1f} items/s{failed}"
+        )
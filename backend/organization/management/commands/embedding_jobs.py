@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from organization.models import EmbeddingJob
+from aichatbot.utils import set_organization_slug, clear_organization_slug
+
+
+class Command(BaseCommand):
+    help = 'List the embedding jobs of an organization, or show one in detail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('org_slug', type=str, help='The slug of the organization to inspect.')
+        parser.add_argument('--job', type=int, help='Show this job, including its failed product ids.')
+        parser.add_argument('--limit', type=int, default=20, help='Number of recent jobs to list (default 20).')
+
+    def handle(self, *args, **options):
+        org_slug = options['org_slug']
+        set_organization_slug(org_slug)
+
+        # Ensure DB connection exists (dynamic add if needed)
+        if org_slug not in settings.DATABASES:
+             new_db = settings.DATABASES['default'].copy()
+             new_db['NAME'] = settings.BASE_DIR / f"db/{org_slug}.sqlite3"
+             settings.DATABASES[org_slug] = new_db
+
+        try:
+            if options['job']:
+                job = EmbeddingJob.objects.filter(pk=options['job']).first()
+                if job is None:
+                    self.stderr.write(self.style.ERROR(f"Embedding job #{options['job']} not found."))
+                    return
+                self._detail(job)
+                return
+
+            jobs = EmbeddingJob.objects.order_by('-pk')[:options['limit']]
+            if not jobs:
+                self.stdout.write("No embedding jobs.")
+                return
+            self.stdout.write(
+                f"{'job':>6}  {'status':<10}{'embedded':>10}{'failed':>8}{'total':>8}"
+                f"{'cursor':>10}  {'model':<32}{'updated'}"
+            )
+            for job in jobs:
+                self.stdout.write(
+                    f"{job.pk:>6}  {job.status:<10}{job.embedded:>10}{job.failed:>8}{job.total:>8}"
+                    f"{job.cursor:>10}  {job.embedding_model or '-':<32}{job.updated_at:%Y-%m-%d %H:%M:%S}"
+                )
+        finally:
+            clear_organization_slug()
+
+    def _detail(self, job):
+        self.stdout.write(f"Embedding job #{job.pk}: {job.status}")
+        self.stdout.write(f"  model:     {job.embedding_model or '-'}")
+        self.stdout.write(f"  force:     {job.force}")
+        self.stdout.write(f"  progress:  {job.embedded}/{job.total} embedded, {job.failed} failed")
+        self.stdout.write(f"  cursor:    product {job.cursor}")
+        self.stdout.write(f"  started:   {job.created_at:%Y-%m-%d %H:%M:%S}")
+        self.stdout.write(f"  updated:   {job.updated_at:%Y-%m-%d %H:%M:%S}")
+        if job.finished_at:
+            self.stdout.write(f"  finished:  {job.finished_at:%Y-%m-%d %H:%M:%S}")
+        if job.error:
+            self.stdout.write(f"  error:     {job.error}")
+        if job.failed_ids:
+            self.stdout.write(f"  failed ids: {', '.join(str(pk) for pk in job.failed_ids)}")
@@ -1,65 +1,83 @@
 import json
 import os
-from datetime import datetime
-from decimal import Decimal
+import time
 
 from django.core.management.base import BaseCommand
-from django.utils.dateparse import parse_datetime
 
 from aichatbot.utils import set_organization_slug
-from organization.models import Products
+from organization.catalog_io import import_products, iter_json_items, load_embeddings, open_catalog
 
 
 class Command(BaseCommand):
-    help = 'Load products from a JSON file into an organization database'
+    help = 'Load products from a JSON array or NDJSON file (optionally .gz/.zst compressed) into an organization database'
 
     def add_arguments(self, parser):
         parser.add_argument('--org', type=str, required=True, help='Organization slug')
-        parser.add_argument('--input', type=str, required=True, help='Input JSON file path')
+        parser.add_argument('--input', type=str, required=True, help='Input JSON or NDJSON file path')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Products written per transaction (default 1000).',
+        )
+        parser.add_argument(
+            '--key',
+            type=str,
+            help='Natural key to upsert on instead of always inserting: name, image or '
+                 'attributes.<name> (e.g. attributes.sku).',
+        )
+        parser.add_argument(
+            '--embeddings',
+            type=str,
+            help='.npy embedding sidecar: rows named by each product\'s embedding_row, or one per '
+                 'product in file order (default: the input path followed by .npy, if it exists).',
+        )
 
     def handle(self, *args, **options):
         org_slug = options['org']
         input_file = options['input']
+        key = options['key']
 
         if not os.path.exists(input_file):
             self.stdout.write(self.style.ERROR(f'File not found: {input_file}'))
             return
+        if key and key not in ('name', 'image') and not key.startswith('attributes.'):
+            self.stdout.write(self.style.ERROR(f'Unsupported key: {key}'))
+            return
+
+        embeddings_file = options['embeddings']
+        if embeddings_file is None and os.path.exists(f'{input_file}.npy'):
+            embeddings_file = f'{input_file}.npy'
+            self.stdout.write(f'Using embeddings from {embeddings_file}')
 
         # Set the organization context
         set_organization_slug(org_slug)
-        
-        try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
 
-            if not isinstance(data, list):
-                self.stdout.write(self.style.ERROR('Invalid JSON format. Expected a list of products.'))
-                return
+        start = time.perf_counter()
 
-            count = 0
-            for item in data:
-                # Basic validation can be added here
-                
-                # Convert types back
-                price = Decimal(item.get('price', '0.00'))
-                created_at_str = item.get('created_at')
-                created_at = parse_datetime(created_at_str) if created_at_str else None
-                
-                Products.objects.create(
-                    name=item.get('name'),
-                    price=price,
-                    attributes=item.get('attributes', {}),
-                    image=item.get('image'),
-                    created_at=created_at,
-                    embedding=item.get('embedding')
-                    # Note: ID is auto-generated. We are creating NEW records.
-                    # If we wanted to sync/update, we'd need a unique identifier logic.
+        def report(stats):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{stats.total} products written ({stats.total / elapsed:.0f}/s)')
+
+        try:
+            embeddings = load_embeddings(embeddings_file) if embeddings_file else None
+            # Products are written with bulk_create, so nothing is embedded on the
+            # fly; products without an embedding are left for embed_products.
+            with open_catalog(input_file) as f:
+                stats = import_products(
+                    iter_json_items(f),
+                    key=key,
+                    batch_size=max(1, options['batch_size']),
+                    embeddings=embeddings,
+                    on_batch=report,
                 )
-                count += 1
 
-            self.stdout.write(self.style.SUCCESS(f'Successfully loaded {count} products into organization "{org_slug}"'))
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully loaded {stats.total} products into organization "{org_slug}" '
+                f'({stats.created} created, {stats.updated} updated)'
+            ))
 
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR(f'Invalid JSON in file: {input_file}'))
+        except json.JSONDecodeError as e:
+            self.stdout.write(self.style.ERROR(f'Invalid JSON in file: {input_file} ({e})'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
@@ -2,13 +2,25 @@ from django.core.management.base import BaseCommand
 from django.core.management import call_command
 from django.conf import settings
 from organization.models import Organization
+from organization.tenants import organization_slugs, run_command_per_organization, write_summary
 class Command(BaseCommand):
     help = 'Migrates all organization databases and the default database'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Migrate this many organization databases at once in separate processes, '
+                 'then print a summary (default 1: one after another).',
+        )
     def handle(self, *args, **options):
         # 1. Migrate default database
         self.stdout.write("Migrating 'default' database...")
         call_command('migrate', database='default')
         self.stdout.write(self.style.SUCCESS("Successfully migrated 'default' database"))
+        if options['jobs'] > 1:
+            self._migrate_parallel(options['jobs'])
+            return
         # 2. Iterate over all organizations
         # We need to ensure we are querying the 'default' DB for organizations
         # explicitly, although the router should handle it if DB_TYPE is 'main'.
@@ -32,4 +44,23 @@ class Command(BaseCommand):
                 call_command('migrate', database=slug)
                 self.stdout.write(self.style.SUCCESS(f"Successfully migrated '{slug}'"))
             except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Failed to migrate '{slug}': {e}"))
\ No newline at end of file
+                self.stdout.write(self.style.ERROR(f"Failed to migrate '{slug}': {e}"))
+
+    def _migrate_parallel(self, jobs):
+        slugs = organization_slugs()
+        self.stdout.write(f"Migrating {len(slugs)} organizations, {jobs} at a time...")
+        results = run_command_per_organization(
+            'migrate',
+            slugs,
+            jobs=jobs,
+            slug_option='database',
+            on_result=self._report,
+            interactive=False,
+        )
+        write_summary(self, results)
+
+    def _report(self, result):
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f"Failed to migrate '{result['slug']}': {result['error']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Successfully migrated '{result['slug']}' ({result['seconds']:.1f}s)"))
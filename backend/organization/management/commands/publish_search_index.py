@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from aichatbot.utils import clear_organization_slug, set_organization_slug
+from organization.index import catalog_version, current_index
+from organization.models import Organization
+from organization.shared_index import publish, unpublish
+
+
+class Command(BaseCommand):
+    help = 'Publish organization search indexes into shared memory for all workers to map.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'org_slugs',
+            nargs='*',
+            type=str,
+            help='Organizations to publish (default: all).',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Unlink the published segments instead of publishing.',
+        )
+
+    def handle(self, *args, **options):
+        slugs = options['org_slugs'] or list(
+            Organization.objects.exclude(slug__isnull=True).exclude(slug='').values_list('slug', flat=True)
+        )
+
+        for org_slug in slugs:
+            if options['clear']:
+                unpublish(org_slug)
+                self.stdout.write(f"Unpublished '{org_slug}'")
+                continue
+
+            set_organization_slug(org_slug)
+
+            if org_slug not in settings.DATABASES:
+                 new_db = settings.DATABASES['default'].copy()
+                 new_db['NAME'] = settings.BASE_DIR / f"db/{org_slug}.sqlite3"
+                 settings.DATABASES[org_slug] = new_db
+
+            try:
+                index = current_index(org_slug, catalog_version())
+                generation = publish(index, org_slug)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Published '{org_slug}' ({len(index)} products) as generation {generation}"
+                ))
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"Failed to publish '{org_slug}': {e}"))
+            finally:
+                clear_organization_slug()
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from aichatbot.utils import clear_organization_slug, set_organization_slug
+from organization.evaluation import evaluate, exact_top_k, sample_queries
+from organization.index import get_index
+from organization.models import BotSettings
+
+
+class Command(BaseCommand):
+    help = 'Report recall@k and latency of the quantized search modes for an organization.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('org_slug', type=str, help='The slug of the organization to evaluate.')
+        parser.add_argument('--k', type=int, default=10, help='Number of results per query (default 10).')
+        parser.add_argument('--queries', type=int, default=200, help='Number of sampled queries (default 200).')
+        parser.add_argument(
+            '--rerank',
+            type=int,
+            nargs='+',
+            default=[50, 100, 200],
+            help='Re-rank pool sizes to try (default 50 100 200).',
+        )
+
+    def handle(self, *args, **options):
+        org_slug = options['org_slug']
+        top_k = options['k']
+
+        set_organization_slug(org_slug)
+
+        if org_slug not in settings.DATABASES:
+             new_db = settings.DATABASES['default'].copy()
+             new_db['NAME'] = settings.BASE_DIR / f"db/{org_slug}.sqlite3"
+             settings.DATABASES[org_slug] = new_db
+
+        try:
+            index = get_index(org_slug)
+            if not len(index):
+                self.stdout.write("No embedded products to evaluate.")
+                return
+
+            queries = sample_queries(index, options['queries'])
+            truth = exact_top_k(index, queries, top_k)
+            self.stdout.write(
+                f"{len(index)} products, {index.dim} dims, {len(queries)} queries, recall@{top_k}\n"
+            )
+            self.stdout.write(f"{'mode':<10}{'rerank':>8}{'recall':>10}{'p50 ms':>10}{'p95 ms':>10}{'matrix MB':>12}")
+
+            full_mb = index.vectors.nbytes / 2**20
+            report = evaluate(index, queries, top_k)
+            self._row('float32', '-', 1.0, report, full_mb)
+
+            for mode in ('float16', 'int8'):
+                for rerank in options['rerank']:
+                    bot_settings = BotSettings(search_quantization=mode, rerank_candidates=rerank)
+                    report = evaluate(index, queries, top_k, bot_settings, truth=truth)
+                    size_mb = index.get_quantized(bot_settings).nbytes / 2**20
+                    self._row(mode, rerank, report['recall'], report, size_mb)
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f"Failed to evaluate search index: {e}"))
+        finally:
+            clear_organization_slug()
+
+    def _row(self, mode, rerank, recall, report, size_mb):
+        self.stdout.write(
+            f"{mode:<10}{rerank:>8}{recall:>10.3f}{report['p50_ms']:>10.2f}"
+            f"{report['p95_ms']:>10.2f}{size_mb:>12.1f}"
+        )
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_remove_botsettings_missing_attribute_prompt_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0003_products_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsettings',
+            name='search_engine',
+            field=models.CharField(choices=[('exact', 'Exact'), ('ivf', 'IVF (approximate)')], default='exact', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='botsettings',
+            name='ivf_lists',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='botsettings',
+            name='ivf_nprobe',
+            field=models.PositiveIntegerField(default=8),
+        ),
+    ]
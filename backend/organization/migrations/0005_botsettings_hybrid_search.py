@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0004_botsettings_search_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsettings',
+            name='hybrid_search',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='botsettings',
+            name='lexical_weight',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:20
+
+import numpy as np
+from django.db import migrations, models
+
+
+def json_to_binary(apps, schema_editor):
+    Products = apps.get_model('organization', 'Products')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    products = Products.objects.using(db_alias).exclude(embedding__isnull=True).only('id', 'embedding')
+    for product in products.iterator(chunk_size=1000):
+        if not product.embedding:
+            continue
+        vector = np.asarray(product.embedding, dtype=np.float32)
+        product.embedding_blob = vector.tobytes()
+        product.embedding_dtype = 'float32'
+        product.embedding_dim = len(vector)
+        batch.append(product)
+        if len(batch) >= 1000:
+            Products.objects.using(db_alias).bulk_update(batch, ['embedding_blob', 'embedding_dtype', 'embedding_dim'])
+            batch = []
+    if batch:
+        Products.objects.using(db_alias).bulk_update(batch, ['embedding_blob', 'embedding_dtype', 'embedding_dim'])
+
+
+def binary_to_json(apps, schema_editor):
+    Products = apps.get_model('organization', 'Products')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    products = Products.objects.using(db_alias).exclude(embedding_blob__isnull=True)
+    for product in products.iterator(chunk_size=1000):
+        vector = np.frombuffer(product.embedding_blob, dtype=product.embedding_dtype)
+        product.embedding = vector.astype(np.float64).tolist()
+        batch.append(product)
+        if len(batch) >= 1000:
+            Products.objects.using(db_alias).bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        Products.objects.using(db_alias).bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0005_botsettings_hybrid_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='embedding_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='products',
+            name='embedding_dtype',
+            field=models.CharField(default='float32', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='products',
+            name='embedding_dim',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        # The hint lets the router skip this on the default database, which has
+        # no products table.
+        migrations.RunPython(json_to_binary, binary_to_json, hints={'model_name': 'products'}),
+        migrations.RemoveField(
+            model_name='products',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='products',
+            old_name='embedding_blob',
+            new_name='embedding',
+        ),
+    ]
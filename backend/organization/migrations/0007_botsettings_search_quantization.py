@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0006_products_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsettings',
+            name='search_quantization',
+            field=models.CharField(choices=[('none', 'None'), ('float16', 'float16'), ('int8', 'int8 (scalar)')], default='none', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='botsettings',
+            name='rerank_candidates',
+            field=models.PositiveIntegerField(default=100),
+        ),
+    ]
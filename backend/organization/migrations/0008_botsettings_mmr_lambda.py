@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_botsettings_search_quantization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsettings',
+            name='mmr_lambda',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='botsettings',
+            name='mmr_candidates',
+            field=models.PositiveIntegerField(default=100),
+        ),
+    ]
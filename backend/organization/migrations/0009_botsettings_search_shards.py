@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0008_botsettings_mmr_lambda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsettings',
+            name='search_shards',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
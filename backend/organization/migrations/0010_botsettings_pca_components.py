@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0009_botsettings_search_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsettings',
+            name='pca_components',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0010_botsettings_pca_components'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='embedding_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='products',
+            name='embedding_model',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+def old_default_to_auto(apps, schema_editor):
+    # 8 was the fixed default; clearing it lets nprobe scale with the list count.
+    BotSettings = apps.get_model('organization', 'BotSettings')
+    BotSettings.objects.using(schema_editor.connection.alias).filter(ivf_nprobe=8).update(ivf_nprobe=None)
+
+
+def auto_to_old_default(apps, schema_editor):
+    BotSettings = apps.get_model('organization', 'BotSettings')
+    BotSettings.objects.using(schema_editor.connection.alias).filter(ivf_nprobe__isnull=True).update(ivf_nprobe=8)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0013_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='botsettings',
+            name='ivf_nprobe',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        # The hint lets the router skip this on the default database, which has
+        # no bot settings table.
+        migrations.RunPython(old_default_to_auto, auto_to_old_default, hints={'model_name': 'botsettings'}),
+    ]
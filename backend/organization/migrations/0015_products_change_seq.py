@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0014_botsettings_ivf_nprobe_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def maximal_marginal_relevance(vectors, relevance, top_k, lambda_mult=0.5):
+    """
+    Greedily pick ``top_k`` rows that are relevant but not redundant.
+
+    Each step takes the row maximizing
+    ``lambda_mult * relevance - (1 - lambda_mult) * max similarity to the rows
+    already picked``. Pairwise similarities come from one matrix product of the
+    (normalized) candidate ``vectors``, and the running maximum is updated with
+    one vector operation per pick.
+
+    Returns:
+        Positions into ``vectors``/``relevance``, in pick order.
+    """
+    count = len(relevance)
+    top_k = min(top_k, count)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    similarity = vectors @ vectors.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    picked = np.empty(top_k, dtype=np.int64)
+    available = np.ones(count, dtype=bool)
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    for i in range(top_k):
+        if i == 0:
+            marginal = relevance.copy()
+        else:
+            marginal = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        marginal[~available] = -np.inf
+        row = int(np.argmax(marginal))
+        picked[i] = row
+        available[row] = False
+        np.maximum(redundancy, similarity[row], out=redundancy)
+    return picked
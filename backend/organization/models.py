@@ -1,4 +1,25 @@
-from django.db import models
+import numpy as np
+from django.conf import settings
+from django.db import models, transaction
+
+# dtypes embeddings may be stored as.
+EMBEDDING_DTYPES = ("float32", "float16")
+
+
+def encode_embedding(vector, dtype=None):
+    """Pack an embedding into raw bytes; returns (bytes, dtype, dim)."""
+    dtype = dtype or getattr(settings, "EMBEDDING_STORAGE_DTYPE", "float32")
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    array = np.asarray(vector, dtype=dtype).ravel()
+    return array.tobytes(), dtype, len(array)
+
+
+def decode_embedding(data, dtype="float32"):
+    """Zero-copy view of stored embedding bytes as a 1-D NumPy array."""
+    if data is None:
+        return None
+    return np.frombuffer(data, dtype=dtype)
 
 
 # Create your models here.
@@ -25,6 +46,37 @@ class BotSettings(models.Model):
     # Prompts for LangGraph Agent
     intent_prompt = models.TextField(default="Classify the query into 'general' or 'product_search'.")
     attribute_extraction_prompt = models.TextField(default="Extract attributes from the query.")
+
+    # Product search engine
+    SEARCH_ENGINES = [
+        ("exact", "Exact"),
+        ("ivf", "IVF (approximate)"),
+    ]
+    search_engine = models.CharField(max_length=16, choices=SEARCH_ENGINES, default="exact")
+    ivf_lists = models.PositiveIntegerField(null=True, blank=True)
+    # Lists scanned per query; None probes ~10% of them (see IVFIndex.default_nprobe).
+    ivf_nprobe = models.PositiveIntegerField(null=True, blank=True)
+    # Fuse BM25 over names/attribute values with the vector ranking.
+    hybrid_search = models.BooleanField(default=False)
+    lexical_weight = models.FloatField(default=1.0)
+    # Coarse scoring on a compressed copy of the vectors, re-ranked exactly.
+    QUANTIZATION_MODES = [
+        ("none", "None"),
+        ("float16", "float16"),
+        ("int8", "int8 (scalar)"),
+    ]
+    search_quantization = models.CharField(max_length=16, choices=QUANTIZATION_MODES, default="none")
+    rerank_candidates = models.PositiveIntegerField(default=100)
+    # Coarse scoring on the top principal components of the catalog, re-ranked
+    # at full dimension; None keeps full-dimension scoring.
+    pca_components = models.PositiveIntegerField(null=True, blank=True)
+    # Split full scans of very large catalogs into row ranges scored in parallel.
+    search_shards = models.PositiveIntegerField(default=1)
+    # Maximal-marginal-relevance diversification; None disables it. 1.0 ranks
+    # by relevance only, lower values favour products unlike those already picked.
+    mmr_lambda = models.FloatField(null=True, blank=True)
+    mmr_candidates = models.PositiveIntegerField(default=100)
+
     def __str__(self):
         return self.name
 
@@ -36,7 +88,86 @@ class Products(models.Model):
     attributes = models.JSONField()
     image = models.URLField(max_length=500, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    embedding = models.JSONField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # CatalogVersion counter of the write that last changed the row, stamped in
+    # the same transaction as the bump; the search index refreshes the rows
+    # above the counter it was built at.
+    change_seq = models.PositiveBigIntegerField(default=0, db_index=True)
+    # Raw little-endian float32/float16 bytes, see encode_embedding().
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_dtype = models.CharField(max_length=8, default="float32")
+    embedding_dim = models.PositiveIntegerField(null=True, blank=True)
+    # SHA-256 of the text the embedding was computed from and the model
+    # ("provider:model") that computed it; empty when unknown.
+    embedding_hash = models.CharField(max_length=64, blank=True, default="")
+    embedding_model = models.CharField(max_length=128, blank=True, default="")
+
+    def get_embedding(self):
+        return decode_embedding(self.embedding, self.embedding_dtype)
+
+    def set_embedding(self, vector, dtype=None, text_hash="", model_id=""):
+        if vector is None:
+            self.embedding, self.embedding_dim = None, None
+            self.embedding_hash, self.embedding_model = "", ""
+            return
+        self.embedding, self.embedding_dtype, self.embedding_dim = encode_embedding(vector, dtype)
+        self.embedding_hash, self.embedding_model = text_hash, model_id or ""
+
+    def __str__(self):
+        return self.name
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counter bumped in the same transaction as every write to the catalog.
+
+    Caches key on it so telling whether the catalog changed costs one primary
+    key lookup instead of a scan of the products.
+    """
+    DB_TYPE = 'org'
+    counter = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, using=None):
+        return cls.objects.using(using).filter(pk=1).values_list("counter", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, using=None):
+        """Increment the counter and return its new value."""
+        with transaction.atomic(using=using):
+            rows = cls.objects.using(using).filter(pk=1)
+            if not rows.update(counter=models.F("counter") + 1):
+                _, created = cls.objects.using(using).get_or_create(pk=1, defaults={"counter": 1})
+                if not created:
+                    rows.update(counter=models.F("counter") + 1)
+            return cls.current(using)
+
+    def __str__(self):
+        return f"Catalog version {self.counter}"
+
+
+class EmbeddingJob(models.Model):
+    """A run of ``embed_products``, checkpointed after every batch so it can be resumed."""
+    DB_TYPE = 'org'
+    STATUSES = [
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+    status = models.CharField(max_length=16, choices=STATUSES, default="running")
+    embedding_model = models.CharField(max_length=128, blank=True, default="")
+    # Re-embed every product rather than only stale ones.
+    force = models.BooleanField(default=False)
+    total = models.PositiveIntegerField(default=0)
+    embedded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # Every product with an id up to the cursor has been embedded or recorded
+    # in failed_ids; a resumed job continues after it.
+    cursor = models.BigIntegerField(default=0)
+    failed_ids = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"Embedding job #{self.pk} ({self.status})"
@@ -0,0 +1,135 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows projected at a time, to bound temporary memory.
+CHUNK_ROWS = 65536
+
+
+class PCAProjection:
+    """
+    Projection of an organization's vectors onto their top principal components.
+
+    Catalog embeddings tend to occupy a small subspace of the model's 768-1536
+    dimensions, so a few hundred components keep most of the variance.
+    ``reduced`` holds every row projected onto ``components``; since
+    ``x ≈ mean + componentsᵀ·z``, ``x·q`` ranks like ``z·(components·q)`` and
+    the query is projected with one small matrix-vector product. Scores are
+    approximate and meant to pick candidates that are re-ranked against the
+    full-dimension vectors.
+
+    Saved as an ``.npz`` of the components with ``reduced`` in an ``.npy``
+    beside it, memory-mapped on load so workers share one copy.
+    """
+
+    def __init__(self, components, mean, explained_variance_ratio, reduced, version=None):
+        self.components = components
+        self.mean = mean
+        self.explained_variance_ratio = explained_variance_ratio
+        self.reduced = reduced
+        self.version = version
+
+    @property
+    def n_components(self):
+        return len(self.components)
+
+    @property
+    def explained_variance(self):
+        """Fraction of the catalog's variance kept by the components."""
+        return float(self.explained_variance_ratio.sum())
+
+    @property
+    def nbytes(self):
+        return self.components.nbytes + self.mean.nbytes + self.reduced.nbytes
+
+    @classmethod
+    def fit(cls, vectors, n_components, sample_size=20000, seed=0, version=None):
+        """Fit the components with an SVD of a random sample of the (normalized) ``vectors``."""
+        rng = np.random.default_rng(seed)
+        count = len(vectors)
+        rows = np.sort(rng.choice(count, min(count, sample_size), replace=False))
+        sample = np.asarray(vectors[rows], dtype=np.float32)
+        mean = sample.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(sample - mean, full_matrices=False)
+
+        n_components = max(1, min(n_components, len(vt)))
+        variance = singular_values ** 2
+        ratio = variance[:n_components] / variance.sum() if variance.sum() else np.zeros(n_components)
+        components = np.ascontiguousarray(vt[:n_components], dtype=np.float32)
+        projection = cls(components, mean, ratio.astype(np.float32), None, version=version)
+        projection.reduced = projection.project(vectors)
+        return projection
+
+    def project(self, vectors):
+        """Project ``vectors`` (rows) onto the components, chunk by chunk."""
+        reduced = np.empty((len(vectors), self.n_components), dtype=np.float32)
+        for start in range(0, len(vectors), CHUNK_ROWS):
+            block = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+            reduced[start:start + CHUNK_ROWS] = (block - self.mean) @ self.components.T
+        return reduced
+
+    def scores(self, query, start=0, end=None):
+        """Approximate dot products of ``query`` with rows ``start:end`` (default: every row)."""
+        return self.reduced[start:end] @ (self.components @ query)
+
+    def remap(self, new_rows, vectors, added, version=None):
+        """
+        Carry the projection over to an updated matrix without refitting.
+
+        ``new_rows[i]`` is the row that old row ``i`` moved to, or -1 if it was
+        removed. The ``added`` rows of ``vectors`` are projected afresh.
+        """
+        reduced = np.empty((len(vectors), self.n_components), dtype=np.float32)
+        kept = new_rows >= 0
+        reduced[new_rows[kept]] = self.reduced[kept]
+        reduced[added] = self.project(vectors[added])
+        return PCAProjection(
+            self.components, self.mean, self.explained_variance_ratio, reduced, version=version
+        )
+
+    def save(self, path):
+        """Write the components to ``path`` (an ``.npz``) and ``reduced`` to the ``.npy`` beside it."""
+        reduced_path = path.with_suffix(".npy")
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp_reduced = reduced_path.with_name(reduced_path.name + f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_reduced, "wb") as f:
+                np.save(f, np.ascontiguousarray(self.reduced, dtype=np.float32))
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    components=self.components,
+                    mean=self.mean,
+                    explained_variance_ratio=self.explained_variance_ratio,
+                    version=np.array(self.version or ""),
+                )
+            os.replace(tmp_reduced, reduced_path)
+            os.replace(tmp_path, path)
+        finally:
+            for tmp in (tmp_path, tmp_reduced):
+                if tmp.exists():
+                    tmp.unlink()
+
+    @classmethod
+    def load(cls, path, version=None):
+        """
+        Load a saved projection with ``reduced`` memory-mapped read-only.
+
+        Returns None if it is missing or was fitted for another catalog.
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved_version = str(data["version"])
+                if version is not None and saved_version != version:
+                    return None
+                components = data["components"]
+                mean = data["mean"]
+                explained_variance_ratio = data["explained_variance_ratio"]
+            reduced = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"No usable PCA projection at {path}: {e}")
+            return None
+        return cls(components, mean, explained_variance_ratio, reduced, version=saved_version)
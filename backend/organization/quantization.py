@@ -0,0 +1,130 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows converted to float32 at a time while scoring, to bound temporary memory.
+CHUNK_ROWS = 65536
+
+
+class QuantizedMatrix:
+    """
+    Compressed copy of an index's vectors for coarse scoring.
+
+    ``float16`` halves the matrix. ``int8`` applies per-dimension scalar
+    quantization: each dimension is mapped linearly from its ``[min, max]``
+    range onto 256 levels, quartering the matrix. Scores are approximate and
+    meant to pick candidates that are re-ranked against the full-precision
+    vectors.
+
+    Saved as an ``.npy`` of the codes, memory-mapped on load so workers share
+    one copy and a search only reads the float32 rows it re-ranks, plus an
+    ``.npz`` beside it with the int8 ranges and the catalog version.
+    """
+
+    def __init__(self, kind, data, offsets=None, scales=None, version=None):
+        self.kind = kind
+        self.data = data
+        self.offsets = offsets
+        self.scales = scales
+        self.version = version
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @classmethod
+    def build(cls, vectors, kind, version=None):
+        if kind == "float16":
+            matrix = cls(kind, None, version=version)
+        elif kind == "int8":
+            mins = np.asarray(vectors.min(axis=0), dtype=np.float32)
+            scales = (np.asarray(vectors.max(axis=0), dtype=np.float32) - mins) / 255
+            scales[scales == 0] = 1.0
+            # x ≈ offsets + scales * code, with codes in [-128, 127].
+            matrix = cls(kind, None, offsets=mins + 128 * scales, scales=scales, version=version)
+        else:
+            raise ValueError(f"Unsupported quantization: {kind}")
+        matrix.data = matrix.encode(vectors)
+        return matrix
+
+    def encode(self, vectors):
+        """Quantize ``vectors`` (rows) chunk by chunk, with this matrix's ranges."""
+        data = np.empty(vectors.shape, dtype=np.float16 if self.kind == "float16" else np.int8)
+        for start in range(0, len(vectors), CHUNK_ROWS):
+            block = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+            if self.kind == "int8":
+                block = np.clip(np.rint((block - self.offsets) / self.scales), -128, 127)
+            data[start:start + CHUNK_ROWS] = block
+        return data
+
+    def scores(self, query, start=0, end=None):
+        """Approximate dot products of ``query`` with rows ``start:end`` (default: every row)."""
+        if self.kind == "int8":
+            # q·x ≈ q·offsets + (q * scales)·code, so score the codes directly.
+            weights = query * self.scales
+            base = float(query @ self.offsets)
+        else:
+            weights, base = query, 0.0
+
+        end = len(self.data) if end is None else end
+        scores = np.empty(end - start, dtype=np.float32)
+        for offset in range(start, end, CHUNK_ROWS):
+            block = self.data[offset:min(offset + CHUNK_ROWS, end)].astype(np.float32)
+            scores[offset - start:offset - start + len(block)] = block @ weights
+        return scores + base if base else scores
+
+    def remap(self, new_rows, vectors, added, version=None):
+        """
+        Carry the codes over to an updated matrix without re-quantizing it.
+
+        ``new_rows[i]`` is the row that old row ``i`` moved to, or -1 if it was
+        removed. The ``added`` rows of ``vectors`` are encoded with the existing
+        int8 ranges; values outside them are clipped.
+        """
+        data = np.empty(vectors.shape, dtype=self.data.dtype)
+        kept = new_rows >= 0
+        data[new_rows[kept]] = self.data[kept]
+        data[added] = self.encode(vectors[added])
+        return QuantizedMatrix(self.kind, data, self.offsets, self.scales, version=version)
+
+    def save(self, path):
+        """Write the codes to ``path`` (an ``.npy``) and the ranges to the ``.npz`` beside it."""
+        params_path = path.with_suffix(".npz")
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp_params = params_path.with_name(params_path.name + f".{os.getpid()}.tmp")
+        params = {"offsets": self.offsets, "scales": self.scales} if self.kind == "int8" else {}
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(self.data))
+            with open(tmp_params, "wb") as f:
+                np.savez(f, kind=np.array(self.kind), version=np.array(self.version or ""), **params)
+            os.replace(tmp_path, path)
+            os.replace(tmp_params, params_path)
+        finally:
+            for tmp in (tmp_path, tmp_params):
+                if tmp.exists():
+                    tmp.unlink()
+
+    @classmethod
+    def load(cls, path, version=None):
+        """
+        Open a saved matrix with the codes memory-mapped read-only.
+
+        Returns None if it is missing or was built for another catalog.
+        """
+        try:
+            with np.load(path.with_suffix(".npz"), allow_pickle=False) as params:
+                saved_version = str(params["version"])
+                if version is not None and saved_version != version:
+                    return None
+                kind = str(params["kind"])
+                offsets = params["offsets"] if kind == "int8" else None
+                scales = params["scales"] if kind == "int8" else None
+            data = np.load(path, mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"No usable quantized matrix at {path}: {e}")
+            return None
+        return cls(kind, data, offsets, scales, version=saved_version)
@@ -1,24 +1,50 @@
-import numpy as np
-import os
-from django.conf import settings
-from .models import Products
-from aichatbot.utils import set_organization_slug, clear_organization_slug
+from .index import catalog_version, get_index
+from .models import BotSettings, Products
+from .search_cache import get_search_cache, search_cache_key
+from aichatbot.utils import set_organization_slug
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
-# Try imports
-try:
-    from langchain_google_genai import GoogleGenerativeAIEmbeddings
-except ImportError:
-    GoogleGenerativeAIEmbeddings = None
 
 
-def cosine_similarity(v1, v2):
-    return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+def _materialize(index, hits):
+    """
+    Turn per-query ``(rows, scores)`` hits into result dictionaries.
 
-def search_products(query: str, org_slug: str, top_k: int = 5):
+    Only the winners are materialized: attributes stay in the DB until needed
+    and are fetched for every query in a single lookup.
+    """
+    ids = {int(pk) for rows, _ in hits for pk in index.ids[rows]}
+    product_attributes = dict(
+        Products.objects.filter(id__in=ids).values_list("id", "attributes")
+    )
+
+    results = []
+    for rows, scores in hits:
+        results.append([
+            {
+                "name": index.names[row],
+                "price": float(index.prices[row]),
+                "attributes": product_attributes.get(int(index.ids[row]), {}),
+                "image": index.images[row],
+                "score": float(score)
+            }
+            for row, score in zip(rows, scores)
+        ])
+    return results
+
+
+def search_products(
+    query: str,
+    org_slug: str,
+    top_k: int = 5,
+    bot_settings=None,
+    attributes: dict = None,
+    embedding_model=None,
+    use_cache: bool = True,
+):
     """
     Search for products in a specific organization using semantic search.
     
@@ -26,70 +52,98 @@ def search_products(query: str, org_slug: str, top_k: int = 5):
         query: User's search query (strings).
         org_slug: The slug of the organization database to search in.
         top_k: Number of results to return.
+        bot_settings: The organization's BotSettings (selects the search engine).
+            Looked up when not given.
+        attributes: Extracted attributes used to pre-filter the catalog.
+        embedding_model: Model used to embed the query. Defaults to
+            ``LLM.get_embedding_model()``.
+        use_cache: Serve and store results in the search result cache.
         
     Returns:
         List of dictionaries containing product details and similarity score.
     """
-    # 1. Embed Query
+    # 1. Embedding model (the query is only embedded on a cache miss)
     from llm.llm import LLM
     try:
-        model = LLM.get_embedding_model()
+        model = embedding_model or LLM.get_embedding_model()
     except Exception as e:
-        print(f"Error initializing LLM: {e}")
+        logger.error(f"Error initializing LLM: {e}")
         return []
 
-    query_vector = model.embed_query(query)
-    
     # 2. Fetch Products
-    # We must set the context to the correct org DB
-    # We use a context manager or try/finally block
-    # But since we are likely calling this from verified context or needing to switch:
-
-    # Actually, we should use the router logic via utils
+    # The organization context is left set: callers such as the chat view
+    # still need it, and the middleware clears it after the request.
+    set_organization_slug(org_slug)
 
-    # Actually, we should use the router logic via utils
+    try:
+        if bot_settings is None:
+            bot_settings = BotSettings.objects.first()
 
-    # We set it for this search operation.
-    # Since we removed the finally/clear, this is now "switch scope".
-    # This relies on the caller (View) to clean up or the thread to die.
-    set_organization_slug(org_slug)
+        # Repeated searches skip the embedding call and the scan. The
+        # catalog version in the key, the one the index is loaded at,
+        # retires entries when products change, bulk writes included.
+        version = catalog_version()
+        cache = get_search_cache() if use_cache else None
+        if cache is not None:
+            key = search_cache_key(
+                org_slug, version, query, attributes, top_k, bot_settings,
+                embedding_model=getattr(model, "model_id", None),
+            )
+            results = cache.get(key)
+            if results is not None:
+                return results
 
-    # Ensure DB exists in settings (dynamic add if needed - reusing logic from router/signals)
+        query_vector = model.embed_query(query)
+        index = get_index(org_slug, version)
+        rows, scores = index.search(
+            query_vector, top_k, bot_settings, query_text=query, attributes=attributes
+        )
 
-    try:
-        products = Products.objects.exclude(embedding__isnull=True)
-        # Note: If database is large, fetching all embeddings to memory is bad.
-        # But for <10k it's perfectly fine and fast.
-        
-        results = []
-        for product in products:
-            if not product.embedding:
-                continue
-            
-            # DB returns JSONList, usually python list. Convert to numpy.
-            prod_vector = np.array(product.embedding)
-            score = cosine_similarity(query_vector, prod_vector)
-            
-            results.append({
-                "name": product.name,
-                "price": float(product.price),
-                "attributes": product.attributes,
-                "image": product.image if product.image else None,
-                "score": float(score)
-            })
-            
-        # 3. Sort and Return
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+        results = _materialize(index, [(rows, scores)])[0]
+        if cache is not None:
+            cache.set(key, results)
+        return results
     except Exception as e:
         logger.error(f"Error during product search: {e}")
         return []
-    finally:
-        # We should NOT blindly clear it if we are in a larger request context.
-        # However, for safety in standalone scripts, we want to clear.
-        # But in a nested call stack like View -> Node -> Search, clearing breaks the View.
-        # Ideally, we check if we changed it.
-        # For this codebase, let's REMOVE the clear and let the View/Middleware handle it.
-        # OR better: restore previous.
-        pass
-        # clear_organization_slug() # CAUSING BUG IN CHAT VIEW
+
+
+def search_products_many(queries: list, org_slug: str, top_k: int = 5, bot_settings=None):
+    """
+    Search for many queries at once in a specific organization.
+
+    All queries are embedded in one batched call and scored against the catalog
+    with matrix-matrix products, which is far cheaper than calling
+    ``search_products`` in a loop. Attribute filters and hybrid search are not
+    applied here.
+
+    Args:
+        queries: List of search queries.
+        org_slug: The slug of the organization database to search in.
+        top_k: Number of results to return per query.
+        bot_settings: The organization's BotSettings. Looked up when not given.
+
+    Returns:
+        One list of result dictionaries per query, in the order of ``queries``.
+    """
+    if not queries:
+        return []
+
+    from llm.llm import LLM
+    try:
+        model = LLM.get_embedding_model()
+    except Exception as e:
+        logger.error(f"Error initializing LLM: {e}")
+        return [[] for _ in queries]
+
+    set_organization_slug(org_slug)
+
+    try:
+        query_vectors = model.embed_queries(queries)
+        if bot_settings is None:
+            bot_settings = BotSettings.objects.first()
+        index = get_index(org_slug)
+        return _materialize(index, index.search_many(query_vectors, top_k, bot_settings))
+    except Exception as e:
+        logger.error(f"Error during batched product search: {e}")
+        return [[] for _ in queries]
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+
+from aichatbot.cache import TieredCache, register_cache
+from llm.embedding_cache import normalize_text
+
+from .filters import normalize_key
+
+# BotSettings fields that change search results and so belong in the cache key.
+SEARCH_SETTINGS_FIELDS = (
+    "search_engine",
+    "ivf_lists",
+    "ivf_nprobe",
+    "hybrid_search",
+    "lexical_weight",
+    "search_quantization",
+    "rerank_candidates",
+    "pca_components",
+    "mmr_lambda",
+    "mmr_candidates",
+)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """
+    Return the process-wide search result cache, or None if it is disabled.
+
+    Configured by ``SEARCH_CACHE_SIZE``, ``SEARCH_CACHE_TTL`` and
+    ``SEARCH_CACHE_PATH`` like the embedding cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from django.conf import settings
+
+            size = getattr(settings, "SEARCH_CACHE_SIZE", 0)
+            if not size:
+                return None
+            _cache = register_cache("search_results", TieredCache(
+                maxsize=size,
+                ttl=getattr(settings, "SEARCH_CACHE_TTL", None),
+                path=getattr(settings, "SEARCH_CACHE_PATH", None),
+                table="search_results",
+            ))
+        return _cache
+
+
+def canonical_attributes(attributes):
+    """
+    Normalize extracted attributes so equivalent dicts compare equal.
+
+    Keys and string values are normalized, empty values dropped and lists
+    sorted, since list values are OR-ed and their order does not matter.
+    """
+    def canonical(value):
+        if isinstance(value, dict):
+            return canonical_attributes(value)
+        if isinstance(value, (list, tuple)):
+            return sorted((canonical(v) for v in value), key=json.dumps)
+        if isinstance(value, str):
+            return normalize_text(value)
+        return value
+
+    return {
+        normalize_key(key): canonical(value)
+        for key, value in (attributes or {}).items()
+        if value not in (None, "", [], {})
+    }
+
+
+def search_cache_key(org_slug, catalog_version, query, attributes, top_k, bot_settings, embedding_model=None):
+    """
+    Cache key for one ``search_products`` call.
+
+    Includes the catalog version (``catalog_version()``), so saving,
+    deleting, re-embedding or bulk-writing any product moves the organization
+    onto fresh keys, the id of the model the query is embedded with, and the search
+    settings of ``bot_settings``, so changing them does not serve stale
+    rankings.
+    """
+    search_settings = [getattr(bot_settings, field, None) for field in SEARCH_SETTINGS_FIELDS]
+    payload = json.dumps(
+        [normalize_text(query), canonical_attributes(attributes), top_k, search_settings, embedding_model],
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f"{org_slug}:{catalog_version}:{digest}"
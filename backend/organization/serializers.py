@@ -14,11 +14,19 @@ class BotSettingsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class ProductsSerializer(serializers.ModelSerializer):
+    # Stored as raw bytes; exposed read-only as a list of floats.
+    embedding = serializers.SerializerMethodField()
+
     class Meta:
         model = Products
         fields = '__all__'
+        read_only_fields = ['embedding_dtype', 'embedding_dim', 'embedding_hash', 'embedding_model']
+
+    def get_embedding(self, obj):
+        vector = obj.get_embedding()
+        return None if vector is None else vector.tolist()
 
 class ProductListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Products
-        exclude = ["embedding"]
+        exclude = ["embedding", "embedding_dtype", "embedding_dim", "embedding_hash", "embedding_model"]
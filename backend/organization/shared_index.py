@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import struct
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from .index import ProductIndex, ann_path, current_index, projection_path, quantized_path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Segment layout: header, float32 vectors, int64 ids, float64 prices, JSON metadata.
+HEADER = struct.Struct("<4sIqqq")
+MAGIC = b"AIIX"
+SEGMENT_FORMAT_VERSION = 1
+
+
+class SharedSegment(shared_memory.SharedMemory):
+    """
+    Shared memory segment whose lifetime is managed by generation, not by process.
+
+    The resource tracker would otherwise unlink a segment as soon as the process
+    that created or attached it exits (e.g. a recycled gunicorn worker).
+    Views must be taken with ``np.frombuffer``, which holds a buffer export:
+    closing then fails while a view is alive and the mapping is released with
+    the last view instead of being unmapped under it.
+
+    The descriptor returned by ``shm_open`` is closed as soon as the segment
+    is mapped; the mapping keeps its own, which goes with the last view, so
+    an attached index that is dropped while views are alive leaks nothing.
+    New segments are allocated up front, so a full ``/dev/shm`` fails here
+    with ``ENOSPC`` instead of with a SIGBUS on the first write past its end.
+    """
+
+    def __init__(self, name, create=False, size=0):
+        try:
+            super().__init__(name=name, create=create, size=size, track=False)
+            self._tracked = False
+        except TypeError:
+            # Python < 3.13 always registers the segment with the tracker.
+            super().__init__(name=name, create=create, size=size)
+            resource_tracker.unregister(self._name, "shared_memory")
+            self._tracked = True
+        if getattr(self, "_fd", -1) >= 0:
+            try:
+                if create and hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(self._fd, 0, size)
+            except OSError:
+                self.close()
+                self.unlink()
+                raise
+            finally:
+                if self._fd >= 0:
+                    os.close(self._fd)
+                    self._fd = -1
+
+    def unlink(self):
+        if self._tracked:
+            # unlink() unregisters the segment again on Python < 3.13.
+            resource_tracker.register(self._name, "shared_memory")
+        super().unlink()
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+def manifest_path(org_slug):
+    """Small JSON file naming the current shared-memory generation of ``org_slug``."""
+    return settings.BASE_DIR / "db" / f"{org_slug}.shm.json"
+
+
+def read_manifest(org_slug):
+    try:
+        with open(manifest_path(org_slug), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(org_slug, manifest):
+    path = manifest_path(org_slug)
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def _unlink(name):
+    try:
+        segment = SharedSegment(name)
+    except FileNotFoundError:
+        return
+    segment.unlink()
+    segment.close()
+
+
+@contextmanager
+def publish_lock(org_slug):
+    """Serialize publishing across processes so only one of them rebuilds an index."""
+    if fcntl is None:
+        yield
+        return
+    with open(settings.BASE_DIR / "db" / f"{org_slug}.shm.lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish(index, org_slug):
+    """
+    Copy ``index`` into a new shared memory generation and point the manifest at it.
+
+    The previous generation stays available for workers that are attaching to
+    it right now; the one before that is unlinked. Mappings already held by
+    workers survive the unlink until they drop them.
+
+    Returns:
+        The new generation number.
+    """
+    manifest = read_manifest(org_slug) or {}
+    generation = manifest.get("generation", 0) + 1
+    name = f"aichatbot_{org_slug}_{generation}"
+
+    meta = json.dumps({
+        "catalog_version": index.version,
+        "names": index.names.tolist(),
+        "images": index.images.tolist(),
+    }, ensure_ascii=False).encode()
+    count, dim = len(index), index.dim
+    size = HEADER.size + count * dim * 4 + count * 16 + len(meta)
+
+    _unlink(name)  # Left over from a crashed publisher.
+    try:
+        segment = SharedSegment(name, create=True, size=size)
+    except OSError as e:
+        raise OSError(e.errno, f"could not allocate {size >> 20} MB: {e.strerror}") from e
+    try:
+        HEADER.pack_into(segment.buf, 0, MAGIC, SEGMENT_FORMAT_VERSION, count, dim, len(meta))
+        offset = HEADER.size
+        for array, dtype in ((index.vectors, np.float32), (index.ids, np.int64), (index.prices, np.float64)):
+            view = np.frombuffer(segment.buf, dtype=dtype, count=array.size, offset=offset)
+            view.reshape(array.shape)[...] = array
+            offset += view.nbytes
+            del view
+        segment.buf[offset:offset + len(meta)] = meta
+    finally:
+        segment.close()
+
+    _write_manifest(org_slug, {
+        "generation": generation,
+        "segment": name,
+        "previous": manifest.get("segment"),
+        "catalog_version": index.version,
+        "count": count,
+        "dim": dim,
+        "published_at": time.time(),
+    })
+    if manifest.get("previous"):
+        _unlink(manifest["previous"])
+    logger.info(f"Published search index for '{org_slug}' as generation {generation} ({size >> 20} MB)")
+    return generation
+
+
+def unpublish(org_slug):
+    """Unlink every published generation of ``org_slug`` and remove its manifest."""
+    manifest = read_manifest(org_slug)
+    if manifest is None:
+        return
+    for name in (manifest.get("segment"), manifest.get("previous")):
+        if name:
+            _unlink(name)
+    manifest_path(org_slug).unlink(missing_ok=True)
+
+
+def attach(org_slug, manifest=None):
+    """
+    Map the published index of ``org_slug`` read-only.
+
+    Returns None when nothing is published or the segment is gone.
+    """
+    manifest = manifest or read_manifest(org_slug)
+    if manifest is None:
+        return None
+    try:
+        segment = SharedSegment(manifest["segment"])
+    except (FileNotFoundError, KeyError):
+        return None
+
+    magic, format_version, count, dim, meta_len = HEADER.unpack_from(segment.buf, 0)
+    if magic != MAGIC or format_version != SEGMENT_FORMAT_VERSION:
+        return None
+    offset = HEADER.size
+    arrays = []
+    for shape, dtype in (((count, dim), np.float32), ((count,), np.int64), ((count,), np.float64)):
+        size = int(np.prod(shape))
+        array = np.frombuffer(segment.buf, dtype=dtype, count=size, offset=offset).reshape(shape)
+        array.flags.writeable = False
+        arrays.append(array)
+        offset += array.nbytes
+    vectors, ids, prices = arrays
+    meta = json.loads(bytes(segment.buf[offset:offset + meta_len]))
+
+    index = ProductIndex(
+        ids,
+        meta["names"],
+        prices,
+        meta["images"],
+        vectors,
+        version=meta["catalog_version"],
+        org_slug=org_slug,
+    )
+    index.generation = manifest["generation"]
+    return index
+
+
+def shared_index(org_slug, version, index=None):
+    """
+    Return the index for ``org_slug`` at ``version`` backed by shared memory.
+
+    Attaches to the published generation when it is current. Otherwise one
+    process (under ``publish_lock``) brings the index up to date the usual
+    way, publishes it as a new generation, and every worker then attaches to
+    that single copy instead of keeping its own. Each generation copies the
+    whole matrix, so within ``SEARCH_SHARED_MEMORY_MIN_INTERVAL`` of the last
+    publish a burst of catalog writes is only merged into a private copy,
+    marked with ``publish_after`` so ``get_index`` publishes it once the
+    interval is over. Falls back to the private index if publishing fails.
+    """
+    manifest = read_manifest(org_slug)
+    if manifest and manifest.get("catalog_version") == version:
+        attached = attach(org_slug, manifest)
+        if attached is not None:
+            return attached
+
+    published_at = manifest.get("published_at") if manifest else None
+    if published_at is not None:
+        publish_after = published_at + getattr(settings, "SEARCH_SHARED_MEMORY_MIN_INTERVAL", 0)
+        if time.time() < publish_after:
+            if index is None:
+                index = attach(org_slug, manifest)
+            index = current_index(org_slug, version, index)
+            index.publish_after = publish_after
+            return index
+
+    with publish_lock(org_slug):
+        # Another worker may have published while we waited for the lock.
+        manifest = read_manifest(org_slug)
+        if manifest and manifest.get("catalog_version") == version:
+            attached = attach(org_slug, manifest)
+            if attached is not None:
+                return attached
+
+        if index is None and manifest:
+            index = attach(org_slug, manifest)
+        index = current_index(org_slug, version, index)
+        try:
+            publish(index, org_slug)
+        except OSError as e:
+            logger.warning(
+                f"Could not publish search index for '{org_slug}' to shared memory ({e}); "
+                "every worker keeps a private copy. In a container, raise shm_size."
+            )
+            return index
+        # Share refitted or remapped IVF lists, projections and quantized
+        # vectors with the other workers too; the latter are memory-mapped
+        # from the file rather than handed over.
+        derived = [(ann, ann_path(org_slug)) for ann in index._ann.values()]
+        derived += [(p, projection_path(org_slug)) for p in index._projections.values()]
+        derived += [(q, quantized_path(org_slug, kind)) for kind, q in index._quantized.items()]
+        for item, path in derived:
+            try:
+                item.save(path)
+            except OSError as e:
+                logger.warning(f"Could not write {path}: {e}")
+
+    attached = attach(org_slug)
+    if attached is None:
+        return index
+    attached._ann = index._ann
+    attached._projections = index._projections
+    return attached
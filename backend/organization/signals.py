@@ -1,8 +1,15 @@
-from django.db.models.signals import post_save
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.core.management import call_command
 from django.conf import settings
-from .models import Organization, Products
+from .models import CatalogVersion, Organization, Products
+from .embedding import embedding_text_hash, product_embedding_text
+from .index import refresh_index
 import logging
 import json
 import os
@@ -31,3 +38,88 @@ def create_org_database(sender, instance, created, **kwargs):
             print(f"Failed to migrate database for organization {slug}: {e}")
 
 
+_auto_embed = ContextVar("auto_embed", default=True)
+
+
+@contextmanager
+def auto_embedding_disabled():
+    """Save products without embedding them on the fly (bulk loads embed afterwards)."""
+    token = _auto_embed.set(False)
+    try:
+        yield
+    finally:
+        _auto_embed.reset(token)
+
+
+@receiver(pre_save, sender=Products)
+def check_product_text(sender, instance, raw, using, update_fields, **kwargs):
+    """Flag products whose embedding is missing or whose name/attributes changed."""
+    instance._needs_embedding = False
+    if raw or not _auto_embed.get():
+        return
+    if update_fields is not None and not {"name", "attributes"} & set(update_fields):
+        return
+    if instance.embedding is None:
+        instance._needs_embedding = True
+    elif instance.embedding_hash:
+        # The hash of the embedded text tells without reading the old row.
+        text = product_embedding_text(instance.name, instance.attributes)
+        instance._needs_embedding = instance.embedding_hash != embedding_text_hash(text)
+    elif instance.pk:
+        old = Products.objects.using(using).filter(pk=instance.pk).values_list("name", "attributes").first()
+        instance._needs_embedding = old is not None and (
+            product_embedding_text(*old) != product_embedding_text(instance.name, instance.attributes)
+        )
+
+
+def _embed_product(instance, using):
+    from llm.llm import LLM
+
+    text = product_embedding_text(instance.name, instance.attributes)
+    try:
+        embedding_model = LLM.get_embedding_model()
+        # Products are documents; some providers embed queries differently.
+        vector = embedding_model.embed_documents([text])[0]
+    except Exception as e:
+        logger.error(f"Failed to embed product {instance.pk} ('{instance.name}'): {e}")
+        return
+    instance.set_embedding(
+        vector,
+        text_hash=embedding_text_hash(text),
+        model_id=getattr(embedding_model, "model_id", ""),
+    )
+    instance.updated_at = timezone.now()
+    # update() rather than save() so the signals do not fire again.
+    Products.objects.using(using).filter(pk=instance.pk).update(
+        embedding=instance.embedding,
+        embedding_dtype=instance.embedding_dtype,
+        embedding_dim=instance.embedding_dim,
+        embedding_hash=instance.embedding_hash,
+        embedding_model=instance.embedding_model,
+        updated_at=instance.updated_at,
+    )
+
+
+@receiver(post_save, sender=Products)
+def update_product_index(sender, instance, raw, using, **kwargs):
+    """
+    Keep the search index in step with product edits.
+
+    Re-embeds the product when its text changed, then merges it into this
+    process's index once the transaction commits. Other workers pick the
+    change up through the catalog version, bumped here, on their next search.
+    """
+    if raw:
+        return
+    if getattr(instance, "_needs_embedding", False):
+        _embed_product(instance, using)
+    with transaction.atomic(using=using):
+        instance.change_seq = CatalogVersion.bump(using)
+        Products.objects.using(using).filter(pk=instance.pk).update(change_seq=instance.change_seq)
+    transaction.on_commit(lambda: refresh_index(using), using=using)
+
+
+@receiver(post_delete, sender=Products)
+def remove_product_from_index(sender, instance, using, **kwargs):
+    CatalogVersion.bump(using)
+    transaction.on_commit(lambda: refresh_index(using), using=using)
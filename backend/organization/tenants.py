@@ -0,0 +1,129 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from aichatbot.utils import clear_organization_slug, set_organization_slug
+from llm.rate_limit import set_provider_slots
+
+from .models import Organization
+
+
+def organization_slugs():
+    """Slugs of every organization that has its own database."""
+    return list(
+        Organization.objects.exclude(slug__isnull=True).exclude(slug='')
+        .order_by('slug').values_list('slug', flat=True)
+    )
+
+
+def _init_worker(provider_slots):
+    import django
+
+    django.setup()
+    # Connections inherited from the parent are not safe to share.
+    connections.close_all()
+    set_provider_slots(provider_slots)
+
+
+def _run_command(slug, command, slug_option, options):
+    """Run ``command`` for one organization, with output captured, and report how it went."""
+    # Only this organization's database is added to the worker's settings.
+    if slug not in settings.DATABASES:
+        new_db = settings.DATABASES['default'].copy()
+        new_db['NAME'] = settings.BASE_DIR / f"db/{slug}.sqlite3"
+        settings.DATABASES[slug] = new_db
+
+    stdout, stderr = StringIO(), StringIO()
+    args = () if slug_option else (slug,)
+    kwargs = {slug_option: slug} if slug_option else {}
+    start = time.perf_counter()
+    error = None
+    set_organization_slug(slug)
+    try:
+        # Failures raise (CommandError for the expected ones); stderr may just
+        # carry warnings and is kept with the output.
+        call_command(command, *args, stdout=stdout, stderr=stderr, **kwargs, **options)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    finally:
+        clear_organization_slug()
+        connections[slug].close()
+    return {
+        'slug': slug,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+        'output': stdout.getvalue() + stderr.getvalue(),
+    }
+
+
+def run_command_per_organization(command, slugs, jobs=1, slug_option=None, provider_calls=0,
+                                 on_result=None, **options):
+    """
+    Run a management command once per organization, ``jobs`` organizations at a time.
+
+    Each organization runs in a pool process of its own (in this process
+    when ``jobs`` is 1) with only its database added to the settings and its
+    own organization context. The slug is passed positionally, or as the
+    ``slug_option`` keyword (e.g. ``database`` for ``migrate``). With
+    ``provider_calls``, a semaphore shared by every process caps the
+    embedding provider calls in flight across all organizations.
+
+    ``on_result(result)`` is called as each organization finishes.
+
+    Returns:
+        One dict per organization with its ``slug``, ``seconds``, ``error``
+        (None on success) and captured ``output``, in ``slugs`` order.
+    """
+    results = {}
+    if jobs <= 1 or len(slugs) <= 1:
+        for slug in slugs:
+            results[slug] = _run_command(slug, command, slug_option, options)
+            if on_result is not None:
+                on_result(results[slug])
+        return [results[slug] for slug in slugs]
+
+    context = multiprocessing.get_context()
+    provider_slots = context.BoundedSemaphore(provider_calls) if provider_calls > 0 else None
+    # Forked workers must not inherit open database connections.
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(slugs)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(provider_slots,),
+    ) as executor:
+        futures = {
+            executor.submit(_run_command, slug, command, slug_option, options): slug
+            for slug in slugs
+        }
+        for future in as_completed(futures):
+            slug = futures[future]
+            try:
+                results[slug] = future.result()
+            except Exception as e:
+                # The worker process itself died.
+                results[slug] = {'slug': slug, 'seconds': 0.0, 'error': str(e) or type(e).__name__, 'output': ''}
+            if on_result is not None:
+                on_result(results[slug])
+    return [results[slug] for slug in slugs]
+
+
+def write_summary(command, results):
+    """Write a per-organization table of timings and failures to ``command``'s output."""
+    failed = [result for result in results if result['error']]
+    width = max([len(result['slug']) for result in results] + [12])
+    command.stdout.write(f"\n{'organization':<{width}}  {'seconds':>8}  status")
+    for result in results:
+        status = f"FAILED: {result['error']}" if result['error'] else "ok"
+        command.stdout.write(f"{result['slug']:<{width}}  {result['seconds']:>8.1f}  {status}")
+    total = sum(result['seconds'] for result in results)
+    summary = f"{len(results) - len(failed)}/{len(results)} organizations succeeded ({total:.1f}s of work)"
+    if failed:
+        command.stderr.write(command.style.ERROR(summary))
+    else:
+        command.stdout.write(command.style.SUCCESS(summary))
@@ -1,3 +1,1122 @@
-from django.test import TestCase
+import errno
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from aichatbot.cache import TieredCache
+from aichatbot.utils import clear_organization_slug, set_organization_slug
+
+from .catalog_io import export_products, import_products, iter_json_items, load_embeddings, open_catalog
+from .embedding import (
+    embed_products_batched,
+    embedding_text_hash,
+    product_embedding_text,
+    run_embedding_job,
+    stale_products,
+)
+from .evaluation import (
+    HashEmbeddings,
+    evaluate,
+    exact_top_k,
+    recall_at_k,
+    sample_queries,
+    synthetic_catalog,
+)
+from .index import ProductIndex, catalog_version, index_paths, invalidate_index, normalize, quantized_path
+from .index_cache import IndexCache
+from .mmr import maximal_marginal_relevance
+from .models import BotSettings, CatalogVersion, EmbeddingJob, Organization, Products, decode_embedding
+from .quantization import QuantizedMatrix
+from .search import search_products, search_products_many
+from .search_cache import search_cache_key
+from .shared_index import attach, publish, read_manifest, shared_index, unpublish
+from .signals import auto_embedding_disabled
+from .tenants import run_command_per_organization, write_summary
+
+TEST_ORG = "test_org"
+DIM = 16
+
+# Organization databases are normally added to the settings on first use, but
+# the test runner only creates test databases for aliases known when it starts.
+if TEST_ORG not in settings.DATABASES:
+    test_db = settings.DATABASES['default'].copy()
+    test_db['NAME'] = settings.BASE_DIR / f"db/{TEST_ORG}.sqlite3"
+    settings.DATABASES[TEST_ORG] = test_db
+
+
+def random_vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+
+class TestEmbeddings(HashEmbeddings):
+    """``HashEmbeddings`` that fail any batch with a text containing one of ``fail_on``."""
+
+    model_id = "test:hash"
+
+    def __init__(self, fail_on=(), error=RuntimeError):
+        super().__init__(DIM)
+        self.fail_on = fail_on
+        self.error = error
+
+    def embed_documents(self, texts):
+        if any(word in text for text in texts for word in self.fail_on):
+            raise self.error("provider error")
+        return super().embed_documents(texts)
+
+
+class OrganizationTestCase(TestCase):
+    """Runs every test against an organization database with its context set."""
+
+    databases = {"default", TEST_ORG}
+
+    def setUp(self):
+        set_organization_slug(TEST_ORG)
+        self.addCleanup(clear_organization_slug)
+        # Index files are written next to the organization databases.
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = Path(tmp_dir.name)
+        (self.tmp_dir / "db").mkdir()
+        base_dir = override_settings(BASE_DIR=self.tmp_dir)
+        base_dir.enable()
+        self.addCleanup(base_dir.disable)
+        self.addCleanup(invalidate_index)
+
+    def create_product(self, name, attributes=None, price=100, vector=None):
+        """Save a product with ``vector`` as an up-to-date embedding, without calling a provider."""
+        product = Products(name=name, price=price, attributes=attributes or {})
+        if vector is not None:
+            text = product_embedding_text(product.name, product.attributes)
+            product.set_embedding(vector, text_hash=embedding_text_hash(text))
+        with auto_embedding_disabled():
+            product.save()
+        return product
+
+
+class ProductIndexSearchTests(OrganizationTestCase):
+    def test_exact_search_matches_brute_force(self):
+        vectors = random_vectors(40)
+        products = [self.create_product(f"Product {i}", vector=v) for i, v in enumerate(vectors)]
+        index = ProductIndex.build()
+        query = random_vectors(1, seed=1)[0]
+
+        rows, scores = index.search(query, 5)
+
+        expected = np.argsort(-(normalize(vectors.copy()) @ (query / np.linalg.norm(query))))[:5]
+        self.assertEqual(index.ids[rows].tolist(), [products[i].pk for i in expected])
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_empty_catalog(self):
+        index = ProductIndex.build()
+
+        rows, scores = index.search(random_vectors(1)[0], 5)
+
+        self.assertEqual(len(rows), 0)
+        self.assertEqual(len(index.search_many(random_vectors(2), 5)), 2)
+
+
+class IndexFileTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, vector in enumerate(random_vectors(20)):
+            self.create_product(f"Product {i}", price=100 + i, vector=vector)
+        self.index = ProductIndex.build(version=catalog_version(), org_slug=TEST_ORG)
+        self.index.save(TEST_ORG)
+        self.vectors_path, self.meta_path = index_paths(TEST_ORG)
+
+    def test_round_trip(self):
+        loaded = ProductIndex.load(TEST_ORG, version=self.index.version)
+
+        self.assertIsInstance(loaded.vectors, np.memmap)
+        self.assertFalse(loaded.vectors.flags.writeable)
+        np.testing.assert_array_equal(loaded.vectors, self.index.vectors)
+        self.assertEqual(loaded.ids.tolist(), self.index.ids.tolist())
+        self.assertEqual(loaded.names.tolist(), self.index.names.tolist())
+        self.assertEqual(loaded.prices.tolist(), self.index.prices.tolist())
+        self.assertEqual(loaded.images.tolist(), self.index.images.tolist())
+        self.assertEqual((loaded.version, loaded.org_slug), (self.index.version, TEST_ORG))
+
+    def test_other_catalog_or_format_version_is_not_loaded(self):
+        self.assertIsNone(ProductIndex.load(TEST_ORG, version="other"))
+
+        meta = json.loads(self.meta_path.read_text())
+        meta["format"] -= 1
+        self.meta_path.write_text(json.dumps(meta))
+
+        self.assertIsNone(ProductIndex.load(TEST_ORG))
+
+    def test_vectors_swapped_under_the_sidecar_are_detected(self):
+        # A concurrent rebuild replaced the matrix after this sidecar was written.
+        np.save(self.vectors_path, random_vectors(21))
+
+        self.assertIsNone(ProductIndex.load(TEST_ORG))
+
+    def test_missing_files(self):
+        self.vectors_path.unlink()
+
+        self.assertIsNone(ProductIndex.load(TEST_ORG))
+
+
+class CatalogVersionTests(OrganizationTestCase):
+    def test_changes_on_save_and_delete(self):
+        product = self.create_product("Shirt", vector=random_vectors(1)[0])
+        versions = [catalog_version()]
+
+        product.price = 120
+        with auto_embedding_disabled():
+            product.save()
+        versions.append(catalog_version())
+        product.delete()
+        versions.append(catalog_version())
+
+        self.assertEqual(len(set(versions)), 3)
+        self.assertEqual(CatalogVersion.current(), 3)
+
+    def test_does_not_scan_products(self):
+        for i, vector in enumerate(random_vectors(10)):
+            self.create_product(f"Product {i}", vector=vector)
+
+        with CaptureQueriesContext(connections[TEST_ORG]) as queries:
+            catalog_version()
+
+        # Only MAX() over indexed columns and the counter row; nothing that reads every product.
+        for query in queries.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"].upper())
+            self.assertNotIn("EMBEDDING", query["sql"].upper())
+
+
+class AttributeFilterTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        colors = ["Red", "Navy Blue", "Black"]
+        self.products = [
+            self.create_product(
+                f"Shirt {i}",
+                attributes={"color": colors[i % 3], "size": "XL" if i % 2 else "M"},
+                price=100 + 10 * i,
+                vector=vector,
+            )
+            for i, vector in enumerate(random_vectors(30))
+        ]
+        self.by_id = {product.pk: product for product in self.products}
+        self.index = ProductIndex.build()
+        self.query = random_vectors(1, seed=1)[0]
+
+    def search(self, attributes, top_k=30):
+        rows, _ = self.index.search(self.query, top_k, attributes=attributes)
+        return [self.by_id[pk] for pk in self.index.ids[rows]]
+
+    def test_attributes_narrow_the_candidates(self):
+        hits = self.search({"color": "red", "size": "XL"})
+
+        self.assertEqual(len(hits), 5)
+        self.assertTrue(all(p.attributes == {"color": "Red", "size": "XL"} for p in hits))
+
+    def test_word_of_a_multi_word_value_matches(self):
+        hits = self.search({"color": "blue"})
+
+        self.assertEqual(len(hits), 10)
+        self.assertTrue(all(p.attributes["color"] == "Navy Blue" for p in hits))
+
+    def test_price_range(self):
+        hits = self.search({"budget": "under 200"})
+        self.assertEqual(sorted(p.price for p in hits), list(range(100, 201, 10)))
+
+        hits = self.search({"color": "black", "min_price": 300})
+        self.assertEqual(sorted(p.price for p in hits), [300, 330, 360, 390])
+
+    def test_unknown_keys_are_ignored(self):
+        self.assertEqual(len(self.search({"brand": "Acme", "color": "red"})), 10)
+
+    def test_no_match_falls_back_to_the_whole_catalog(self):
+        unfiltered, _ = self.index.search(self.query, 5)
+
+        rows, _ = self.index.search(self.query, 5, attributes={"color": "purple"})
+
+        self.assertEqual(rows.tolist(), unfiltered.tolist())
+
+
+class HybridSearchTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        vectors = random_vectors(100)
+        self.query = random_vectors(1, seed=1)[0]
+        # Rows by vector similarity to the query, best first.
+        self.ranking = np.argsort(-(normalize(vectors.copy()) @ self.query))
+        names = [f"Product {i}" for i in range(100)]
+        names[self.ranking[20]] = "Acme Drill XR-2041"
+        self.products = [self.create_product(name, vector=v) for name, v in zip(names, vectors)]
+        self.bot_settings = BotSettings(hybrid_search=True)
+
+    def test_exact_keyword_match_is_ranked_first(self):
+        index = ProductIndex.build()
+        sku = self.products[self.ranking[20]].pk
+
+        vector_rows, _ = index.search(self.query, 5)
+        rows, scores = index.search(self.query, 5, self.bot_settings, query_text="XR-2041")
+
+        self.assertNotIn(sku, index.ids[vector_rows])
+        self.assertEqual(index.ids[rows[0]], sku)
+        np.testing.assert_allclose(scores, index.vectors[rows] @ normalize(self.query.copy()), rtol=1e-6)
+
+    def test_lexical_index_follows_refresh(self):
+        index = ProductIndex.build(version=catalog_version())
+        index.get_lexical()
+        renamed = self.products[self.ranking[40]]
+        renamed.name = "Bosch Hammer ZB-77"
+        with auto_embedding_disabled():
+            renamed.save()
+
+        refreshed = index.refresh(catalog_version())
+        rows, _ = refreshed.search(self.query, 5, self.bot_settings, query_text="bosch zb-77")
+
+        self.assertEqual(refreshed.ids[rows[0]], renamed.pk)
+        self.assertEqual(len(refreshed.get_lexical()), 100)
+
+
+class IndexRefreshTests(OrganizationTestCase):
+    def assertSameIndex(self, index, expected):
+        self.assertEqual(index.ids.tolist(), expected.ids.tolist())
+        self.assertEqual(index.names.tolist(), expected.names.tolist())
+        self.assertEqual(index.prices.tolist(), expected.prices.tolist())
+        np.testing.assert_allclose(index.vectors, expected.vectors, rtol=1e-6)
+
+    def test_refresh_matches_a_full_rebuild(self):
+        vectors = random_vectors(50)
+        products = [self.create_product(f"Product {i}", vector=v) for i, v in enumerate(vectors)]
+        index = ProductIndex.build(version=catalog_version())
+
+        with auto_embedding_disabled():
+            # Re-embedded, repriced, cleared, deleted and new products.
+            products[3].set_embedding(random_vectors(1, seed=2)[0])
+            products[3].save()
+            products[7].price = 999
+            products[7].save()
+            products[11].set_embedding(None)
+            products[11].save()
+        products[20].delete()
+        Products.objects.filter(pk__in=[products[21].pk, products[22].pk]).delete()
+        self.create_product("New product", vector=random_vectors(1, seed=3)[0])
+
+        version = catalog_version()
+        refreshed = index.refresh(version)
+
+        self.assertIsNotNone(refreshed)
+        self.assertEqual(refreshed.version, version)
+        self.assertEqual(len(refreshed), 47)
+        self.assertSameIndex(refreshed, ProductIndex.build())
+
+    def test_refresh_follows_the_change_counter_rather_than_timestamps(self):
+        products = [self.create_product(f"Product {i}", vector=v) for i, v in enumerate(random_vectors(20))]
+        index = ProductIndex.build(version=catalog_version())
+
+        with auto_embedding_disabled():
+            products[3].set_embedding(random_vectors(1, seed=2)[0])
+            products[3].save()
+        # As if updated_at had been taken long before the write committed.
+        Products.objects.filter(pk=products[3].pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        refreshed = index.refresh(catalog_version())
+
+        self.assertEqual(Products.objects.get(pk=products[3].pk).change_seq, CatalogVersion.current())
+        self.assertSameIndex(refreshed, ProductIndex.build())
+
+    def test_refresh_keeps_ivf_lists_usable(self):
+        for i, vector in enumerate(random_vectors(60)):
+            self.create_product(f"Product {i}", vector=vector)
+        bot_settings = BotSettings(search_engine="ivf", ivf_lists=4, ivf_nprobe=4)
+        index = ProductIndex.build(version=catalog_version())
+        with override_settings(SEARCH_ANN_MIN_PRODUCTS=10):
+            index.get_ann(bot_settings)
+            new = self.create_product("New product", vector=random_vectors(1, seed=3)[0])
+
+            refreshed = index.refresh(catalog_version())
+            rows, _ = refreshed.search(new.get_embedding(), 1, bot_settings)
+
+        self.assertEqual(refreshed.ids[rows].tolist(), [new.pk])
+
+    def test_refresh_re_encodes_quantized_rows(self):
+        for i, vector in enumerate(random_vectors(40)):
+            self.create_product(f"Product {i}", vector=vector)
+        bot_settings = BotSettings(search_quantization="int8", rerank_candidates=5)
+        index = ProductIndex.build(version=catalog_version())
+        index.get_quantized(bot_settings)
+        new = self.create_product("New product", vector=random_vectors(1, seed=3)[0])
+
+        refreshed = index.refresh(catalog_version())
+        rows, _ = refreshed.search(new.get_embedding(), 1, bot_settings)
+
+        self.assertEqual(refreshed.ids[rows].tolist(), [new.pk])
+        self.assertEqual(len(refreshed._quantized["int8"].data), 41)
+
+    def test_nothing_to_refresh_from(self):
+        index = ProductIndex.build(version=catalog_version())
+        self.create_product("New product", vector=random_vectors(1)[0])
+
+        self.assertIsNone(index.refresh(catalog_version()))
+
+
+class CountingEmbeddings(TestEmbeddings):
+    """Counts query embeddings, telling cache hits from searches that reached the model."""
+
+    def __init__(self):
+        super().__init__()
+        self.query_calls = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+
+class SearchCacheTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, vector in enumerate(random_vectors(10)):
+            self.create_product(f"Product {i}", vector=vector)
+        self.model = CountingEmbeddings()
+        patcher = mock.patch("organization.search.get_search_cache", return_value=TieredCache(maxsize=100))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, query="red shirt"):
+        return search_products(query, TEST_ORG, top_k=3, embedding_model=self.model)
+
+    def test_repeated_search_is_a_hit(self):
+        first = self.search()
+        second = self.search()
+
+        self.assertEqual(self.model.query_calls, 1)
+        self.assertEqual(second, first)
+        self.assertEqual(len(first), 3)
+
+    def test_product_save_is_a_miss(self):
+        self.search()
+        self.create_product("New product", vector=random_vectors(1, seed=1)[0])
+        self.search()
+
+        self.assertEqual(self.model.query_calls, 2)
+
+    def test_bulk_write_that_skips_the_counter_is_a_miss(self):
+        self.search()
+        Products.objects.bulk_create([Products(name="Bulk product", price=100, attributes={})])
+        self.search()
+
+        self.assertEqual(self.model.query_calls, 2)
+
+    def test_key_varies_with_the_search_inputs(self):
+        def key(**changes):
+            args = {
+                "query": "Red shirt", "attributes": {"color": "red", "size": ["M", "L"]}, "top_k": 5,
+                "bot_settings": BotSettings(), "embedding_model": "test:hash", **changes,
+            }
+            return search_cache_key(TEST_ORG, "1:10:-:", **args)
+
+        base = key()
+        self.assertEqual(base, key(query="  red SHIRT", attributes={"Color": "Red", "size": ["L", "M"]}))
+        variants = [
+            key(attributes={"color": "blue"}),
+            key(top_k=10),
+            key(bot_settings=BotSettings(search_quantization="int8")),
+            key(bot_settings=BotSettings(mmr_lambda=0.5)),
+            key(embedding_model="other:model"),
+            search_cache_key(TEST_ORG, "2:10:-:", "Red shirt", None, 5, None),
+        ]
+        self.assertEqual(len({base, *variants}), len(variants) + 1)
+
+
+class BatchSearchTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = TestEmbeddings()
+        # Each product is the exact match of a query for its own name.
+        for i in range(10):
+            self.create_product(f"Product {i}", vector=self.model.embed_query(f"Product {i}"))
+        patcher = mock.patch("llm.llm.LLM.get_embedding_model", return_value=self.model)
+        self.get_embedding_model = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results_follow_the_queries(self):
+        results = search_products_many(["Product 7", "Product 2", "Product 7"], TEST_ORG, top_k=3)
+
+        self.assertEqual([hits[0]["name"] for hits in results], ["Product 7", "Product 2", "Product 7"])
+        self.assertEqual([len(hits) for hits in results], [3, 3, 3])
+        self.assertEqual(results[0], results[2])
+        self.assertAlmostEqual(results[0][0]["score"], 1.0, places=5)
+
+    def test_top_k_beyond_the_catalog(self):
+        results = search_products_many(["Product 1"], TEST_ORG, top_k=50)
+
+        self.assertEqual(len(results[0]), 10)
+
+    def test_no_queries(self):
+        self.assertEqual(search_products_many([], TEST_ORG), [])
+        self.get_embedding_model.assert_not_called()
+
+    def test_embedding_failure_gives_empty_results(self):
+        self.get_embedding_model.return_value = TestEmbeddings(fail_on=("Product",))
+
+        with self.assertLogs("organization.search", "ERROR"):
+            results = search_products_many(["Product 1", "Product 2"], TEST_ORG)
+
+        self.assertEqual(results, [[], []])
+
+    def create_organization(self):
+        # bulk_create() skips the signal that would migrate a new database.
+        Organization.objects.bulk_create([Organization(
+            name="Test", slug=TEST_ORG, address="", domain="", required_attributes=[], system_prompt="",
+        )])
+
+    def post(self, data, path=f"/{TEST_ORG}/api/search/batch/"):
+        response = self.client.post(path, data, content_type="application/json")
+        # The middleware clears the organization context after the request.
+        set_organization_slug(TEST_ORG)
+        return response
+
+    def test_endpoint(self):
+        self.create_organization()
+        self.client.force_login(User.objects.create_user("staff"))
+
+        response = self.post({"queries": ["Product 4", "Product 8"], "top_k": 2})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([[hit["name"] for hit in hits][0] for hits in results], ["Product 4", "Product 8"])
+        self.assertEqual([len(hits) for hits in results], [2, 2])
+
+        self.assertEqual(self.post({"queries": []}).json(), {"results": []})
+        self.assertEqual(self.post({"queries": ["Product 1", ""]}).status_code, 400)
+        self.assertEqual(self.post({"queries": "Product 1"}).status_code, 400)
+        self.assertEqual(self.post({"queries": ["Product 1"], "top_k": 0}).status_code, 400)
+        self.assertEqual(self.post({"queries": ["Product 1"]}, path="/api/search/batch/").status_code, 400)
+
+    def test_endpoint_requires_login(self):
+        self.create_organization()
+
+        self.assertEqual(self.post({"queries": ["Product 1"]}).status_code, 403)
+
+
+class QuantizationTests(OrganizationTestCase):
+    def test_top_k_matches_exact_search(self):
+        vectors = normalize(random_vectors(1000))
+        index = ProductIndex(np.arange(1000), [""] * 1000, np.zeros(1000), [None] * 1000, vectors)
+
+        for kind in ("float16", "int8"):
+            bot_settings = BotSettings(search_quantization=kind, rerank_candidates=50)
+            for query in random_vectors(20, seed=1):
+                exact_rows, exact_scores = index.search(query, 10)
+
+                rows, scores = index.search(query, 10, bot_settings)
+
+                self.assertEqual(rows.tolist(), exact_rows.tolist(), kind)
+                np.testing.assert_allclose(scores, exact_scores, rtol=1e-6)
+
+    def test_saved_matrix_is_memory_mapped(self):
+        for i, vector in enumerate(random_vectors(30)):
+            self.create_product(f"Product {i}", vector=vector)
+        bot_settings = BotSettings(search_quantization="int8")
+        index = ProductIndex.build(version=catalog_version(), org_slug=TEST_ORG)
+        index.save(TEST_ORG)
+        built = index.get_quantized(bot_settings)
+
+        loaded = ProductIndex.load(TEST_ORG).get_quantized(bot_settings)
+
+        self.assertIsInstance(loaded.data, np.memmap)
+        np.testing.assert_array_equal(loaded.data, built.data)
+        np.testing.assert_array_equal(loaded.scales, built.scales)
+        self.assertIsNone(QuantizedMatrix.load(quantized_path(TEST_ORG, "int8"), version="other"))
+
+
+class ProjectionTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        # Catalog vectors mostly lie in a low-dimensional subspace.
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((1000, 6)) @ rng.standard_normal((6, DIM))
+        vectors += 0.05 * rng.standard_normal((1000, DIM))
+        self.index = ProductIndex(
+            np.arange(1000), [""] * 1000, np.zeros(1000), [None] * 1000,
+            normalize(vectors.astype(np.float32)),
+        )
+        self.bot_settings = BotSettings(pca_components=8, rerank_candidates=50)
+
+    def test_coarse_scores_are_re_ranked_at_full_dimension(self):
+        for query in random_vectors(20, seed=1):
+            exact_rows, exact_scores = self.index.search(query, 10)
+
+            rows, scores = self.index.search(query, 10, self.bot_settings)
+
+            self.assertEqual(rows.tolist(), exact_rows.tolist())
+            np.testing.assert_allclose(scores, exact_scores, rtol=1e-6)
+        self.assertEqual(self.index.get_projection(self.bot_settings).reduced.shape, (1000, 8))
+
+    def test_sharded_scan_matches_a_single_scan(self):
+        queries = random_vectors(10, seed=1)
+        expected = [self.index.search(query, 10, self.bot_settings)[0] for query in queries]
+        self.bot_settings.search_shards = 4
+
+        with mock.patch("organization.index.SHARD_MIN_ROWS", 100):
+            self.assertEqual(self.index.shard_count(self.bot_settings), 4)
+            for query, rows in zip(queries, expected):
+                self.assertEqual(self.index.search(query, 10, self.bot_settings)[0].tolist(), rows.tolist())
+
+    def test_refresh_projects_changed_rows(self):
+        for i, vector in enumerate(random_vectors(40)):
+            self.create_product(f"Product {i}", vector=vector)
+        bot_settings = BotSettings(pca_components=12, rerank_candidates=10)
+        index = ProductIndex.build(version=catalog_version())
+        projection = index.get_projection(bot_settings)
+        new = self.create_product("New product", vector=random_vectors(1, seed=3)[0])
+
+        refreshed = index.refresh(catalog_version())
+        rows, _ = refreshed.search(new.get_embedding(), 1, bot_settings)
+
+        self.assertEqual(refreshed.ids[rows].tolist(), [new.pk])
+        remapped = refreshed._projections[12]
+        self.assertIs(remapped.components, projection.components)
+        np.testing.assert_allclose(remapped.reduced[:40], projection.reduced, atol=1e-6)
+        np.testing.assert_allclose(
+            remapped.reduced[40], projection.project(refreshed.vectors[40:])[0], atol=1e-6
+        )
+
+    def test_saved_projection_is_memory_mapped(self):
+        for i, vector in enumerate(random_vectors(30)):
+            self.create_product(f"Product {i}", vector=vector)
+        bot_settings = BotSettings(pca_components=4)
+        index = ProductIndex.build(version=catalog_version(), org_slug=TEST_ORG)
+        index.save(TEST_ORG)
+        fitted = index.get_projection(bot_settings)
+
+        loaded = ProductIndex.load(TEST_ORG).get_projection(bot_settings)
+
+        self.assertIsInstance(loaded.reduced, np.memmap)
+        np.testing.assert_array_equal(loaded.reduced, fitted.reduced)
+        np.testing.assert_array_equal(loaded.components, fitted.components)
+
+
+@skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc to count file descriptors")
+class SharedIndexTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(unpublish, TEST_ORG)
+        self.index = ProductIndex(
+            np.arange(20), [f"Product {i}" for i in range(20)], np.full(20, 100.0),
+            [None] * 20, normalize(random_vectors(20)), version="1:20:-:", org_slug=TEST_ORG,
+        )
+
+    def test_attaching_new_generations_does_not_leak_descriptors(self):
+        publish(self.index, TEST_ORG)
+        attached = attach(TEST_ORG)
+        open_fds = len(os.listdir("/proc/self/fd"))
+
+        for counter in range(2, 7):
+            self.index.version = f"{counter}:20:-:"
+            publish(self.index, TEST_ORG)
+            # Dropping the previous generation's index releases its mapping.
+            attached = attach(TEST_ORG)
+
+        self.assertEqual(attached.generation, 6)
+        self.assertEqual(attached.version, "6:20:-:")
+        np.testing.assert_array_equal(attached.vectors, self.index.vectors)
+        self.assertEqual(len(os.listdir("/proc/self/fd")), open_fds)
+
+    def test_republishing_is_debounced(self):
+        for i, vector in enumerate(random_vectors(10)):
+            self.create_product(f"Product {i}", vector=vector)
+        first = shared_index(TEST_ORG, catalog_version())
+        new = self.create_product("New product", vector=random_vectors(1, seed=1)[0])
+        version = catalog_version()
+
+        with override_settings(SEARCH_SHARED_MEMORY_MIN_INTERVAL=60):
+            private = shared_index(TEST_ORG, version, first)
+
+        self.assertEqual(read_manifest(TEST_ORG)["generation"], 1)
+        self.assertEqual(private.version, version)
+        self.assertIn(new.pk, private.ids)
+        self.assertIsNotNone(private.publish_after)
+
+        with override_settings(SEARCH_SHARED_MEMORY_MIN_INTERVAL=0):
+            published = shared_index(TEST_ORG, version, private)
+
+        self.assertEqual(published.generation, 2)
+        self.assertEqual(published.ids.tolist(), private.ids.tolist())
+
+    def test_full_shared_memory_falls_back_to_a_private_index(self):
+        for i, vector in enumerate(random_vectors(3)):
+            self.create_product(f"Product {i}", vector=vector)
+        no_space = OSError(errno.ENOSPC, "No space left on device")
+
+        with mock.patch("os.posix_fallocate", side_effect=no_space), \
+                self.assertLogs("organization.shared_index", "WARNING") as logs:
+            index = shared_index(TEST_ORG, catalog_version())
+
+        self.assertEqual(len(index), 3)
+        self.assertIsNone(read_manifest(TEST_ORG))
+        self.assertIn("shm_size", logs.output[0])
+        self.assertIsNone(attach(TEST_ORG, {"segment": f"aichatbot_{TEST_ORG}_1", "generation": 1}))
+
+
+class MaximalMarginalRelevanceTests(SimpleTestCase):
+    def setUp(self):
+        basis = np.eye(DIM, dtype=np.float32)
+        self.query = basis[0]
+        vectors = [
+            # Three near-identical variants of the best match...
+            basis[0] + 0.5 * basis[5],
+            basis[0] + 0.5 * basis[5] + 0.02 * basis[6],
+            basis[0] + 0.5 * basis[5] + 0.04 * basis[6],
+            # ...two distinct, less relevant products...
+            0.6 * basis[0] + 0.8 * basis[1],
+            0.55 * basis[0] + 0.835 * basis[2],
+            # ...and unrelated ones.
+            basis[3],
+            basis[4],
+        ]
+        self.index = ProductIndex(
+            np.arange(7), [""] * 7, np.zeros(7), [None] * 7, normalize(np.array(vectors)),
+        )
+
+    def test_near_duplicates_are_diversified(self):
+        rows, scores = self.index.search(self.query, 3, BotSettings(mmr_lambda=0.5))
+
+        self.assertEqual(rows.tolist(), [0, 3, 4])
+        np.testing.assert_allclose(scores, self.index.vectors[rows] @ self.query, rtol=1e-6)
+
+    def test_lambda_one_keeps_the_relevance_order(self):
+        exact, _ = self.index.search(self.query, 5)
+
+        rows, _ = self.index.search(self.query, 5, BotSettings(mmr_lambda=1.0))
+
+        self.assertEqual(rows.tolist(), exact.tolist())
+        self.assertEqual(rows[:3].tolist(), [0, 1, 2])
+        relevance = self.index.vectors @ self.query
+        self.assertEqual(
+            maximal_marginal_relevance(self.index.vectors, relevance, 7, 1.0).tolist(),
+            np.argsort(-relevance, kind="stable").tolist(),
+        )
+
+
+@mock.patch("organization.index.SHARD_MIN_ROWS", 100)
+class ShardedSearchTests(SimpleTestCase):
+    """Four shards of 250 rows must rank exactly like one scan of the 1000."""
+
+    def setUp(self):
+        vectors = random_vectors(1000)
+        # Identical rows on both sides of the first shard boundary, with
+        # exactly representable scores against the query below.
+        self.tied = np.zeros(DIM, dtype=np.float32)
+        self.tied[:4] = 0.5
+        vectors[249] = vectors[250] = self.tied
+        self.index = ProductIndex(
+            np.arange(1000), [""] * 1000, np.zeros(1000), [None] * 1000, normalize(vectors),
+        )
+        self.queries = [self.tied, *random_vectors(10, seed=1)]
+
+    def assertSameRanking(self, top_k, **search_settings):
+        single = BotSettings(search_shards=1, **search_settings)
+        sharded = BotSettings(search_shards=4, **search_settings)
+        self.assertEqual(self.index.shard_count(sharded), 4)
+        for query in self.queries:
+            rows, scores = self.index.search(query, top_k, sharded)
+            expected_rows, expected_scores = self.index.search(query, top_k, single)
+
+            self.assertEqual(rows.tolist(), expected_rows.tolist(), search_settings)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    def test_exact(self):
+        self.assertSameRanking(10)
+
+    def test_int8(self):
+        self.assertSameRanking(10, search_quantization="int8", rerank_candidates=50)
+
+    def test_pca(self):
+        self.assertSameRanking(10, pca_components=8, rerank_candidates=50)
+
+    def test_ties_at_a_shard_boundary(self):
+        rows, scores = self.index.search(self.tied, 2, BotSettings(search_shards=4))
+
+        self.assertEqual(rows.tolist(), [249, 250])
+        self.assertEqual(scores[0], scores[1])
+
+    def test_k_larger_than_a_shard(self):
+        self.assertSameRanking(300)
+        self.assertSameRanking(10, search_quantization="int8", rerank_candidates=300)
+
+
+class IndexCacheTests(SimpleTestCase):
+    def make_index(self):
+        return ProductIndex(np.arange(100), [""] * 100, np.zeros(100), [None] * 100, random_vectors(100))
+
+    def setUp(self):
+        self.indexes = {org_slug: self.make_index() for org_slug in "abc"}
+        self.size = self.indexes["a"].nbytes
+
+    def test_least_recently_used_is_evicted_over_budget(self):
+        cache = IndexCache(budget=2 * self.size)
+        cache.put("a", self.indexes["a"])
+        cache.put("b", self.indexes["b"])
+        cache.get("a")
+
+        cache.put("c", self.indexes["c"])
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.stats()["orgs"]["b"]["evictions"], 1)
+
+    def test_pinned_organizations_are_never_evicted(self):
+        cache = IndexCache(budget=self.size, pinned=["a"])
+
+        for org_slug in "abc":
+            cache.put(org_slug, self.indexes[org_slug])
+
+        self.assertEqual(sorted(cache.stats()["orgs"]), ["a", "b", "c"])
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_derived_indexes_count_against_the_budget(self):
+        cache = IndexCache(budget=2 * self.size + 100)
+        cache.put("a", self.indexes["a"])
+        cache.put("b", self.indexes["b"])
+
+        self.indexes["b"].get_quantized(BotSettings(search_quantization="float16"))
+
+        self.assertNotIn("a", cache)
+        self.assertIn("b", cache)
+        self.assertLessEqual(cache.stats()["resident_bytes"], cache.budget)
+
+
+@override_settings(SEARCH_ANN_MIN_PRODUCTS=100)
+class SearchEvaluationTests(SimpleTestCase):
+    """The recall measurements behind benchmark_search and build_search_index."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index, _ = synthetic_catalog(2000, 32)
+        cls.queries = sample_queries(cls.index, 50)
+        cls.truth = exact_top_k(cls.index, cls.queries, 10)
+
+    def recall(self, bot_settings):
+        return evaluate(self.index, self.queries, 10, bot_settings, truth=self.truth)["recall"]
+
+    def test_recall_at_k(self):
+        self.assertEqual(recall_at_k([[1, 2, 3, 4], [5, 6]], [[4, 3, 9, 8], [5, 6]]), 0.75)
+        self.assertEqual(recall_at_k([], []), 0.0)
+
+    def test_synthetic_catalog_is_deterministic(self):
+        again, attributes = synthetic_catalog(2000, 32)
+
+        np.testing.assert_array_equal(again.vectors, self.index.vectors)
+        self.assertEqual(again.names.tolist(), self.index.names.tolist())
+        self.assertEqual(len(attributes), 2000)
+
+    def test_exact_search_has_full_recall(self):
+        report = evaluate(self.index, self.queries, 10, None, truth=self.truth)
+
+        self.assertEqual(report["recall"], 1.0)
+        self.assertLessEqual(report["p50_ms"], report["p99_ms"])
+
+    def test_approximate_engines(self):
+        self.assertGreaterEqual(self.recall(BotSettings(search_quantization="float16")), 0.99)
+        self.assertGreaterEqual(self.recall(BotSettings(search_quantization="int8")), 0.95)
+        # Probing every list is an exact scan; the default probes a share of them.
+        everything = self.recall(BotSettings(search_engine="ivf", ivf_nprobe=10000))
+        default = self.recall(BotSettings(search_engine="ivf"))
+        one = self.recall(BotSettings(search_engine="ivf", ivf_nprobe=1))
+        self.assertEqual(everything, 1.0)
+        self.assertGreater(default, one)
+
+
+class ContentHashTests(OrganizationTestCase):
+    def test_stale_products(self):
+        current = self.create_product("Shirt", {"color": "Red"}, vector=random_vectors(1)[0])
+        missing = self.create_product("Hat")
+        renamed = self.create_product("Scarf", vector=random_vectors(1, seed=1)[0])
+        Products.objects.filter(pk=renamed.pk).update(name="Wool Scarf")
+
+        stale, reasons = stale_products(Products.objects.all())
+
+        self.assertEqual(stale, [missing.pk, renamed.pk])
+        self.assertEqual((reasons["missing"], reasons["text"], reasons["model"]), (1, 1, 0))
+
+        stale, reasons = stale_products(Products.objects.all(), model_id="test:hash")
+
+        self.assertEqual(stale, [current.pk, missing.pk, renamed.pk])
+        self.assertEqual(reasons["model"], 2)
+
+    def test_embedding_stale_products_leaves_nothing_stale(self):
+        for name in ("Shirt", "Hat", "Scarf"):
+            self.create_product(name)
+        model = TestEmbeddings()
+        stale, _ = stale_products(Products.objects.all(), model.model_id)
+        counter = CatalogVersion.current()
+
+        progress = embed_products_batched(Products.objects.all(), model, ids=stale, batch_size=2)
+
+        self.assertEqual((progress.embedded, progress.failed), (3, 0))
+        self.assertEqual(stale_products(Products.objects.all(), model.model_id)[0], [])
+        self.assertGreater(CatalogVersion.current(), counter)
+        product = Products.objects.get(name="Hat")
+        text = product_embedding_text(product.name, product.attributes)
+        self.assertEqual(product.embedding_hash, embedding_text_hash(text))
+        np.testing.assert_allclose(product.get_embedding(), model.embed_documents([text])[0], rtol=1e-6)
+
+
+class Crash(BaseException):
+    """Stands in for the process being killed mid-job; not caught as a batch failure."""
+
+
+class EmbeddingJobTests(OrganizationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.create_product(f"Product {i}").pk for i in range(10)]
+        self.products = Products.objects.all()
+
+    def embedded_ids(self):
+        return list(self.products.exclude(embedding__isnull=True).order_by("id").values_list("id", flat=True))
+
+    def test_failed_batches_are_recorded_and_retried(self):
+        job = EmbeddingJob.objects.create(total=10)
+
+        run_embedding_job(
+            job, self.products, TestEmbeddings(fail_on=("Product 4",)), self.ids,
+            batch_size=2, concurrency=2, retries=0,
+        )
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual((job.embedded, job.failed), (8, 2))
+        self.assertEqual(job.failed_ids, self.ids[4:6])
+        self.assertEqual(job.cursor, self.ids[-1])
+
+        run_embedding_job(job, self.products, TestEmbeddings(), job.failed_ids, retry_failed=True, retries=0)
+
+        job.refresh_from_db()
+        self.assertEqual((job.embedded, job.failed, job.failed_ids), (10, 0, []))
+        self.assertEqual(self.embedded_ids(), self.ids)
+
+    def test_transient_errors_are_retried_until_retries_run_out(self):
+        model = TestEmbeddings()
+        calls = []
+
+        def flaky(texts):
+            calls.append(texts)
+            if len(calls) <= 2:
+                raise ConnectionError("provider unavailable")
+            return TestEmbeddings.embed_documents(model, texts)
+
+        model.embed_documents = flaky
+        progress = embed_products_batched(self.products, model, batch_size=10, retries=2, backoff=0)
+
+        self.assertEqual((progress.embedded, progress.failed, len(calls)), (10, 0, 3))
+
+        calls.clear()
+        with self.assertLogs("organization.embedding", "ERROR"):
+            progress = embed_products_batched(self.products, model, batch_size=10, retries=1, backoff=0)
+
+        self.assertEqual((progress.embedded, progress.failed, len(calls)), (0, 10, 2))
+
+    def test_interrupted_job_resumes_after_its_checkpoint(self):
+        job = EmbeddingJob.objects.create(total=10)
+
+        with self.assertRaises(Crash):
+            run_embedding_job(
+                job, self.products, TestEmbeddings(fail_on=("Product 6",), error=Crash), self.ids,
+                batch_size=2, concurrency=1, retries=0,
+            )
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        # The checkpoint agrees with the stored vectors: everything up to the
+        # cursor, and nothing from the batch that crashed.
+        committed = [pk for pk in self.ids if pk <= job.cursor]
+        self.assertGreaterEqual(len(committed), 4)
+        self.assertEqual(self.embedded_ids(), committed)
+        self.assertEqual(job.embedded, len(committed))
+
+        model = TestEmbeddings()
+        remaining, _ = stale_products(self.products.filter(id__gt=job.cursor), model.model_id)
+        progress = run_embedding_job(job, self.products, model, remaining, batch_size=2, retries=0)
+
+        job.refresh_from_db()
+        self.assertEqual(progress.embedded, 10 - len(committed))
+        self.assertEqual((job.status, job.embedded, job.cursor), ("completed", 10, self.ids[-1]))
+        self.assertEqual(self.embedded_ids(), self.ids)
+
+
+class TenantCommandTests(SimpleTestCase):
+    def setUp(self):
+        # Organization databases are added to the settings as they are used.
+        for patcher in (mock.patch.dict(settings.DATABASES), mock.patch("organization.tenants.connections")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failures_are_collected_per_organization(self):
+        def command(name, slug, stdout, stderr, **options):
+            if slug == "broken":
+                raise CommandError("no such table: organization_products")
+            stdout.write(f"{name} {slug}")
+            stderr.write("DeprecationWarning: only a warning")
+
+        finished = []
+        with mock.patch("organization.tenants.call_command", side_effect=command):
+            results = run_command_per_organization(
+                "embed_products", ["first", "broken", "last"], on_result=finished.append,
+            )
+
+        self.assertEqual([result["slug"] for result in finished], ["first", "broken", "last"])
+        self.assertEqual(
+            [result["error"] for result in results],
+            [None, "no such table: organization_products", None],
+        )
+        self.assertIn("embed_products last", results[2]["output"])
+
+        summary = BaseCommand(stdout=io.StringIO(), stderr=io.StringIO())
+        write_summary(summary, results)
+        self.assertIn("FAILED: no such table", summary.stdout._out.getvalue())
+        self.assertIn("2/3 organizations succeeded", summary.stderr._out.getvalue())
+
+    def test_job_ids_are_rejected_with_all(self):
+        for option in ("--resume", "--retry-failed"):
+            with self.subTest(option=option), self.assertRaisesMessage(CommandError, "cannot be combined with --all"):
+                call_command("embed_products", "--all", option, "3")
+
+
+class ProductImportTests(OrganizationTestCase):
+    def items(self, prices):
+        return [
+            {"name": f"Shirt {sku}", "price": str(price), "attributes": {"sku": sku, "color": "Red"}}
+            for sku, price in prices.items()
+        ]
+
+    def test_insert_in_batches(self):
+        batches = []
+
+        stats = import_products(
+            iter_json_items(io.StringIO(json.dumps(self.items({"A": 10, "B": 20, "C": 30})))),
+            batch_size=2, on_batch=lambda stats: batches.append(stats.total),
+        )
+
+        self.assertEqual((stats.created, stats.updated), (3, 0))
+        self.assertEqual(batches, [2, 3])
+        self.assertEqual(Products.objects.count(), 3)
+
+    def test_natural_key_upserts(self):
+        import_products(self.items({"A": 10, "B": 20}), key="attributes.sku")
+        vector = random_vectors(1)[0]
+        Products.objects.filter(attributes__sku="A").update(embedding=vector.tobytes(), embedding_dim=DIM)
+        counter = CatalogVersion.current()
+
+        # "B" appears twice in the batch; the last one wins.
+        items = self.items({"A": 15, "B": 25, "C": 30}) + self.items({"B": 26})
+        stats = import_products(items, key="attributes.sku")
+
+        self.assertEqual((stats.created, stats.updated), (1, 2))
+        prices = dict(Products.objects.values_list("attributes__sku", "price"))
+        self.assertEqual(prices, {"A": 15, "B": 26, "C": 30})
+        # Items without an embedding keep the stored one.
+        np.testing.assert_array_equal(Products.objects.get(attributes__sku="A").get_embedding(), vector)
+        self.assertGreater(CatalogVersion.current(), counter)
+
+    def test_item_without_the_key_is_rejected(self):
+        with self.assertRaises(ValueError):
+            import_products([{"name": "Hat", "price": "5"}], key="attributes.sku")
+
+
+class ProductExportTests(OrganizationTestCase):
+    def test_round_trip_with_embedding_sidecar(self):
+        vectors = random_vectors(5)
+        for i, vector in enumerate(vectors):
+            self.create_product(f"Shirt {i}", {"sku": f"S{i}"}, price=10 + i, vector=vector)
+        self.create_product("Hat", {"sku": "H"}, price=5)
+        Products.objects.filter(name="Hat").update(created_at=timezone.now() - timedelta(days=30))
+        expected = {
+            p.attributes["sku"]: (p.name, p.price, p.embedding_hash, p.created_at)
+            for p in Products.objects.all()
+        }
+        catalog = self.tmp_dir / "catalog.ndjson.gz"
+        sidecar = self.tmp_dir / "catalog.npy"
+
+        with open_catalog(catalog, "w") as f:
+            count, rows = export_products(f, embeddings_path=sidecar, chunk_size=2)
+        self.assertEqual((count, rows), (6, 5))
+
+        Products.objects.all().delete()
+        with open_catalog(catalog) as f:
+            stats = import_products(iter_json_items(f), key="attributes.sku", embeddings=load_embeddings(sidecar))
+
+        self.assertEqual(stats.created, 6)
+        products = {p.attributes["sku"]: p for p in Products.objects.all()}
+        self.assertEqual(
+            {sku: (p.name, p.price, p.embedding_hash, p.created_at) for sku, p in products.items()}, expected,
+        )
+        for i, vector in enumerate(vectors):
+            np.testing.assert_array_equal(products[f"S{i}"].get_embedding(), vector)
+        self.assertIsNone(products["H"].embedding)
+
+        # Loading the same dump again updates the products in place.
+        with open_catalog(catalog) as f:
+            stats = import_products(iter_json_items(f), key="attributes.sku", embeddings=load_embeddings(sidecar))
+        self.assertEqual((stats.created, stats.updated), (0, 6))
+        self.assertEqual(Products.objects.count(), 6)
+        self.assertEqual(Products.objects.get(name="Hat").created_at, expected["H"][3])
+
+        # So do plain inserts.
+        Products.objects.all().delete()
+        with open_catalog(catalog) as f:
+            import_products(iter_json_items(f))
+        self.assertEqual(Products.objects.get(name="Hat").created_at, expected["H"][3])
+
+
+class BinaryEmbeddingMigrationTests(TransactionTestCase):
+    """0006 moves JSON-list embeddings into raw float32 bytes, and back when reversed."""
+
+    databases = {"default", TEST_ORG}
+    before = [("organization", "0005_botsettings_hybrid_search")]
+    after = [("organization", "0006_products_binary_embedding")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connections[TEST_ORG])
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        leaf = MigrationExecutor(connections[TEST_ORG]).loader.graph.leaf_nodes("organization")
+        self.migrate(leaf)
+
+    def test_json_embeddings_become_binary(self):
+        vector = [0.25, -1.5, 3.0]
+        old_apps = self.migrate(self.before)
+        OldProducts = old_apps.get_model("organization", "Products")
+        kept = OldProducts.objects.using(TEST_ORG).create(name="Shirt", price=10, attributes={}, embedding=vector)
+        empty = OldProducts.objects.using(TEST_ORG).create(name="Hat", price=5, attributes={})
+
+        new_apps = self.migrate(self.after)
+        NewProducts = new_apps.get_model("organization", "Products")
+        kept = NewProducts.objects.using(TEST_ORG).get(pk=kept.pk)
+        empty = NewProducts.objects.using(TEST_ORG).get(pk=empty.pk)
+
+        self.assertEqual(decode_embedding(bytes(kept.embedding), kept.embedding_dtype).tolist(), vector)
+        self.assertEqual(kept.embedding_dim, 3)
+        self.assertIsNone(empty.embedding)
+
+        old_apps = self.migrate(self.before)
+        OldProducts = old_apps.get_model("organization", "Products")
+        self.assertEqual(OldProducts.objects.using(TEST_ORG).get(pk=kept.pk).embedding, vector)
@@ -1,6 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductsViewSet, OrganizationViewSet, BotSettingsViewSet
+from .views import (
+    BatchProductSearchView,
+    BotSettingsViewSet,
+    OrganizationViewSet,
+    ProductsViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'organizations', OrganizationViewSet)
@@ -8,5 +13,6 @@ router.register(r'products', ProductsViewSet)
 router.register(r'botsettings', BotSettingsViewSet)
 
 urlpatterns = [
+    path("search/batch/", BatchProductSearchView.as_view(), name="product-search-batch"),
     path("", include(router.urls)),
 ]
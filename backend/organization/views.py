@@ -1,7 +1,9 @@
 import json
 
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import (
     IsAdminUser,
     IsAuthenticated,
@@ -9,7 +11,10 @@ from rest_framework.permissions import (
     BasePermission,
 )
 
+from aichatbot.utils import get_organization_slug
+
 from .models import BotSettings, Organization, Products
+from .search import search_products_many
 from .serializers import (
     BotSettingsSerializer,
     OrganizationSerializer,
@@ -58,3 +63,49 @@ class ProductsViewSet(viewsets.ModelViewSet):
 
     permission_classes = [IsAdminOrReadOnly]
     pagination_class = StandardResultsSetPagination
+
+
+class BatchProductSearchView(APIView):
+    """
+    Run many product searches in one request.
+
+    Expects ``{"queries": [...], "top_k": 5}`` and returns one result list per
+    query, in order.
+    """
+
+    permission_classes = [IsAuthenticated]
+    max_queries = 1000
+    max_top_k = 100
+
+    def post(self, request, *args, **kwargs):
+        org_slug = get_organization_slug()
+        if not org_slug:
+            return Response(
+                {"error": "Organization context missing."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queries = request.data.get("queries")
+        if not isinstance(queries, list) or not all(isinstance(q, str) and q for q in queries):
+            return Response(
+                {"error": "queries must be a list of non-empty strings."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(queries) > self.max_queries:
+            return Response(
+                {"error": f"At most {self.max_queries} queries per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            top_k = int(request.data.get("top_k", 5))
+        except (TypeError, ValueError):
+            top_k = 0
+        if not 1 <= top_k <= self.max_top_k:
+            return Response(
+                {"error": f"top_k must be between 1 and {self.max_top_k}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = search_products_many(queries, org_slug, top_k=top_k)
+        return Response({"results": results}, status=status.HTTP_200_OK)